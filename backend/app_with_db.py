@@ -9,52 +9,72 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from resources import resource_config
+resource_config.apply()
+from llm_usage import llm_usage
+from llm_calls import llm_caller
+from llm_limiter import estimate_tokens, llm_limiter, llm_user
+from single_flight import SingleFlight
+from core.response_cache import create_subsection_cache, prompt_version, request_key, subsection_key
+from config import settings
 from typing import Optional, List
 from pydantic import BaseModel
 from uuid import UUID
 import secrets
 import json
+import copy
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # Import database models and connection
 from database.models import User, Case, Feedback
 from database.connection import get_db, init_db
 from schemas.user import LoginRequest, LoginResponse, UserResponse, UserUpdate
-from schemas.case import CaseCreate, CaseResponse, CaseListResponse, CaseUpdate
+from schemas.case import CaseCreate, CaseResponse, CaseListResponse, CaseUpdate, SubsectionRegenerate
 from schemas.feedback import FeedbackCreate, FeedbackResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-openai_client: Optional[OpenAI] = None
-executor = ThreadPoolExecutor(max_workers=6)
+openai_client: Optional[AsyncOpenAI] = None
+# Retrieval grounding for the subsection prompts (SUBSECTION_GROUNDING_ENABLED)
+subsection_pool = None
+recommendation_flights = SingleFlight("recommendations", enabled=settings.SINGLE_FLIGHT_ENABLED)
+subsection_cache = create_subsection_cache()
 
 # Simple token storage (in production, use Redis or JWT)
 active_tokens = {}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global openai_client
+    global openai_client, subsection_pool
     logger.info("Initializing backend with database support")
     try:
-        # Initialize OpenAI
-        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Initialize OpenAI (retries are handled by llm_caller)
+        openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
         
         # Initialize database
         await init_db()
         logger.info("Database initialized")
         
+        if settings.SUBSECTION_GROUNDING_ENABLED:
+            try:
+                # Imported here so the ungrounded deployment never loads the retrieval models
+                from core.subsection_pool import SubsectionPool
+                subsection_pool = await asyncio.to_thread(SubsectionPool.load, settings.VECTOR_STORE_PATH)
+                logger.info(f"Subsection grounding enabled (index {subsection_pool.index_version})")
+            except Exception as e:
+                logger.warning(f"Subsection grounding unavailable, prompts stay ungrounded: {e}")
+        
         logger.info("Backend initialized successfully")
         yield
     except Exception as e:
-        await db.rollback()
         logger.error(f"Failed to initialize: {e}")
         raise
     finally:
         logger.info("Shutting down")
-        executor.shutdown(wait=True)
+        if openai_client is not None:
+            await openai_client.close()
 
 app = FastAPI(title="Note Ninjas OT Recommender", version="2.0.0", lifespan=lifespan)
 
@@ -103,20 +123,26 @@ async def generate_case_name(input_data: dict) -> str:
         condition = input_data.get("patient_condition", "")
         prompt = f"Generate a short case name (max 50 chars) for: {condition}. Format like '21 Y/o Rotator Cuff Injury' or 'Post-Concussion Balance Issues'. Return ONLY the name, no quotes or explanations."
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a medical case naming expert. Return only the case name."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=50
+        messages = [
+            {"role": "system", "content": "You are a medical case naming expert. Return only the case name."},
+            {"role": "user", "content": prompt}
+        ]
+        response = await llm_caller.call(
+            "case_name",
+            lambda: client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=50,
+                timeout=settings.LLM_CALL_TIMEOUT_SECONDS
+            ),
+            tokens=estimate_tokens(messages, 50)
         )
+        llm_usage.record("case_name", response.usage)
         
         name = response.choices[0].message.content.strip().replace('"', '')
         return name[:50]  # Ensure max length
     except Exception as e:
-        await db.rollback()
         logger.error(f"Error generating case name: {e}")
         # Fallback to simple name
         condition = input_data.get("patient_condition", "Unknown Case")
@@ -124,14 +150,10 @@ async def generate_case_name(input_data: dict) -> str:
 
 # ===== Existing recommendation generation =====
 
-def generate_subsection(subsection_info: dict, patient_condition: str, desired_outcome: str) -> dict:
-    """Generate a single subsection using GPT-4o"""
-    try:
-        client = openai_client
-        
-        prompt = f"""Generate 1 OT treatment subsection for: {patient_condition} | Goal: {desired_outcome}
-
-Subsection: {subsection_info['title']} - {subsection_info['focus']}
+# Static instructions shared by every subsection call. They form the start of the
+# prompt so the provider's prompt cache can reuse them; the patient and subsection
+# details follow in the user message.
+SUBSECTION_SYSTEM_PROMPT = """Expert OT. Generate patient-specific exercises with DETAILED cues (1-2 sentences each). Description must mention all exercise names. Return JSON only.
 
 Create 2-3 patient-specific exercises. Description MUST mention all exercise names naturally.
 
@@ -147,12 +169,12 @@ Each exercise needs:
 - notes: 1 sentence about contraindications
 
 Format:
-{{
-  "title": "{subsection_info['title']}",
+{
+  "title": "<subsection title from the request>",
   "description": "Start with [Exercise 1 name] to address X, then [Exercise 2 name] for Y, and optionally [Exercise 3 name] to improve Z.",
   "rationale": "Clinical rationale for this approach",
   "exercises": [
-    {{
+    {
       "name": "Specific Exercise Name",
       "description": "Detailed description of how to perform this exercise. Patient positioning and setup. Progression and modifications as needed.",
       "cues": [
@@ -164,24 +186,85 @@ Format:
         "Comprehensive clinical note documenting the exercise performed, patient positioning, number of repetitions or duration, patient response and tolerance, and measurable outcomes achieved."
       ],
       "cpt_codes": [
-        {{"code": "97XXX", "description": "Full billing code description", "notes": "Specific billing notes and time requirements"}}
+        {"code": "97XXX", "description": "Full billing code description", "notes": "Specific billing notes and time requirements"}
       ],
       "notes": "Detailed contraindication or precaution to consider for this specific exercise"
-    }}
+    }
   ]
-}}
+}
 
 Return ONLY JSON. Make cues detailed and comprehensive."""
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Expert OT. Generate patient-specific exercises with DETAILED cues (1-2 sentences each). Description must mention all exercise names. Return JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-            max_tokens=2000
+SUBSECTION_CONFIGS = [
+    {"title": "Manual Therapy Techniques", "focus": "mobilizations, soft tissue work"},
+    {"title": "Progressive Strengthening Protocol", "focus": "strengthening exercises"},
+    {"title": "Neuromuscular Re-education", "focus": "coordination, balance, proprioception"},
+    {"title": "Work-Specific Functional Training", "focus": "functional activities for goals"},
+    {"title": "Pain Management Modalities", "focus": "modalities for pain control"},
+    {"title": "Home Exercise Program", "focus": "home exercises patient can do"}
+]
+
+SUBSECTION_MODEL = "gpt-4o"
+SUBSECTION_PROMPT_VERSION = prompt_version(SUBSECTION_SYSTEM_PROMPT)
+
+async def subsection_sources(patient_condition: str, desired_outcome: str) -> dict:
+    """Source text per subsection title from one shared search + rerank; empty when grounding is off"""
+    if subsection_pool is None:
+        return {}
+    try:
+        return await subsection_pool.sources_by_subsection(f"{patient_condition} {desired_outcome}")
+    except Exception as e:
+        logger.error(f"Subsection retrieval failed, generating ungrounded: {e}")
+        return {}
+
+async def generate_subsection(
+    subsection_info: dict,
+    patient_condition: str,
+    desired_outcome: str,
+    constraints: str = "",
+    sources: str = ""
+) -> dict:
+    """Generate a single subsection using GPT-4o"""
+    try:
+        # Regenerations carry case-specific constraints and always go to the model
+        cache_key = None
+        if not constraints:
+            version = prompt_version(SUBSECTION_PROMPT_VERSION, sources) if sources else SUBSECTION_PROMPT_VERSION
+            cache_key = subsection_key(
+                patient_condition, desired_outcome, subsection_info, version, SUBSECTION_MODEL
+            )
+            cached = subsection_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        client = openai_client
+        
+        prompt = f"""Generate 1 OT treatment subsection for: {patient_condition} | Goal: {desired_outcome}
+
+Subsection: {subsection_info['title']} - {subsection_info['focus']}
+Use "{subsection_info['title']}" as the title."""
+        if sources:
+            prompt += f"\n\n{sources}"
+        if constraints:
+            prompt += f"\n\n{constraints}"
+
+        messages = [
+            {"role": "system", "content": SUBSECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        # One slow upstream response no longer holds up the whole six-way gather
+        response = await llm_caller.call(
+            "subsection",
+            lambda: client.chat.completions.create(
+                model=SUBSECTION_MODEL,
+                messages=messages,
+                temperature=0.8,
+                max_tokens=2000,
+                timeout=settings.LLM_CALL_TIMEOUT_SECONDS
+            ),
+            tokens=estimate_tokens(messages, 2000)
         )
+        llm_usage.record("subsection", response.usage)
         
         content = response.choices[0].message.content.strip()
         
@@ -193,10 +276,13 @@ Return ONLY JSON. Make cues detailed and comprehensive."""
                 lines = lines[:-1]
             content = "\n".join(lines)
         
-        return json.loads(content)
+        subsection = json.loads(content)
+        # Fallbacks from the except branch below are never cached
+        if cache_key:
+            subsection_cache.set(cache_key, subsection)
+        return subsection
         
     except Exception as e:
-        await db.rollback()
         logger.error(f"Error generating subsection {subsection_info['title']}: {e}")
         return {
             "title": subsection_info['title'],
@@ -213,8 +299,20 @@ async def health_check():
         "status": "healthy",
         "version": "2.0.0",
         "database": "connected",
-        "rag_system_ready": False,
-        "feedback_system_ready": True
+        "rag_system_ready": subsection_pool is not None,
+        "feedback_system_ready": True,
+        "threads": resource_config.effective_threads()
+    }
+
+@app.get("/stats")
+async def get_usage_stats():
+    return {
+        "token_usage": llm_usage.get_stats(),
+        "llm_calls": llm_caller.get_stats(),
+        "llm_limiter": llm_limiter.get_stats(),
+        "single_flight": recommendation_flights.get_stats(),
+        "subsection_cache": subsection_cache.get_stats(),
+        "subsection_pool": subsection_pool.get_stats() if subsection_pool else None
     }
 
 # ===== Authentication Routes =====
@@ -311,6 +409,7 @@ async def create_case(
     """Create a new case"""
     try:
         # Generate case name
+        llm_user.set(str(current_user.id))
         name = await generate_case_name(case_data.input_json)
         
         # Create case
@@ -443,6 +542,135 @@ async def delete_case(
         logger.error(f"Delete case error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _find_by_name(items: list, key: str, name: str) -> Optional[int]:
+    wanted = name.strip().lower()
+    for index, item in enumerate(items):
+        if str(item.get(key, "")).strip().lower() == wanted:
+            return index
+    return None
+
+def _regeneration_constraints(
+    request: SubsectionRegenerate,
+    feedback_rows: List[Feedback],
+    keep: List[str],
+    replace: List[str]
+) -> str:
+    """Prompt lines carrying the case's negative feedback and what must change"""
+    avoid_exercises = set(replace) | set(request.avoid_exercises)
+    avoid_cpts = set(request.avoid_cpt_codes)
+    comments = []
+    for row in feedback_rows:
+        if row.rating != "needs-work":
+            continue
+        if row.exercise_name and row.feedback_type == "exercise":
+            avoid_exercises.add(row.exercise_name)
+        if row.cpt_code:
+            avoid_cpts.add(row.cpt_code)
+        if row.comments:
+            target = f" (on {row.exercise_name})" if row.exercise_name else ""
+            comments.append(f"{row.comments}{target}")
+    
+    lines = []
+    if request.exercise_name:
+        lines.append(f'Return exactly 1 exercise, a replacement for "{request.exercise_name}".')
+    if keep:
+        lines.append("The subsection already includes: " + ", ".join(keep) + ". Do not repeat them.")
+    if avoid_exercises:
+        lines.append("Do NOT suggest these exercises: " + ", ".join(sorted(avoid_exercises)) + ".")
+    if avoid_cpts:
+        lines.append("Do NOT use these CPT codes: " + ", ".join(sorted(avoid_cpts)) + ".")
+    # Most recent stored feedback last, older comments dropped to keep the prompt short;
+    # the comment sent with this request is always kept and goes at the end
+    comments = comments[-4:] if request.comments else comments[-5:]
+    if request.comments:
+        comments.append(request.comments)
+    if comments:
+        lines.append("Clinician feedback to address:\n" + "\n".join(f"- {c}" for c in comments))
+    return "\n".join(lines)
+
+@app.post("/cases/{case_id}/subsections/regenerate", response_model=CaseResponse)
+async def regenerate_subsection(
+    case_id: UUID,
+    request: SubsectionRegenerate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Regenerate one subsection (or one exercise in it) of a saved case and patch it in place"""
+    try:
+        result = await db.execute(
+            select(Case).where(Case.id == case_id, Case.user_id == current_user.id)
+        )
+        case = result.scalar_one_or_none()
+        
+        if not case:
+            raise HTTPException(status_code=404, detail="Case not found")
+        
+        output = copy.deepcopy(case.output_json)
+        subsections = output.get("subsections", [])
+        position = _find_by_name(subsections, "title", request.subsection_title)
+        if position is None:
+            raise HTTPException(status_code=404, detail="Subsection not found in case")
+        current = subsections[position]
+        exercises = current.get("exercises", [])
+        names = [exercise.get("name", "") for exercise in exercises]
+        
+        exercise_position = None
+        if request.exercise_name:
+            exercise_position = _find_by_name(exercises, "name", request.exercise_name)
+            if exercise_position is None:
+                raise HTTPException(status_code=404, detail="Exercise not found in subsection")
+        
+        feedback_result = await db.execute(
+            select(Feedback).where(Feedback.case_id == case.id).order_by(Feedback.created_at)
+        )
+        if exercise_position is None:
+            keep, replace = [], names
+        else:
+            keep, replace = [n for n in names if n != names[exercise_position]], [names[exercise_position]]
+        constraints = _regeneration_constraints(request, feedback_result.scalars().all(), keep, replace)
+        
+        subsection_info = next(
+            (config for config in SUBSECTION_CONFIGS if config["title"].lower() == current.get("title", "").lower()),
+            {"title": current.get("title", request.subsection_title), "focus": current.get("title", "")}
+        )
+        llm_user.set(str(current_user.id))
+        patient_condition = case.input_json.get("patient_condition", "")
+        desired_outcome = case.input_json.get("desired_outcome", "")
+        sources = await subsection_sources(patient_condition, desired_outcome)
+        regenerated = await generate_subsection(
+            subsection_info,
+            patient_condition,
+            desired_outcome,
+            constraints,
+            sources.get(subsection_info["title"], "")
+        )
+        if not regenerated.get("exercises"):
+            # generate_subsection returns an empty fallback when the model call fails
+            raise HTTPException(status_code=502, detail="Subsection regeneration failed")
+        
+        if exercise_position is None:
+            subsections[position] = regenerated
+        else:
+            replacement = regenerated["exercises"][0]
+            old_name = names[exercise_position]
+            exercises[exercise_position] = replacement
+            if old_name and current.get("description"):
+                current["description"] = current["description"].replace(old_name, replacement.get("name", old_name))
+        
+        # Reassign so SQLAlchemy sees the JSONB change
+        case.output_json = output
+        await db.commit()
+        await db.refresh(case)
+        
+        logger.info(f"Regenerated '{request.subsection_title}' in case {case.id}")
+        return CaseResponse.model_validate(case)
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Regenerate subsection error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ===== Feedback Routes =====
 
 @app.post("/feedback", response_model=FeedbackResponse)
@@ -500,48 +728,44 @@ class RecommendationRequest(BaseModel):
     user_input: UserInput
     session_id: str
 
+async def build_recommendations(user_input: UserInput) -> dict:
+    # One retrieval pass for the request; each prompt gets only its own slice of the pool
+    sources = await subsection_sources(user_input.patient_condition, user_input.desired_outcome)
+    tasks = [
+        generate_subsection(
+            config,
+            user_input.patient_condition,
+            user_input.desired_outcome,
+            sources=sources.get(config["title"], "")
+        )
+        for config in SUBSECTION_CONFIGS
+    ]
+    
+    subsections = await asyncio.gather(*tasks)
+    
+    return {
+        "high_level": [
+            f"Focus on progressive treatment for {user_input.patient_condition}",
+            f"Incorporate activities to achieve: {user_input.desired_outcome}"
+        ],
+        "subsections": subsections,
+        "suggested_alternatives": ["Consider aquatic therapy if appropriate", "Explore telehealth options for home program"],
+        "confidence": "high"
+    }
+
 @app.post("/recommendations")
 async def get_recommendations(request: RecommendationRequest):
     try:
         logger.info(f"Processing parallel request for session: {request.session_id}")
+        llm_user.set(request.session_id)
         
-        subsection_configs = [
-            {"title": "Manual Therapy Techniques", "focus": "mobilizations, soft tissue work"},
-            {"title": "Progressive Strengthening Protocol", "focus": "strengthening exercises"},
-            {"title": "Neuromuscular Re-education", "focus": "coordination, balance, proprioception"},
-            {"title": "Work-Specific Functional Training", "focus": "functional activities for goals"},
-            {"title": "Pain Management Modalities", "focus": "modalities for pain control"},
-            {"title": "Home Exercise Program", "focus": "home exercises patient can do"}
-        ]
-        
-        loop = asyncio.get_event_loop()
-        tasks = [
-            loop.run_in_executor(
-                executor,
-                generate_subsection,
-                config,
-                request.user_input.patient_condition,
-                request.user_input.desired_outcome
-            )
-            for config in subsection_configs
-        ]
-        
-        subsections = await asyncio.gather(*tasks)
-        
-        response_data = {
-            "high_level": [
-                f"Focus on progressive treatment for {request.user_input.patient_condition}",
-                f"Incorporate activities to achieve: {request.user_input.desired_outcome}"
-            ],
-            "subsections": subsections,
-            "suggested_alternatives": ["Consider aquatic therapy if appropriate", "Explore telehealth options for home program"],
-            "confidence": "high"
-        }
-        
-        return response_data
+        # Identical in-flight requests (retries, double-clicks) share one set of GPT calls
+        return await recommendation_flights.do(
+            request_key(request.user_input.model_dump()),
+            lambda: build_recommendations(request.user_input)
+        )
         
     except Exception as e:
-        await db.rollback()
         logger.error(f"Error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
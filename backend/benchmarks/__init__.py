@@ -0,0 +1,3 @@
+"""
+Benchmarks for retrieval, reranking, chunking and feedback filtering over a synthetic corpus
+"""
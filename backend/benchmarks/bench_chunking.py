@@ -0,0 +1,55 @@
+"""
+Benchmarks for the document_processor chunkers on long synthetic documents
+"""
+
+import pytest
+
+from benchmarks.corpus import generate_document_text
+from core.document_processor import DOCXProcessor, PDFProcessor, TXTProcessor
+
+DOCUMENT_SIZES = [100_000, 1_000_000]
+
+_texts = {}
+def _text(chars: int, style: str) -> str:
+
+    key = (chars, style)
+    if key not in _texts:
+        _texts[key] = generate_document_text(chars, style=style)
+    return _texts[key]
+
+
+@pytest.mark.benchmark(group="chunk_pdf")
+@pytest.mark.parametrize("chars", DOCUMENT_SIZES)
+def bench_pdf_split(benchmark, chars):
+    """PDFProcessor._split_text on extracted page text"""
+    text = _text(chars, "pdf")
+    benchmark.extra_info["document_chars"] = chars
+    assert benchmark(PDFProcessor()._split_text, text)
+
+
+@pytest.mark.benchmark(group="chunk_pdf_headers")
+@pytest.mark.parametrize("chars", DOCUMENT_SIZES)
+def bench_pdf_headers(benchmark, chars):
+    """PDFProcessor._extract_headers over every chunk of a document"""
+    processor = PDFProcessor()
+    chunks = processor._split_text(_text(chars, "pdf"))
+    benchmark.extra_info["document_chars"] = chars
+    benchmark(lambda: [processor._extract_headers(chunk) for chunk in chunks])
+
+
+@pytest.mark.benchmark(group="chunk_docx")
+@pytest.mark.parametrize("chars", DOCUMENT_SIZES)
+def bench_docx_split(benchmark, chars):
+    """DOCXProcessor._split_text on paragraph text with "## " headers"""
+    text = _text(chars, "docx")
+    benchmark.extra_info["document_chars"] = chars
+    assert benchmark(DOCXProcessor()._split_text, text)
+
+
+@pytest.mark.benchmark(group="chunk_txt")
+@pytest.mark.parametrize("chars", DOCUMENT_SIZES)
+def bench_txt_split(benchmark, chars):
+    """TXTProcessor._split_text on plain text"""
+    text = _text(chars, "txt")
+    benchmark.extra_info["document_chars"] = chars
+    assert benchmark(TXTProcessor()._split_text, text)
@@ -0,0 +1,40 @@
+"""
+Benchmarks for FeedbackManager.filter_recommendations
+"""
+
+import copy
+from datetime import datetime
+
+import pytest
+
+from benchmarks.corpus import CPT_CODES, INTERVENTIONS, generate_recommendations
+from core.feedback_manager import FeedbackManager, FeedbackState
+
+
+def _feedback_state() -> FeedbackState:
+
+    codes = list(CPT_CODES)
+    return FeedbackState(
+        session_id="bench",
+        feedback_entries=[],
+        preferences={"cpt_corrections": {codes[0]: codes[1], codes[2]: codes[3]}},
+        blocked_cpts=codes[4:7],
+        blocked_exercises=[title.title() for title in INTERVENTIONS[:5]],
+        preferred_sources=[],
+        last_updated=datetime.now()
+    )
+
+
+@pytest.mark.benchmark(group="feedback_filter")
+@pytest.mark.parametrize("subsections,exercises", [(6, 3), (60, 10)])
+def bench_filter_recommendations(benchmark, subsections, exercises):
+    """filter_recommendations on a fresh copy of a response (it mutates the exercises)"""
+    manager = FeedbackManager()
+    state = _feedback_state()
+    recommendations = generate_recommendations(subsections, exercises)
+    benchmark.extra_info["exercises"] = subsections * exercises
+    benchmark.pedantic(
+        manager.filter_recommendations,
+        setup=lambda: ((state, copy.deepcopy(recommendations)), {}),
+        rounds=200
+    )
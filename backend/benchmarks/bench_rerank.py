@@ -0,0 +1,39 @@
+"""
+Benchmarks for cross-encoder reranking of retrieval candidates
+
+Needs the cross-encoder model (downloaded on first use); skipped when it cannot
+be loaded.
+"""
+
+import itertools
+
+import pytest
+
+from config import settings
+from core.reranker import Reranker
+
+_reranker = None
+
+
+@pytest.fixture(scope="module")
+def reranker():
+    global _reranker
+    if _reranker is None:
+        candidate = Reranker(model_name=settings.RERANK_MODEL)
+        try:
+            candidate.initialize()
+        except Exception as e:
+            pytest.skip(f"Reranker model unavailable: {e}")
+        _reranker = candidate
+    return _reranker
+
+
+@pytest.mark.benchmark(group="reranker_rerank")
+@pytest.mark.parametrize("candidates", [20, 50, 100])
+def bench_rerank(benchmark, reranker, retriever, queries, corpus_size, candidates):
+    """Reranker.rerank over the top retrieval candidates of a query (passage ids pre-tokenized)"""
+    reranker.index_chunks(retriever.document_chunks)
+    pools = itertools.cycle([(query, retriever.search(query, top_k=candidates)) for query in queries[:10]])
+    benchmark.extra_info.update({"corpus_size": corpus_size, "candidates": candidates})
+    results = benchmark(lambda: reranker.rerank(*next(pools), top_n=12))
+    assert 0 < len(results) <= 12
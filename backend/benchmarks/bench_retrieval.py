@@ -0,0 +1,58 @@
+"""
+Benchmarks for hybrid retrieval: full search, BM25 scoring and score boosting
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+BOOSTS = {
+    "source_boosts": {"note_ninjas": 1.0, "cpg": 0.8, "textbook": 0.6},
+    "header_boosts": {"cpt": 1.2, "documentation": 1.1, "exercise": 1.0, "safety": 1.3},
+    "topic_boosts": {"shoulder": 1.1, "balance": 1.05}
+}
+
+
+@pytest.mark.benchmark(group="retriever_search")
+def bench_search(benchmark, retriever, queries, corpus_size):
+    """Retriever.search end to end with the default manifest boosts (hashing query encoder)"""
+    cycle = itertools.cycle(queries)
+    benchmark.extra_info["corpus_size"] = corpus_size
+    results = benchmark(lambda: retriever.search(next(cycle), top_k=50, **BOOSTS))
+    assert len(results) == min(50, corpus_size)
+
+
+@pytest.mark.benchmark(group="bm25_scores")
+def bench_bm25_scores(benchmark, retriever, queries, corpus_size):
+    """BM25Okapi.get_scores over the whole corpus for one query"""
+    tokens = [retriever._tokenize(query) for query in queries]
+    cycle = itertools.cycle(tokens)
+    benchmark.extra_info["corpus_size"] = corpus_size
+    scores = benchmark(lambda: retriever.bm25.get_scores(next(cycle)))
+    assert len(scores) == corpus_size
+
+
+@pytest.mark.benchmark(group="apply_boosts_cold")
+def bench_apply_boosts_cold(benchmark, retriever, corpus_size):
+    """_apply_boosts with the multiplier cache cleared, i.e. the per-chunk boost loop"""
+    scores = np.random.default_rng(0).random(corpus_size)
+    benchmark.extra_info["corpus_size"] = corpus_size
+
+    def run():
+        retriever._boost_cache.clear()
+        return retriever._apply_boosts(scores, BOOSTS["source_boosts"], BOOSTS["header_boosts"], BOOSTS["topic_boosts"])
+
+    assert len(benchmark(run)) == corpus_size
+
+
+@pytest.mark.benchmark(group="apply_boosts_warm")
+def bench_apply_boosts_warm(benchmark, retriever, corpus_size):
+    """_apply_boosts when the multipliers for this manifest are already cached"""
+    scores = np.random.default_rng(0).random(corpus_size)
+    benchmark.extra_info["corpus_size"] = corpus_size
+    retriever._apply_boosts(scores, BOOSTS["source_boosts"], BOOSTS["header_boosts"], BOOSTS["topic_boosts"])
+    result = benchmark(
+        retriever._apply_boosts, scores, BOOSTS["source_boosts"], BOOSTS["header_boosts"], BOOSTS["topic_boosts"]
+    )
+    assert len(result) == corpus_size
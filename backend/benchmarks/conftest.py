@@ -0,0 +1,44 @@
+"""
+Shared fixtures for the benchmark suite
+
+Corpus sizes come from --corpus-sizes (default 1000,10000); any benchmark that
+takes the corpus_size fixture runs once per size, so autosaved results give a
+scaling curve per commit.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from benchmarks.corpus import build_retriever, generate_chunks, generate_queries
+
+_retrievers = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--corpus-sizes", default="1000,10000", help="Comma-separated synthetic corpus sizes")
+    parser.addoption("--corpus-seed", type=int, default=7, help="Seed for the synthetic corpus")
+
+
+def pytest_generate_tests(metafunc):
+    if "corpus_size" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("--corpus-sizes").split(",") if size.strip()]
+        metafunc.parametrize("corpus_size", sizes, scope="session")
+
+
+@pytest.fixture(scope="session")
+def queries():
+    return generate_queries(50)
+
+
+@pytest.fixture(scope="session")
+def retriever(request, corpus_size, tmp_path_factory):
+    """One in-memory retriever per corpus size, shared by every benchmark in the run"""
+    if corpus_size not in _retrievers:
+        chunks = generate_chunks(corpus_size, seed=request.config.getoption("--corpus-seed"))
+        _retrievers[corpus_size] = build_retriever(chunks, str(tmp_path_factory.mktemp(f"store_{corpus_size}")))
+    return _retrievers[corpus_size]
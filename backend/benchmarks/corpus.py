@@ -0,0 +1,273 @@
+"""
+Synthetic OT/PT-style corpus generator for benchmarks
+
+Produces DocumentChunks that look like the real corpus: Note Ninjas documentation
+banks with CPT/billing sections, CPG recommendations with page references and
+textbook background, in roughly the real source mix. Generation is seeded and
+streamed, so corpora from 1k to 1M chunks are reproducible without holding the
+text twice.
+
+Run with: python -m benchmarks.corpus --chunks 100000 --out corpus.jsonl [--seed 7]
+"""
+
+import hashlib
+import json
+import random
+import re
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+from core.document_processor import DocumentChunk
+
+REGIONS = {
+    "shoulder": ["rotator cuff tear", "adhesive capsulitis", "shoulder impingement", "proximal humerus fracture"],
+    "elbow": ["lateral epicondylitis", "medial epicondylitis", "olecranon bursitis"],
+    "wrist and hand": ["carpal tunnel syndrome", "distal radius fracture", "de Quervain tenosynovitis", "trigger finger"],
+    "hip": ["total hip arthroplasty", "hip osteoarthritis", "femoral neck fracture"],
+    "knee": ["total knee arthroplasty", "ACL reconstruction", "patellofemoral pain", "meniscus repair"],
+    "ankle": ["ankle sprain", "Achilles tendinopathy", "ankle fracture ORIF"],
+    "spine": ["low back pain", "cervical radiculopathy", "lumbar stenosis"],
+    "neuro": ["CVA with hemiparesis", "Parkinson's disease", "traumatic brain injury", "multiple sclerosis"]
+}
+
+INTERVENTIONS = [
+    "scapular retraction with resistance band", "pendulum exercises", "wall slides", "sleeper stretch",
+    "isometric external rotation", "grip strengthening with putty", "tendon gliding", "nerve gliding",
+    "wrist flexor eccentrics", "sit to stand training", "step-ups", "terminal knee extension",
+    "quad sets", "heel slides", "single leg balance", "tandem gait training", "bridging",
+    "dead bug progression", "bird dog", "functional reaching in standing", "upper body dressing training",
+    "kitchen task simulation", "weight shifting in sitting", "task-specific grasp and release",
+    "constraint-induced movement therapy", "mirror therapy", "joint mobilization grade II",
+    "soft tissue mobilization", "proprioceptive neuromuscular facilitation", "fine motor coordination tasks"
+]
+
+CPT_CODES = {
+    "97110": "Therapeutic exercise, each 15 minutes",
+    "97112": "Neuromuscular re-education, each 15 minutes",
+    "97140": "Manual therapy techniques, each 15 minutes",
+    "97530": "Therapeutic activities, each 15 minutes",
+    "97535": "Self-care/home management training, each 15 minutes",
+    "97116": "Gait training, each 15 minutes",
+    "97760": "Orthotic management and training, initial encounter",
+    "97165": "OT evaluation, low complexity",
+    "97166": "OT evaluation, moderate complexity",
+    "97167": "OT evaluation, high complexity",
+    "97035": "Ultrasound, each 15 minutes",
+    "97032": "Electrical stimulation, manual, each 15 minutes",
+    "97018": "Paraffin bath"
+}
+
+SECTION_HEADERS = {
+    "note_ninjas": [
+        "Documentation Examples", "CPT Codes and Billing", "Exercise Progression", "Verbal Cues",
+        "Tactile Cues", "Home Exercise Program", "Safety Considerations", "OTPF Terminology", "Goals"
+    ],
+    "cpg": [
+        "Recommendations", "Level of Evidence", "Contraindications", "Safety Considerations",
+        "Clinical Practice Guideline Summary", "Interventions", "Outcome Measures"
+    ],
+    "textbook": ["Anatomy", "Pathophysiology", "Background", "Biomechanics", "Assessment"]
+}
+
+SOURCE_MIX = [("note_ninjas", 0.4), ("cpg", 0.4), ("textbook", 0.2)]
+
+CUES = [
+    "Verbal: keep your shoulder blade down and back as you lift.",
+    "Verbal: breathe out as you push through your heels.",
+    "Tactile: light pressure at the inferior angle of the scapula to facilitate upward rotation.",
+    "Tactile: hand on the lateral knee to prevent valgus collapse.",
+    "Visual: mirror feedback to monitor trunk lean.",
+    "Visual: demonstrate the movement at half speed before the patient attempts it."
+]
+
+_WORD = re.compile(r"\b\w+\b")
+def _source_type(rng: random.Random) -> str:
+
+    roll = rng.random()
+    total = 0.0
+    for source_type, weight in SOURCE_MIX:
+        total += weight
+        if roll < total:
+            return source_type
+    return SOURCE_MIX[-1][0]
+def _paragraph(rng: random.Random, source_type: str, region: str, condition: str, header: str) -> str:
+
+    intervention = rng.choice(INTERVENTIONS)
+    code = rng.choice(list(CPT_CODES))
+    sets, reps = rng.randint(2, 4), rng.choice([8, 10, 12, 15])
+    sentences = [
+        f"For patients with {condition}, {intervention} is used to improve {region} function and participation in daily occupations.",
+        f"Perform {sets} sets of {reps} repetitions, progressing resistance when the patient completes all sets with good form and pain below 3/10.",
+        "Monitor for compensatory movement and reduce range if symptoms increase during or after the session."
+    ]
+    if source_type == "note_ninjas":
+        if "CPT" in header or rng.random() < 0.5:
+            sentences.append(f"Bill as CPT {code} ({CPT_CODES[code]}) when skilled instruction and progression are documented.")
+        if "Cue" in header or rng.random() < 0.4:
+            sentences.append(rng.choice(CUES))
+        sentences.append(
+            f"Documentation: Pt performed {intervention} {sets}x{reps} with min verbal cues for form; "
+            f"tolerated well with no increase in {region} pain, demonstrating improved motor control."
+        )
+    elif source_type == "cpg":
+        grade = rng.choice(["A", "B", "C"])
+        sentences.append(
+            f"Clinicians should use {intervention} for individuals with {condition} (Grade {grade} recommendation, "
+            f"level {rng.choice(['I', 'II', 'III'])} evidence)."
+        )
+        if "Contraindication" in header or rng.random() < 0.3:
+            sentences.append(f"Avoid aggressive loading of the {region} in the first 6 weeks after surgical repair.")
+    else:
+        sentences.append(
+            f"The {region} relies on coordinated activation of stabilizing and prime mover muscles, "
+            f"which is often disrupted in {condition}."
+        )
+    rng.shuffle(sentences)
+    return " ".join(sentences)
+def iter_chunks(count: int, seed: int = 7) -> Iterator[DocumentChunk]:
+
+    rng = random.Random(seed)
+    regions = list(REGIONS)
+    documents_per_source = max(1, count // 40)
+
+    for i in range(count):
+        source_type = _source_type(rng)
+        region = rng.choice(regions)
+        condition = rng.choice(REGIONS[region])
+        document = rng.randrange(documents_per_source)
+        headers = rng.sample(SECTION_HEADERS[source_type], k=rng.randint(1, 3))
+        paragraphs = [
+            _paragraph(rng, source_type, region, condition, headers[0])
+            for _ in range(rng.randint(1, 3))
+        ]
+        source_id = f"{source_type}_{region.replace(' ', '_')}_{document:05d}"
+        yield DocumentChunk(
+            content="\n\n".join(paragraphs),
+            source_type=source_type,
+            source_id=source_id,
+            title=f"{condition.title()} - {headers[0]}",
+            headers=headers,
+            page_ref=f"p. {rng.randint(1, 400)}" if source_type != "note_ninjas" else None,
+            chunk_id=f"{source_id}_{i:07d}"
+        )
+def generate_chunks(count: int, seed: int = 7) -> List[DocumentChunk]:
+
+    return list(iter_chunks(count, seed))
+def generate_queries(count: int, seed: int = 11) -> List[str]:
+
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        region = rng.choice(list(REGIONS))
+        condition = rng.choice(REGIONS[region])
+        goal = rng.choice(["return to work", "independent dressing", "pain-free reaching", "safe stair climbing"])
+        queries.append(f"{condition} {region} exercises for {goal} with CPT codes and documentation")
+    return queries
+def generate_document_text(chars: int, seed: int = 13, style: str = "docx") -> str:
+
+    # Long single-document text for the chunkers; docx style uses "## " headers like the DOCX processor emits
+    rng = random.Random(seed)
+    parts: List[str] = []
+    size = 0
+    while size < chars:
+        source_type = "note_ninjas" if style == "docx" else rng.choice(["cpg", "textbook"])
+        region = rng.choice(list(REGIONS))
+        condition = rng.choice(REGIONS[region])
+        header = rng.choice(SECTION_HEADERS[source_type])
+        heading = f"## {header}" if style == "docx" else header.upper()
+        section = heading + "\n" + "\n".join(
+            _paragraph(rng, source_type, region, condition, header) for _ in range(rng.randint(2, 5))
+        )
+        parts.append(section)
+        size += len(section) + 2
+    return "\n\n".join(parts)[:chars]
+def generate_recommendations(subsections: int, exercises: int, seed: int = 17) -> Dict[str, Any]:
+
+    rng = random.Random(seed)
+    return {
+        "high_level": ["Progress loading as tolerated", "Reassess weekly"],
+        "subsections": [
+            {
+                "title": f"Subsection {s + 1}",
+                "rationale": "Synthetic rationale",
+                "exercises": [
+                    {
+                        "title": rng.choice(INTERVENTIONS).title(),
+                        "description": "Synthetic description",
+                        "cues": rng.sample(CUES, k=2),
+                        "documentation": "Synthetic documentation",
+                        "cpt": rng.choice(list(CPT_CODES)),
+                        "notes": "Synthetic notes"
+                    }
+                    for _ in range(exercises)
+                ]
+            }
+            for s in range(subsections)
+        ],
+        "suggested_alternatives": [],
+        "confidence": "medium"
+    }
+class HashingEncoder:
+
+
+    # Deterministic bag-of-words embeddings (feature hashing), so retrieval benchmarks
+    # exercise the real scoring path without loading an embedding model
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+        self._buckets: Dict[str, int] = {}
+
+    def _bucket(self, token: str) -> int:
+
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest, "big")
+            self._buckets[token] = bucket
+        return bucket
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _WORD.findall(text.lower()):
+                bucket = self._bucket(token)
+                vectors[row, bucket % self.dimensions] += 1.0 if bucket & (1 << 63) else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+def build_retriever(chunks: List[DocumentChunk], vector_store_path: str, encoder: Any = None):
+
+    from core.retriever import Retriever
+
+    # Builds the indexes in memory; Retriever.initialize would also persist embeddings to disk
+    encoder = encoder or HashingEncoder()
+    retriever = Retriever(vector_store_path=vector_store_path)
+    retriever.use_openai = False
+    retriever.openai_client = None
+    retriever.async_openai_client = None
+    retriever.embedding_model = encoder
+    retriever.document_chunks = chunks
+    retriever._prepare_bm25()
+    retriever.chunk_embeddings = np.vstack([
+        encoder.encode([chunk.content for chunk in chunks[i:i + 10000]])
+        for i in range(0, len(chunks), 10000)
+    ])
+    retriever.index_version = f"synthetic-{len(chunks)}"
+    return retriever
+def main():
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic OT/PT corpus as JSONL DocumentChunks")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        for chunk in iter_chunks(args.chunks, args.seed):
+            f.write(json.dumps(chunk.to_dict()) + "\n")
+    print(f"Wrote {args.chunks} chunks to {args.out}")
+if __name__ == "__main__":
+    main()
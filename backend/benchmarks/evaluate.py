@@ -0,0 +1,430 @@
+"""
+Recall-versus-latency evaluation of retriever configurations
+
+Sweeps dense search (exact or IVF-style ANN), embedding quantization, score
+fusion and rerank depth over a labelled query set and reports recall@k, nDCG@k,
+MRR and per-query latency per configuration, plus the Pareto frontier of
+quality against p50 latency.
+
+Labels are JSON mapping a clinical condition (used as the query) to relevant
+chunk or source ids, or JSONL lines of {"query": ..., "relevant": [...]}. A
+result counts as relevant when its chunk_id or source_id is listed.
+
+Latency covers scoring, fusion, ranking and reranking; query embeddings are
+computed once per query and reported separately. numpy has no BLAS kernels for
+float16/int8, so for quantized configurations the index size and recall are the
+signals to read, not the latency.
+
+Run with:
+    python -m benchmarks.evaluate --labels labels.json [--vector-store ./vector_store]
+    python -m benchmarks.evaluate --synthetic 10000 --dense exact,ann --quantization float32,int8
+"""
+
+import itertools
+import json
+import math
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.corpus import REGIONS, build_retriever, generate_chunks
+from core.retriever import RetrievalResult
+
+RRF_K = 60
+
+
+@dataclass(frozen=True)
+class RetrievalConfig:
+    dense: str = "exact"
+    quantization: str = "float32"
+    fusion: str = "linear"
+    rerank_depth: int = 0
+    nprobe: int = 0
+
+    @property
+    def name(self) -> str:
+
+        dense = f"ann(nprobe={self.nprobe})" if self.dense == "ann" else self.dense
+        rerank = f"rerank@{self.rerank_depth}" if self.rerank_depth else "no-rerank"
+        return f"{dense}/{self.quantization}/{self.fusion}/{rerank}"
+def load_labels(path: str) -> List[Tuple[str, List[str]]]:
+
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    if isinstance(data, dict):
+        return [(condition, list(ids)) for condition, ids in data.items() if ids]
+    return [
+        (item.get("query") or item["condition"], list(item["relevant"]))
+        for item in data
+        if item.get("relevant")
+    ]
+def synthetic_labels(chunks: List[Any]) -> List[Tuple[str, List[str]]]:
+
+    # Relevant = the condition's CPT/billing chunks, so each query has a small labelled set
+    by_title: Dict[str, List[str]] = {}
+    for chunk in chunks:
+        by_title.setdefault(chunk.title, []).append(chunk.chunk_id)
+    labels = []
+    for conditions in REGIONS.values():
+        for condition in conditions:
+            relevant = by_title.get(f"{condition.title()} - CPT Codes and Billing")
+            if relevant:
+                labels.append((f"{condition} CPT codes and billing", relevant))
+    return labels
+def score_ranking(ranked: List[Any], relevant: List[str], k: int) -> Dict[str, float]:
+
+    relevant_ids = set(relevant)
+    seen = set()
+    gains = []
+    first_hit = 0
+    for rank, chunk in enumerate(ranked[:k], start=1):
+        match = chunk.chunk_id if chunk.chunk_id in relevant_ids else chunk.source_id
+        if match in relevant_ids and match not in seen:
+            seen.add(match)
+            gains.append(1.0 / math.log2(rank + 1))
+            first_hit = first_hit or rank
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant_ids), k) + 1))
+    return {
+        "recall": len(seen) / len(relevant_ids) if relevant_ids else 0.0,
+        "ndcg": sum(gains) / ideal if ideal else 0.0,
+        "mrr": 1.0 / first_hit if first_hit else 0.0
+    }
+def pareto_frontier(rows: List[Dict[str, Any]], quality: str, latency: str = "p50_ms") -> List[str]:
+
+    frontier = []
+    for row in rows:
+        dominated = any(
+            other[quality] >= row[quality] and other[latency] <= row[latency]
+            and (other[quality] > row[quality] or other[latency] < row[latency])
+            for other in rows
+        )
+        if not dominated:
+            frontier.append(row["config"])
+    return sorted(frontier, key=lambda name: next(r[latency] for r in rows if r["config"] == name))
+def _percentile(values: List[float], pct: float) -> float:
+
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+class DenseIndex:
+
+
+    # Chunk embeddings in one precision, scored exactly or through an inverted file of k-means cells
+    def __init__(self, embeddings: np.ndarray, quantization: str, lists: int = 0, seed: int = 0):
+        self.quantization = quantization
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if quantization == "float16":
+            self.matrix = embeddings.astype(np.float16)
+        elif quantization == "int8":
+            self.scale = np.abs(embeddings).max(axis=1) / 127.0
+            self.scale[self.scale == 0] = 1.0
+            self.matrix = np.round(embeddings / self.scale[:, None]).astype(np.int8)
+        elif quantization == "float32":
+            self.matrix = embeddings
+        else:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.lists: List[np.ndarray] = []
+        self.centroids = None
+        if lists:
+            self._build_ivf(embeddings, lists, seed)
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.matrix.nbytes + (self.scale.nbytes if self.quantization == "int8" else 0)
+
+    def _build_ivf(self, embeddings: np.ndarray, lists: int, seed: int, iterations: int = 10):
+
+        rng = np.random.default_rng(seed)
+        lists = min(lists, len(embeddings))
+        sample = embeddings[rng.choice(len(embeddings), size=min(len(embeddings), lists * 40), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cell in range(lists):
+                members = sample[assignment == cell]
+                if len(members):
+                    centroids[cell] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assignment = np.concatenate([
+            np.argmax(embeddings[i:i + 10000] @ centroids.T, axis=1)
+            for i in range(0, len(embeddings), 10000)
+        ])
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == cell) for cell in range(lists)]
+
+    def _dot(self, rows: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if self.quantization == "float16":
+            return np.dot(matrix, query.astype(np.float16)).astype(np.float32)
+        if self.quantization == "int8":
+            query_scale = max(float(np.abs(query).max()) / 127.0, 1e-12)
+            query_i8 = np.round(query / query_scale).astype(np.int32)
+            scale = self.scale if rows is None else self.scale[rows]
+            return np.dot(matrix, query_i8).astype(np.float32) * scale * query_scale
+        return np.dot(matrix, query)
+
+    def scores(self, query: np.ndarray, nprobe: int = 0) -> np.ndarray:
+
+        if not nprobe or self.centroids is None:
+            return self._dot(None, query)
+        cells = np.argsort(self.centroids @ query)[::-1][:nprobe]
+        rows = np.concatenate([self.lists[cell] for cell in cells])
+        partial = self._dot(rows, query)
+        # Chunks outside the probed cells rank below every probed one
+        scores = np.full(self.matrix.shape[0], partial.min() if len(partial) else 0.0, dtype=np.float32)
+        scores[rows] = partial
+        return scores
+class Evaluator:
+
+
+    def __init__(
+        self,
+        retriever: Any,
+        labels: List[Tuple[str, List[str]]],
+        k: int = 10,
+        reranker: Any = None,
+        boosts: Optional[Dict[str, Any]] = None,
+        ann_lists: int = 0
+    ):
+        self.retriever = retriever
+        self.labels = labels
+        self.k = k
+        self.reranker = reranker
+        self.boosts = boosts or {}
+        self.ann_lists = ann_lists or max(1, int(math.sqrt(len(retriever.document_chunks))))
+        self._indexes: Dict[Tuple[str, bool], DenseIndex] = {}
+
+        started = time.perf_counter()
+        self.query_embeddings = [
+            np.asarray(retriever._generate_query_embedding_sync(query), dtype=np.float32)[0]
+            for query, _ in labels
+        ]
+        self.embed_ms = (time.perf_counter() - started) * 1000 / max(1, len(labels))
+
+    def _index(self, config: RetrievalConfig) -> DenseIndex:
+
+        key = (config.quantization, config.dense == "ann")
+        if key not in self._indexes:
+            self._indexes[key] = DenseIndex(
+                self.retriever.chunk_embeddings,
+                config.quantization,
+                lists=self.ann_lists if config.dense == "ann" else 0
+            )
+        return self._indexes[key]
+
+    def _fuse(self, fusion: str, bm25_scores: np.ndarray, dense_scores: np.ndarray) -> np.ndarray:
+
+        if fusion == "linear":
+            # Same weighting as Retriever._rank_results
+            return 0.5 * self.retriever._normalize_scores(bm25_scores) + 0.5 * self.retriever._normalize_scores(dense_scores)
+        if fusion == "rrf":
+            fused = np.zeros(len(bm25_scores))
+            for scores in (bm25_scores, dense_scores):
+                ranks = np.empty(len(scores))
+                ranks[np.argsort(scores)[::-1]] = np.arange(1, len(scores) + 1)
+                fused += 1.0 / (RRF_K + ranks)
+            return fused
+        if fusion == "bm25":
+            return self.retriever._normalize_scores(bm25_scores)
+        if fusion == "dense":
+            return self.retriever._normalize_scores(dense_scores)
+        raise ValueError(f"Unknown fusion: {fusion}")
+
+    def search(self, config: RetrievalConfig, query: str, query_embedding: np.ndarray) -> List[Any]:
+
+        index = self._index(config)
+        bm25_scores = (
+            self.retriever.bm25.get_scores(self.retriever._tokenize(query))
+            if config.fusion != "dense" else np.zeros(len(self.retriever.document_chunks))
+        )
+        dense_scores = (
+            index.scores(query_embedding, config.nprobe if config.dense == "ann" else 0)
+            if config.fusion != "bm25" else np.zeros(len(self.retriever.document_chunks))
+        )
+        combined = self._fuse(config.fusion, bm25_scores, dense_scores)
+        if self.boosts:
+            combined = self.retriever._apply_boosts(
+                combined,
+                self.boosts.get("source_boosts"),
+                self.boosts.get("header_boosts"),
+                self.boosts.get("topic_boosts")
+            )
+
+        depth = max(config.rerank_depth, self.k)
+        top = np.argpartition(-combined, min(depth, len(combined) - 1))[:depth]
+        top = top[np.argsort(-combined[top])]
+        if not config.rerank_depth:
+            return [self.retriever.document_chunks[i] for i in top[:self.k]]
+
+        candidates = [
+            RetrievalResult(
+                chunk=self.retriever.document_chunks[i],
+                bm25_score=bm25_scores[i],
+                dense_score=dense_scores[i],
+                combined_score=combined[i],
+                query=query
+            )
+            for i in top
+        ]
+        return [result.chunk for result in self.reranker.rerank(query, candidates, top_n=self.k)]
+
+    def evaluate(self, config: RetrievalConfig) -> Dict[str, Any]:
+
+        index = self._index(config)
+        # Warm-up so lazy setup (boost multipliers, reranker caches) stays out of the timings
+        self.search(config, self.labels[0][0], self.query_embeddings[0])
+
+        latencies = []
+        totals = {"recall": 0.0, "ndcg": 0.0, "mrr": 0.0}
+        for (query, relevant), embedding in zip(self.labels, self.query_embeddings):
+            started = time.perf_counter()
+            ranked = self.search(config, query, embedding)
+            latencies.append((time.perf_counter() - started) * 1000)
+            for metric, value in score_ranking(ranked, relevant, self.k).items():
+                totals[metric] += value
+
+        count = len(self.labels)
+        return {
+            "config": config.name,
+            **asdict(config),
+            f"recall@{self.k}": round(totals["recall"] / count, 4),
+            f"ndcg@{self.k}": round(totals["ndcg"] / count, 4),
+            "mrr": round(totals["mrr"] / count, 4),
+            "mean_ms": round(sum(latencies) / count, 3),
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "index_mb": round(index.nbytes / 1e6, 2)
+        }
+
+    def sweep(self, configs: List[RetrievalConfig]) -> Dict[str, Any]:
+
+        rows = [self.evaluate(config) for config in configs]
+        return {
+            "queries": len(self.labels),
+            "chunks": len(self.retriever.document_chunks),
+            "k": self.k,
+            "embed_ms": round(self.embed_ms, 3),
+            "results": rows,
+            "pareto": {
+                metric: pareto_frontier(rows, metric)
+                for metric in (f"recall@{self.k}", f"ndcg@{self.k}", "mrr")
+            }
+        }
+def build_configs(
+    dense: List[str],
+    quantization: List[str],
+    fusion: List[str],
+    rerank_depths: List[int],
+    nprobes: List[int]
+) -> List[RetrievalConfig]:
+
+    configs = []
+    for mode, precision, method, depth in itertools.product(dense, quantization, fusion, rerank_depths):
+        if method == "bm25" and (mode != dense[0] or precision != quantization[0]):
+            # Dense settings do not change a BM25-only ranking
+            continue
+        for nprobe in (nprobes if mode == "ann" else [0]):
+            configs.append(RetrievalConfig(mode, precision, method, depth, nprobe))
+    return configs
+def format_report(report: Dict[str, Any]) -> str:
+
+    k = report["k"]
+    columns = ["config", f"recall@{k}", f"ndcg@{k}", "mrr", "p50_ms", "p95_ms", "index_mb"]
+    widths = [max(len(col), *(len(str(row[col])) for row in report["results"])) for col in columns]
+    lines = [
+        f"{report['queries']} queries over {report['chunks']} chunks, "
+        f"query embedding {report['embed_ms']:.1f}ms/query (not included below)",
+        "  ".join(col.ljust(width) for col, width in zip(columns, widths))
+    ]
+    for row in report["results"]:
+        lines.append("  ".join(str(row[col]).ljust(width) for col, width in zip(columns, widths)))
+    lines.append("")
+    for metric, frontier in report["pareto"].items():
+        lines.append(f"Pareto frontier ({metric} vs p50_ms): " + " -> ".join(frontier))
+    return "\n".join(lines)
+def _load_retriever(vector_store_path: str):
+
+    from core.retriever import Retriever
+
+    retriever = Retriever(vector_store_path=vector_store_path)
+    if not retriever._load_embeddings():
+        raise SystemExit(f"No processed index in {vector_store_path}; run process_documents.py first")
+    if not retriever.use_openai:
+        retriever.embedding_model = retriever._load_embedding_model()
+    retriever._prepare_bm25()
+    retriever.index_version = retriever._generate_documents_hash(retriever.document_chunks)[:16]
+    return retriever
+def main():
+
+    import argparse
+    import tempfile
+
+    from config import settings
+
+    parser = argparse.ArgumentParser(description="Sweep retriever configurations over a labelled query set")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--labels", help="JSON {condition: [ids]} or JSONL {query, relevant} file")
+    source.add_argument("--synthetic", type=int, metavar="CHUNKS", help="Use a synthetic corpus with generated labels")
+    parser.add_argument("--vector-store", default=settings.VECTOR_STORE_PATH)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dense", default="exact,ann")
+    parser.add_argument("--quantization", default="float32,float16,int8")
+    parser.add_argument("--fusion", default="linear,rrf")
+    parser.add_argument("--rerank-depths", default="0", help="0 = no reranking, e.g. 0,20,50")
+    parser.add_argument("--nprobe", default="4,16", help="Cells probed by the ANN configurations")
+    parser.add_argument("--ann-lists", type=int, default=0, help="ANN cells (default: sqrt of the corpus size)")
+    parser.add_argument("--boosts", help="JSON with source_boosts/header_boosts/topic_boosts to apply after fusion")
+    parser.add_argument("--json", help="Also write the full report as JSON")
+    args = parser.parse_args()
+
+    split = lambda value: [item.strip() for item in value.split(",") if item.strip()]
+
+    if args.synthetic:
+        chunks = generate_chunks(args.synthetic)
+        retriever = build_retriever(chunks, tempfile.mkdtemp(prefix="eval_store_"))
+        labels = synthetic_labels(chunks)
+    else:
+        retriever = _load_retriever(args.vector_store)
+        labels = load_labels(args.labels)
+    if not labels:
+        raise SystemExit("No labelled queries")
+
+    rerank_depths = [int(depth) for depth in split(args.rerank_depths)]
+    reranker = None
+    if any(rerank_depths):
+        from core.reranker import Reranker
+
+        reranker = Reranker(model_name=settings.RERANK_MODEL)
+        reranker.initialize()
+        reranker.index_chunks(retriever.document_chunks)
+
+    boosts = None
+    if args.boosts:
+        with open(args.boosts, encoding="utf-8") as f:
+            boosts = json.load(f)
+
+    evaluator = Evaluator(retriever, labels, k=args.k, reranker=reranker, boosts=boosts, ann_lists=args.ann_lists)
+    configs = build_configs(
+        split(args.dense),
+        split(args.quantization),
+        split(args.fusion),
+        rerank_depths,
+        [int(nprobe) for nprobe in split(args.nprobe)]
+    )
+    report = evaluator.sweep(configs)
+    print(format_report(report))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Scaling curves from saved pytest-benchmark results
+
+Reads one or more --benchmark-json/--benchmark-autosave files and prints, per
+benchmark and commit, mean/median latency against corpus (or document) size.
+
+Run with: python -m benchmarks.scaling .benchmarks/*/*.json [--out curves.json]
+"""
+
+import json
+import re
+from collections import defaultdict
+from typing import Any, Dict, List
+
+_PARAMS = re.compile(r"\[.*\]$")
+def _size(bench: Dict[str, Any]) -> Any:
+
+    extra = bench.get("extra_info") or {}
+    params = bench.get("params") or {}
+    for key in ("corpus_size", "document_chars", "exercises", "candidates"):
+        if key in extra:
+            return extra[key]
+        if key in params:
+            return params[key]
+    return None
+def _series_name(bench: Dict[str, Any]) -> str:
+
+    # Parameters other than the size axis stay in the name (e.g. rerank candidates)
+    name = _PARAMS.sub("", bench["name"])
+    params = dict(bench.get("params") or {})
+    params.pop("corpus_size", None)
+    params.pop("chars", None)
+    extra = {k: v for k, v in sorted(params.items()) if k not in ("subsections", "exercises")}
+    if extra:
+        name += "[" + ",".join(f"{k}={v}" for k, v in extra.items()) + "]"
+    return name
+def build_curves(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+
+    curves: Dict[str, Dict[str, List[Dict[str, Any]]]] = defaultdict(lambda: defaultdict(list))
+    for report in reports:
+        commit = (report.get("commit_info") or {}).get("id", "unknown")[:12]
+        for bench in report.get("benchmarks", []):
+            stats = bench["stats"]
+            curves[_series_name(bench)][commit].append({
+                "size": _size(bench),
+                "mean_ms": round(stats["mean"] * 1000, 4),
+                "median_ms": round(stats["median"] * 1000, 4),
+                "stddev_ms": round(stats["stddev"] * 1000, 4),
+                "ops": round(stats["ops"], 2)
+            })
+    return {
+        name: {
+            commit: sorted(points, key=lambda p: (p["size"] is None, p["size"] or 0))
+            for commit, points in by_commit.items()
+        }
+        for name, by_commit in sorted(curves.items())
+    }
+def main():
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build latency-vs-size curves from pytest-benchmark JSON")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--out", help="Write curves as JSON instead of printing a table")
+    args = parser.parse_args()
+
+    reports = []
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            reports.append(json.load(f))
+    curves = build_curves(reports)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(curves, f, indent=2)
+        print(f"Wrote {len(curves)} curves to {args.out}")
+        return
+
+    for name, by_commit in curves.items():
+        print(name)
+        for commit, points in by_commit.items():
+            row = "  ".join(f"{p['size']}: {p['mean_ms']:.3f}ms" for p in points)
+            print(f"  {commit}  {row}")
+if __name__ == "__main__":
+    main()
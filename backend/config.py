@@ -38,12 +38,74 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
     OPENAI_CHAT_MODEL: str = "gpt-4o-mini"
+    LLM_CALL_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_REQUESTS_PER_MINUTE: int = 0  # 0 = no limit; set to the account's quota
+    LLM_TOKENS_PER_MINUTE: int = 0  # 0 = no limit; set to the account's quota
+    LLM_MAX_IN_FLIGHT: int = 32
+    BATCH_CONCURRENCY: int = 8
+    BATCH_POLL_INTERVAL_SECONDS: float = 30.0
     
 
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
     
 
+    CPU_CORE_BUDGET: int = 0  # 0 uses os.cpu_count()
+    WORKER_COUNT: int = 0  # 0 falls back to WEB_CONCURRENCY
+    TORCH_INTRA_OP_THREADS: int = 0  # 0 derives from the core budget
+    BLAS_THREADS: int = 0  # 0 derives from the core budget
+    RETRIEVAL_POOL_SIZE: int = 4
+    RERANK_POOL_SIZE: int = 2
+    MICRO_BATCH_ENABLED: bool = True
+    MICRO_BATCH_MAX_WAIT_MS: float = 2.0
+    EMBEDDING_MICRO_BATCH_SIZE: int = 64
+    RERANK_MICRO_BATCH_SIZE: int = 8
+    MODEL_SERVER_SOCKET: str = ""  # Unix socket of a shared model server; empty loads models in-process
+    
+
+    RESPONSE_CACHE_BACKEND: str = "memory"  # none, memory, sqlite
+    RESPONSE_CACHE_TTL_SECONDS: float = 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_PATH: str = "./cache/responses.sqlite"
+    SUBSECTION_CACHE_TTL_SECONDS: float = 86400
+    SUBSECTION_CACHE_MAX_ENTRIES: int = 5000  # 0 disables the subsection cache
+    SUBSECTION_GROUNDING_ENABLED: bool = False  # app_with_db: ground subsection prompts in the processed index
+    SUBSECTION_POOL_SIZE: int = 60
+    SUBSECTION_POOL_RERANK_TOP_N: int = 30
+    SUBSECTION_SOURCES_PER_PROMPT: int = 4
+    
+
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 500
+    SEMANTIC_CACHE_TTL_SECONDS: float = 3600
+    CANDIDATE_CACHE_TTL_SECONDS: float = 900
+    CANDIDATE_CACHE_MAX_SESSIONS: int = 1000  # 0 disables session candidate reuse
+    CANDIDATE_POOL_SIZE: int = 0  # candidates kept for feedback re-ranking; 0 = rag_manifest.max_sources
+    
+
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTERS: str = "log"  # comma-separated: log, jsonl, otlp
+    TRACING_JSONL_PATH: str = "./traces/spans.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318"
+    
+
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    CONTEXT_MAX_TOKENS_PER_SOURCE: int = 400
+    CONTEXT_MIN_OVERLAP_CHARS: int = 40
+    
+
+    SINGLE_FLIGHT_ENABLED: bool = True
+    RECOMMENDATION_DEADLINE_SECONDS: float = 12.0  # 0 disables the deadline
+    DEADLINE_CACHE_LATE_RESULTS: bool = True
+    
+
     FEEDBACK_STORAGE_TYPE: str = "memory"  # memory, redis, database
     
 
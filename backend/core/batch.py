@@ -0,0 +1,409 @@
+"""
+Offline batch recommendations over JSONL case files
+
+Each input line is a RecommendationRequest, optionally with an "id". Results are
+appended to the output JSONL as they complete, and the output file doubles as the
+checkpoint: ids already written with status "ok" are skipped when a run resumes.
+
+Two modes are supported:
+  - online: requests go through the regular pipeline with bounded concurrency
+  - provider: retrieval runs locally and the generations are submitted through the
+    provider's discounted asynchronous batch endpoint (or the local stub)
+
+Run with: python -m core.batch input.jsonl output.jsonl [--concurrency N] [--provider-batch] [--local-stub]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from models.request_models import RecommendationRequest
+from config import settings
+from .feedback_manager import as_feedback_state
+
+logger = logging.getLogger(__name__)
+
+_ACTIVE_BATCH_STATUSES = {"validating", "in_progress", "finalizing", "cancelling"}
+class ProviderBatchFailed(RuntimeError):
+
+    pass
+def read_requests(path: str) -> Iterator[Tuple[str, RecommendationRequest]]:
+
+    seen: Set[str] = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            item_id = str(record.pop("id", None) or record.get("session_id") or f"line-{line_no}")
+            if item_id in seen:
+                logger.warning(f"Duplicate id {item_id} on line {line_no}, using line-{line_no}")
+                item_id = f"line-{line_no}"
+            seen.add(item_id)
+            yield item_id, RecommendationRequest.model_validate(record)
+def inline_feedback_state(request: RecommendationRequest) -> Any:
+
+    # Input files carry feedback inline; the API passes a lookup into the FeedbackManager instead
+    return as_feedback_state(request.feedback_state)
+def load_completed(path: str) -> Set[str]:
+
+    completed: Set[str] = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a truncated last line
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+    return completed
+def result_record(item_id: str, request: RecommendationRequest, response: Any = None, error: Optional[str] = None) -> Dict[str, Any]:
+
+    record = {"id": item_id, "session_id": request.session_id, "status": "error" if error else "ok"}
+    if error:
+        record["error"] = error
+    else:
+        record["response"] = response.model_dump(mode="json")
+    return record
+class _ResultWriter:
+
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        truncated = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                truncated = f.read(1) != b"\n"
+        self.file = open(path, "a", encoding="utf-8")
+        if truncated:
+            # Start after the partial line a killed run left behind
+            self.file.write("\n")
+        self.ok = 0
+        self.errors = 0
+
+    def write(self, record: Dict[str, Any]):
+
+        self.file.write(json.dumps(record, default=str) + "\n")
+        self.file.flush()
+        if record["status"] == "ok":
+            self.ok += 1
+        else:
+            self.errors += 1
+
+    def close(self):
+
+        self.file.close()
+class BatchRunner:
+
+
+    def __init__(
+        self,
+        rag_system: Any,
+        concurrency: Optional[int] = None,
+        feedback_lookup: Optional[Callable[[RecommendationRequest], Any]] = None
+    ):
+        self.rag_system = rag_system
+        self.concurrency = max(1, concurrency or settings.BATCH_CONCURRENCY)
+        self.feedback_lookup = feedback_lookup or inline_feedback_state
+
+    async def process(self, items: Iterable[Tuple[str, RecommendationRequest]]) -> AsyncIterator[Dict[str, Any]]:
+
+        pending = iter(items)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            try:
+                # Workers share one iterator, so at most `concurrency` requests are in flight
+                for item_id, request in pending:
+                    results.put_nowait(await self._process_one(item_id, request))
+            finally:
+                results.put_nowait(None)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        remaining = len(workers)
+        try:
+            while remaining:
+                record = await results.get()
+                if record is None:
+                    remaining -= 1
+                    continue
+                yield record
+        finally:
+            for task in workers:
+                if not task.done():
+                    task.cancel()
+
+    async def _process_one(self, item_id: str, request: RecommendationRequest) -> Dict[str, Any]:
+
+        try:
+            response = await self.rag_system.generate_recommendations(
+                user_input=request.user_input,
+                rag_manifest=request.rag_manifest,
+                session_id=request.session_id,
+                feedback_state=self.feedback_lookup(request)
+            )
+            return result_record(item_id, request, response)
+        except Exception as e:
+            logger.error(f"Batch item {item_id} failed: {e}")
+            return result_record(item_id, request, error=str(e))
+
+    async def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+
+        started = time.perf_counter()
+        completed = load_completed(output_path)
+        items = [(item_id, request) for item_id, request in read_requests(input_path) if item_id not in completed]
+        logger.info(f"Batch: {len(items)} to process, {len(completed)} already completed")
+
+        writer = _ResultWriter(output_path)
+        try:
+            async for record in self.process(items):
+                writer.write(record)
+        finally:
+            writer.close()
+
+        return {
+            "mode": "online",
+            "processed": writer.ok + writer.errors,
+            "ok": writer.ok,
+            "errors": writer.errors,
+            "skipped": len(completed),
+            "seconds": round(time.perf_counter() - started, 2)
+        }
+class LocalBatchProvider:
+
+
+    def __init__(self, respond: Optional[Callable[[Dict[str, Any]], str]] = None):
+        self.respond = respond or self._default_response
+        self._batches: Dict[str, List[Dict[str, Any]]] = {}
+        self._submitted = 0
+
+    def _default_response(self, body: Dict[str, Any]) -> str:
+
+        return json.dumps({
+            "high_level": ["Generated by the local batch stub"],
+            "subsections": [],
+            "suggested_alternatives": [],
+            "confidence": "low"
+        })
+
+    async def submit(self, lines: List[Dict[str, Any]]) -> str:
+
+        self._submitted += 1
+        batch_id = f"local_batch_{self._submitted}"
+        self._batches[batch_id] = lines
+        return batch_id
+
+    async def poll(self, batch_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+
+        results = {}
+        for line in self._batches.pop(batch_id, []):
+            try:
+                results[line["custom_id"]] = {"content": self.respond(line["body"])}
+            except Exception as e:
+                results[line["custom_id"]] = {"error": str(e)}
+        return results
+class OpenAIBatchProvider:
+
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    async def submit(self, lines: List[Dict[str, Any]]) -> str:
+
+        payload = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        input_file = await self.client.files.create(file=("batch.jsonl", payload), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    async def poll(self, batch_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status in _ACTIVE_BATCH_STATUSES:
+            return None
+        if batch.status == "failed":
+            raise ProviderBatchFailed(f"Provider batch {batch_id} failed: {batch.errors}")
+
+        # completed, expired and cancelled batches return whatever finished
+        results: Dict[str, Dict[str, Any]] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    results[record["custom_id"]] = self._parse_result(record)
+        return results
+
+    def _parse_result(self, record: Dict[str, Any]) -> Dict[str, Any]:
+
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            return {"error": str(record.get("error") or response.get("body"))}
+        return {"content": response["body"]["choices"][0]["message"]["content"]}
+class ProviderBatchRunner:
+
+
+    def __init__(
+        self,
+        rag_system: Any,
+        provider: Any,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        feedback_lookup: Optional[Callable[[RecommendationRequest], Any]] = None
+    ):
+        self.rag_system = rag_system
+        self.provider = provider
+        self.concurrency = max(1, concurrency or settings.BATCH_CONCURRENCY)
+        self.poll_interval = poll_interval if poll_interval is not None else settings.BATCH_POLL_INTERVAL_SECONDS
+        self.feedback_lookup = feedback_lookup or inline_feedback_state
+
+    async def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+
+        started = time.perf_counter()
+        state_path = f"{output_path}.pending.json"
+        completed = load_completed(output_path)
+        items = {item_id: request for item_id, request in read_requests(input_path) if item_id not in completed}
+
+        submitted = None
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                submitted = json.load(f)
+            logger.info(f"Resuming provider batch {submitted['batch_id']}")
+
+        writer = _ResultWriter(output_path)
+        try:
+            pending = await self._prepare(items, writer, only=set(submitted["ids"]) if submitted else None)
+
+            if submitted is None and pending:
+                lines = [
+                    {"custom_id": item_id, "method": "POST", "url": "/v1/chat/completions", "body": state["body"]}
+                    for item_id, state in pending.items()
+                ]
+                batch_id = await self.provider.submit(lines)
+                submitted = {"batch_id": batch_id, "ids": list(pending)}
+                # Written before polling so a restarted run picks the batch up instead of resubmitting
+                with open(state_path, "w", encoding="utf-8") as f:
+                    json.dump(submitted, f)
+                logger.info(f"Submitted provider batch {batch_id} with {len(lines)} requests")
+
+            if submitted is not None:
+                try:
+                    results = await self._wait(submitted["batch_id"])
+                except ProviderBatchFailed as e:
+                    # Terminal: record the failure and drop the state so the next run resubmits these ids
+                    logger.error(str(e))
+                    results = {item_id: {"error": str(e)} for item_id in pending}
+                for item_id, state in pending.items():
+                    result = results.get(item_id, {"error": "missing from provider batch output"})
+                    if "error" in result:
+                        writer.write(result_record(item_id, items[item_id], error=result["error"]))
+                        continue
+                    response = self.rag_system.finish_batch_request(result["content"], state)
+                    writer.write(result_record(item_id, items[item_id], response))
+                os.remove(state_path)
+        finally:
+            writer.close()
+
+        return {
+            "mode": "provider",
+            "batch_id": submitted["batch_id"] if submitted else None,
+            "processed": writer.ok + writer.errors,
+            "ok": writer.ok,
+            "errors": writer.errors,
+            "skipped": len(completed),
+            "seconds": round(time.perf_counter() - started, 2)
+        }
+
+    async def _prepare(
+        self,
+        items: Dict[str, RecommendationRequest],
+        writer: _ResultWriter,
+        only: Optional[Set[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending: Dict[str, Dict[str, Any]] = {}
+
+        async def prepare(item_id: str, request: RecommendationRequest):
+            async with semaphore:
+                try:
+                    cached, state = await self.rag_system.prepare_batch_request(
+                        user_input=request.user_input,
+                        rag_manifest=request.rag_manifest,
+                        session_id=request.session_id,
+                        feedback_state=self.feedback_lookup(request)
+                    )
+                except Exception as e:
+                    logger.error(f"Batch item {item_id} failed during retrieval: {e}")
+                    writer.write(result_record(item_id, request, error=str(e)))
+                    return
+            if cached is not None:
+                writer.write(result_record(item_id, request, cached))
+            else:
+                pending[item_id] = state
+
+        selected = [(item_id, request) for item_id, request in items.items() if only is None or item_id in only]
+        await asyncio.gather(*[prepare(item_id, request) for item_id, request in selected])
+        # Keep input order for the submitted file
+        return {item_id: pending[item_id] for item_id, _ in selected if item_id in pending}
+
+    async def _wait(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+
+        while True:
+            results = await self.provider.poll(batch_id)
+            if results is not None:
+                return results
+            await asyncio.sleep(self.poll_interval)
+def main():
+
+    import argparse
+
+    from resources import resource_config
+
+    parser = argparse.ArgumentParser(description="Generate recommendations for a JSONL file of requests")
+    parser.add_argument("input", help="JSONL file of RecommendationRequest objects")
+    parser.add_argument("output", help="JSONL file results are appended to; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=None, help="Requests processed at once")
+    parser.add_argument("--provider-batch", action="store_true", help="Submit generations through the provider batch API")
+    parser.add_argument("--local-stub", action="store_true", help="Use the local batch stub instead of the provider")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    resource_config.apply()
+    # Offline runs wait for the model rather than degrading to the extractive answer
+    settings.RECOMMENDATION_DEADLINE_SECONDS = 0
+
+    from .gpt_rag_system import GPTRAGSystem
+
+    async def run():
+        rag_system = GPTRAGSystem(
+            note_ninjas_path=settings.NOTE_NINJAS_PATH,
+            cpg_paths=settings.CPG_PATHS,
+            vector_store_path=settings.VECTOR_STORE_PATH
+        )
+        await rag_system.initialize()
+
+        if args.provider_batch or args.local_stub:
+            provider = LocalBatchProvider() if args.local_stub else OpenAIBatchProvider(rag_system.openai_client)
+            runner = ProviderBatchRunner(rag_system, provider, concurrency=args.concurrency)
+        else:
+            runner = BatchRunner(rag_system, concurrency=args.concurrency)
+        return await runner.run(args.input, args.output)
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+if __name__ == "__main__":
+    main()
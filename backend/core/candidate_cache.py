@@ -0,0 +1,111 @@
+"""
+Session-scoped cache of retrieval candidates and their component scores
+
+A follow-up request in the same session with an unchanged query (typically only
+the feedback changed) reuses the candidates. The boosts derived from feedback
+are reapplied to the cached rerank scores and the sources re-selected, with no
+query embedding, BM25 or cross-encoder work.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .document_processor import DocumentChunk
+from .feedback_manager import as_feedback_state
+from .response_cache import InMemoryResponseCache, request_key
+from .retriever import RetrievalResult
+from config import settings
+def retrieval_key(query: str, top_k: int) -> str:
+
+    # Everything that decides the candidate set; boosts and feedback are applied on top
+    return request_key({"query": query, "top_k": top_k})
+def feedback_boosts(feedback_manager: Any, feedback_state: Any) -> Tuple[Dict[str, float], Dict[str, float]]:
+
+    feedback_state = as_feedback_state(feedback_state)
+    if feedback_state is None:
+        return {}, {}
+    manifest = feedback_manager.apply_feedback_to_request(feedback_state, {}).get("rag_manifest", {})
+    return manifest.get("source_boosts", {}), manifest.get("topic_boosts", {})
+@dataclass
+class CandidateSet:
+    key: str
+    index_version: str
+    query: str
+    chunks: List[DocumentChunk]
+    positions: np.ndarray
+    bm25_scores: np.ndarray
+    dense_scores: np.ndarray
+    combined_scores: np.ndarray
+    rerank_scores: np.ndarray
+
+    @classmethod
+    def from_results(
+        cls,
+        key: str,
+        index_version: str,
+        query: str,
+        results: List[RetrievalResult],
+        rerank_scores: np.ndarray
+    ) -> "CandidateSet":
+
+        return cls(
+            key=key,
+            index_version=index_version,
+            query=query,
+            chunks=[result.chunk for result in results],
+            positions=np.array([result.position for result in results], dtype=int),
+            bm25_scores=np.array([result.bm25_score for result in results], dtype=float),
+            dense_scores=np.array([result.dense_score for result in results], dtype=float),
+            combined_scores=np.array([result.combined_score for result in results], dtype=float),
+            rerank_scores=np.asarray(rerank_scores, dtype=float)
+        )
+
+    def results(self) -> List[RetrievalResult]:
+
+        # Fresh objects every time: the reranker writes rerank_score onto what it is given
+        return [
+            RetrievalResult(
+                chunk=chunk,
+                bm25_score=float(self.bm25_scores[i]),
+                dense_score=float(self.dense_scores[i]),
+                combined_score=float(self.combined_scores[i]),
+                query=self.query,
+                position=int(self.positions[i])
+            )
+            for i, chunk in enumerate(self.chunks)
+        ]
+
+    def boosted_rerank_scores(self, multipliers: Optional[np.ndarray]) -> np.ndarray:
+
+        # multipliers covers the whole corpus (Retriever.boost_multipliers); the reranker reports
+        # probabilities, so each candidate's score is scaled by the one at its position
+        if multipliers is None:
+            return self.rerank_scores
+        return self.rerank_scores * multipliers[self.positions]
+class SessionCandidateCache(InMemoryResponseCache):
+
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_sessions: Optional[int] = None):
+        super().__init__(
+            ttl_seconds if ttl_seconds is not None else settings.CANDIDATE_CACHE_TTL_SECONDS,
+            max_sessions if max_sessions is not None else settings.CANDIDATE_CACHE_MAX_SESSIONS
+        )
+
+    def lookup(self, session_id: str, key: str, index_version: str) -> Optional[CandidateSet]:
+
+        # One candidate set per session: it only serves the same query on the same index
+        candidates = self._get(session_id) if session_id else None
+        if candidates is not None and (candidates.key != key or candidates.index_version != index_version):
+            candidates = None
+        if candidates is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return candidates
+
+    def set(self, session_id: str, candidates: CandidateSet):
+
+        if session_id:
+            super().set(session_id, candidates)
@@ -0,0 +1,121 @@
+"""
+Per-chunk annotation columns computed once at ingestion
+
+The extractive generator used to rerun its regexes and content.lower() scans on
+every chunk of every request. They now run once per chunk and the results are
+kept on the chunk and persisted with it in chunks.json. The columns are the
+topic label, CPT codes, cue lines and keyword flags. Request-time assembly and
+retrieval filters read these columns.
+"""
+
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+ANNOTATION_VERSION = 1
+
+CPT_PATTERN = re.compile(r'\b(97\d{3}|96\d{3}|95\d{3})\b')
+CUE_PREFIX = re.compile(r'^[•\-*\d+\.]\s*')
+NUMBERED_LINE = re.compile(r'^\d+\.')
+@dataclass
+class ChunkAnnotations:
+    topic: str
+    cpt_codes: List[str] = field(default_factory=list)
+    primary_cpt: Optional[str] = None
+    cue_lines: List[str] = field(default_factory=list)
+    instructed: bool = False
+    assessed: bool = False
+    mentions_balance: bool = False
+    mentions_strength: bool = False
+    version: int = ANNOTATION_VERSION
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["ChunkAnnotations"]:
+
+        # Annotations written by an older extractor are recomputed
+        if not data or data.get("version") != ANNOTATION_VERSION:
+            return None
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+def extract_topic(headers: List[str], content_lower: str) -> str:
+
+    topic = "General Exercises"
+    for header in headers or []:
+        if len(header) > 5 and len(header) < 50:
+            topic = header
+            break
+
+    if "transfer" in content_lower or "sit to stand" in content_lower:
+        topic = "Transfer Training"
+    elif "balance" in content_lower:
+        topic = "Balance Training"
+    elif "strength" in content_lower or "resistance" in content_lower:
+        topic = "Strength Training"
+    elif "endurance" in content_lower or "cardiovascular" in content_lower:
+        topic = "Endurance Training"
+    elif "cognitive" in content_lower or "memory" in content_lower:
+        topic = "Cognitive Training"
+    return topic
+def extract_cue_lines(content: str) -> List[str]:
+
+    cues = []
+    for line in content.split('\n'):
+        line = line.strip()
+        if line and (
+            line.startswith('•') or
+            line.startswith('-') or
+            line.startswith('*') or
+            NUMBERED_LINE.match(line)
+        ):
+            cue = CUE_PREFIX.sub('', line)
+            if len(cue) > 5 and len(cue) < 100:
+                cues.append(cue)
+    return cues[:5]
+def extract_cpt_codes(content: str) -> List[str]:
+
+    return list(dict.fromkeys(CPT_PATTERN.findall(content)))
+def primary_cpt_code(cpt_codes: List[str], content: str, content_lower: str) -> Optional[str]:
+
+    if cpt_codes:
+        return cpt_codes[0]
+    if "97530" in content or "therapeutic exercise" in content_lower:
+        return "97530"
+    elif "97535" in content or "self-care" in content_lower:
+        return "97535"
+    elif "97110" in content or "therapeutic activity" in content_lower:
+        return "97110"
+    return None
+def annotate_chunk(chunk: Any) -> ChunkAnnotations:
+
+    content = chunk.content
+    content_lower = content.lower()
+    cpt_codes = extract_cpt_codes(content)
+    return ChunkAnnotations(
+        topic=extract_topic(chunk.headers, content_lower),
+        cpt_codes=cpt_codes,
+        primary_cpt=primary_cpt_code(cpt_codes, content, content_lower),
+        cue_lines=extract_cue_lines(content),
+        instructed="instructed" in content_lower,
+        assessed="assessed" in content_lower,
+        mentions_balance="balance" in content_lower,
+        mentions_strength="strength" in content_lower
+    )
+def annotations_for(chunk: Any) -> ChunkAnnotations:
+
+    # Chunks built outside ingestion (tests, ad-hoc scripts) are annotated on first use
+    annotations = getattr(chunk, "annotations", None)
+    if annotations is None:
+        annotations = annotate_chunk(chunk)
+        chunk.annotations = annotations
+    return annotations
+def annotate_chunks(chunks: Iterable[Any]) -> int:
+
+    annotated = 0
+    for chunk in chunks:
+        if getattr(chunk, "annotations", None) is None:
+            chunk.annotations = annotate_chunk(chunk)
+            annotated += 1
+    return annotated
@@ -0,0 +1,222 @@
+"""
+Token-budgeted packing of reranked sources into the generation prompt
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9]+")
+class TokenCounter:
+
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            logger.warning("tiktoken not installed, approximating token counts as chars/4")
+        except Exception as e:
+            # tiktoken downloads its encoding files on first use; offline hosts fall back too
+            logger.warning(f"tiktoken encoding for {model_name} unavailable ({e}), approximating token counts as chars/4")
+
+    def count(self, text: str) -> int:
+
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        return text[:max_tokens * 4]
+class PackedContext:
+
+
+    def __init__(self):
+        self.sections: List[str] = []
+        self.tokens = 0
+        self.included = 0
+        self.dropped = 0
+        self.truncated = 0
+        self.overlap_chars_removed = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.sections)
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        return {
+            "tokens": self.tokens,
+            "included": self.included,
+            "dropped": self.dropped,
+            "truncated": self.truncated,
+            "overlap_chars_removed": self.overlap_chars_removed
+        }
+class ContextPacker:
+
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        max_tokens_per_source: Optional[int] = None,
+        min_overlap_chars: Optional[int] = None,
+        counter: Optional[TokenCounter] = None
+    ):
+        self.token_budget = token_budget if token_budget is not None else settings.CONTEXT_TOKEN_BUDGET
+        self.max_tokens_per_source = (
+            max_tokens_per_source if max_tokens_per_source is not None else settings.CONTEXT_MAX_TOKENS_PER_SOURCE
+        )
+        self.min_overlap_chars = (
+            min_overlap_chars if min_overlap_chars is not None else settings.CONTEXT_MIN_OVERLAP_CHARS
+        )
+        self.counter = counter or TokenCounter(settings.OPENAI_CHAT_MODEL)
+        self.packs = 0
+        self.total_tokens = 0
+        self.total_included = 0
+        self.total_dropped = 0
+        self.total_overlap_chars_removed = 0
+
+    def pack(self, results: List[Any], query: str, header: str = "") -> PackedContext:
+
+        packed = PackedContext()
+        if header:
+            packed.sections.append(header)
+            packed.tokens = self.counter.count(header)
+
+        query_terms = set(_WORD.findall(query.lower()))
+        included_by_source: Dict[str, List[str]] = {}
+        ranked = sorted(results, key=self._score, reverse=True)
+
+        for result in ranked:
+            chunk = result.chunk
+            remaining = self.token_budget - packed.tokens
+            if remaining <= 0:
+                packed.dropped += 1
+                continue
+
+            original = chunk.content.strip()
+            content = original
+            for previous in included_by_source.get(chunk.source_id, []):
+                stripped = self._strip_overlap(content, previous)
+                packed.overlap_chars_removed += len(content) - len(stripped)
+                content = stripped
+            if content != original and len(content) < self.min_overlap_chars:
+                # Little or nothing left beyond what an adjacent chunk already contributed
+                packed.dropped += 1
+                continue
+
+            prefix = self._source_prefix(packed.included + 1, chunk)
+            prefix_tokens = self.counter.count(prefix)
+            content_budget = min(self.max_tokens_per_source, remaining - prefix_tokens)
+            if content_budget < 32:
+                packed.dropped += 1
+                continue
+
+            content_tokens = self.counter.count(content)
+            if content_tokens > content_budget:
+                content = self._select_sentences(content, query_terms, content_budget)
+                content_tokens = self.counter.count(content)
+                packed.truncated += 1
+
+            section = f"{prefix}Content: {content}"
+            packed.sections.append(section)
+            packed.tokens += prefix_tokens + content_tokens
+            packed.included += 1
+            included_by_source.setdefault(chunk.source_id, []).append(chunk.content.strip())
+
+        self.packs += 1
+        self.total_tokens += packed.tokens
+        self.total_included += packed.included
+        self.total_dropped += packed.dropped
+        self.total_overlap_chars_removed += packed.overlap_chars_removed
+        return packed
+
+    def _score(self, result: Any) -> float:
+
+        rerank_score = getattr(result, "rerank_score", None)
+        return float(rerank_score if rerank_score is not None else result.combined_score)
+
+    def _source_prefix(self, number: int, chunk: Any) -> str:
+
+        lines = [f"\nSource {number}:", f"Type: {chunk.source_type}", f"File: {chunk.source_id}"]
+        if chunk.headers:
+            lines.append(f"Headers: {', '.join(chunk.headers)}")
+        if chunk.page_ref:
+            lines.append(f"Page: {chunk.page_ref}")
+        return "\n".join(lines) + "\n"
+
+    def _strip_overlap(self, content: str, previous: str) -> str:
+
+        # Adjacent chunks of one source share up to CHUNK_OVERLAP characters at their boundary
+        if content in previous:
+            return ""
+        probe = content[:self.min_overlap_chars]
+        if len(probe) == self.min_overlap_chars:
+            start = previous.find(probe)
+            while start != -1:
+                tail = previous[start:]
+                if content.startswith(tail):
+                    return content[len(tail):].lstrip()
+                start = previous.find(probe, start + 1)
+
+        probe = content[-self.min_overlap_chars:]
+        if len(probe) == self.min_overlap_chars:
+            end = previous.rfind(probe)
+            while end != -1:
+                head = previous[:end + len(probe)]
+                if content.endswith(head):
+                    return content[:-len(head)].rstrip()
+                end = previous.rfind(probe, 0, end + len(probe) - 1)
+        return content
+
+    def _select_sentences(self, content: str, query_terms: set, max_tokens: int) -> str:
+
+        sentences = [s.strip() for s in _SENTENCE_SPLIT.split(content) if s.strip()]
+        if len(sentences) <= 1:
+            return self.counter.truncate(content, max_tokens)
+
+        # Keep the sentences that share the most terms with the query, in document order
+        scored = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(query_terms & set(_WORD.findall(sentences[i].lower()))), i)
+        )
+        chosen = []
+        used = 0
+        for i in scored:
+            tokens = self.counter.count(sentences[i]) + 1
+            if used + tokens > max_tokens:
+                continue
+            chosen.append(i)
+            used += tokens
+        if not chosen:
+            return self.counter.truncate(sentences[scored[0]], max_tokens)
+        return " ".join(sentences[i] for i in sorted(chosen))
+
+    def get_stats(self) -> Dict[str, Any]:
+
+        return {
+            "token_budget": self.token_budget,
+            "packs": self.packs,
+            "avg_context_tokens": self.total_tokens / self.packs if self.packs else 0.0,
+            "avg_sources_included": self.total_included / self.packs if self.packs else 0.0,
+            "sources_dropped": self.total_dropped,
+            "overlap_chars_removed": self.total_overlap_chars_removed
+        }
@@ -14,6 +14,8 @@ import PyPDF2
 import docx
 from docx import Document
 
+from .chunk_annotations import annotate_chunks
+
 logger = logging.getLogger(__name__)
 class DocumentChunk:
 
@@ -26,7 +28,8 @@ class DocumentChunk:
         title: str,
         headers: List[str],
         page_ref: Optional[str] = None,
-        chunk_id: str = None
+        chunk_id: str = None,
+        annotations: Optional[Any] = None
     ):
         self.content = content
         self.source_type = source_type
@@ -35,6 +38,8 @@ class DocumentChunk:
         self.headers = headers
         self.page_ref = page_ref
         self.chunk_id = chunk_id or self._generate_chunk_id()
+        # ChunkAnnotations filled in at ingestion (see chunk_annotations.py)
+        self.annotations = annotations
     
     def _generate_chunk_id(self) -> str:
 
@@ -43,7 +48,7 @@ class DocumentChunk:
     
     def to_dict(self) -> Dict[str, Any]:
 
-        return {
+        data = {
             "content": self.content,
             "source_type": self.source_type,
             "source_id": self.source_id,
@@ -52,6 +57,9 @@ class DocumentChunk:
             "page_ref": self.page_ref,
             "chunk_id": self.chunk_id
         }
+        if self.annotations is not None:
+            data["annotations"] = self.annotations.to_dict()
+        return data
 class DocumentProcessor(ABC):
 
     
@@ -408,7 +416,9 @@ class DocumentProcessorFactory:
 
         processor = self.get_processor(file_path)
         if processor:
-            return processor.process_file(file_path)
+            chunks = processor.process_file(file_path)
+            annotate_chunks(chunks)
+            return chunks
         else:
             logger.warning(f"No processor found for file: {file_path}")
             return []
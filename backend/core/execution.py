@@ -0,0 +1,123 @@
+"""
+Execution pools for running blocking retrieval and reranking work off the event loop
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from resources import resource_config
+
+logger = logging.getLogger(__name__)
+class ExecutionPool:
+
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-pool"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+
+        job = {"started": False, "abandoned": False}
+        with self._lock:
+            self.queued += 1
+
+        # Carry context variables (e.g. the active tracing span) into the worker thread
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(context.run, self._tracked_call, job, fn, *args, **kwargs)
+            )
+        finally:
+            # A caller cancelled while its job was still queued: the job will never be counted as started
+            with self._lock:
+                if not job["started"]:
+                    job["abandoned"] = True
+                    self.queued -= 1
+
+    def _tracked_call(self, job: Dict[str, bool], fn: Callable[..., Any], *args, **kwargs) -> Any:
+
+        with self._lock:
+            if job["abandoned"]:
+                return None
+            job["started"] = True
+            self.queued -= 1
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def get_stats(self) -> Dict[str, int]:
+
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "completed": self.completed
+            }
+
+    def shutdown(self, wait: bool = True):
+
+        self.executor.shutdown(wait=wait)
+class ExecutionPools:
+
+
+    def __init__(self, pool_sizes: Optional[Dict[str, int]] = None):
+        pool_sizes = pool_sizes or {
+            "retrieval": resource_config.retrieval_pool_size,
+            "rerank": resource_config.rerank_pool_size
+        }
+        self.pools: Dict[str, ExecutionPool] = {
+            name: ExecutionPool(name, size) for name, size in pool_sizes.items()
+        }
+
+    def get(self, name: str) -> ExecutionPool:
+
+        if name not in self.pools:
+            raise KeyError(f"Unknown execution pool: {name}")
+        return self.pools[name]
+
+    async def run(self, name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+
+        return await self.get(name).run(fn, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+
+        return {name: pool.get_stats() for name, pool in self.pools.items()}
+
+    def shutdown(self, wait: bool = True):
+
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
+        logger.info("Execution pools shut down")
+_execution_pools: Optional[ExecutionPools] = None
+def get_execution_pools() -> ExecutionPools:
+
+    global _execution_pools
+    if _execution_pools is None:
+        _execution_pools = ExecutionPools()
+    return _execution_pools
+def shutdown_execution_pools(wait: bool = True):
+
+    global _execution_pools
+    if _execution_pools is not None:
+        _execution_pools.shutdown(wait=wait)
+        _execution_pools = None
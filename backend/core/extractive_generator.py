@@ -0,0 +1,331 @@
+"""
+Extractive, LLM-free recommendation generation from reranked chunks
+"""
+
+from typing import Dict, Any, List, Optional
+
+from .chunk_annotations import ChunkAnnotations, annotations_for
+from .document_processor import DocumentChunk
+from .feedback_manager import FeedbackState
+from models.request_models import UserInput
+from models.response_models import (
+    RecommendationResponse, Subsection, Exercise, Source, Alternative,
+    SourceType, ConfidenceLevel
+)
+class ExtractiveGenerator:
+
+    
+    def generate(
+        self,
+        chunks: List[Dict[str, Any]],
+        user_input: UserInput,
+        feedback_state: Optional[FeedbackState]
+    ) -> RecommendationResponse:
+
+        
+
+        note_ninjas_chunks = [c for c in chunks if c["chunk"].source_type == "note_ninjas"]
+        if feedback_state and feedback_state.blocked_cpts:
+            # Drop blocked-CPT chunks before exercises are picked so other chunks fill their slots
+            blocked = set(feedback_state.blocked_cpts)
+            note_ninjas_chunks = [
+                c for c in note_ninjas_chunks if annotations_for(c["chunk"]).primary_cpt not in blocked
+            ]
+        cpg_chunks = [c for c in chunks if c["chunk"].source_type == "cpg"]
+        
+
+        high_level = self._extract_high_level_recommendations(chunks, user_input)
+        
+
+        subsections = self._extract_subsections(note_ninjas_chunks, user_input)
+        
+
+        alternatives = self._extract_alternatives(cpg_chunks, user_input)
+        
+
+        confidence = self._determine_confidence(chunks, note_ninjas_chunks)
+        
+
+        response = RecommendationResponse(
+            high_level=high_level,
+            subsections=subsections,
+            suggested_alternatives=alternatives,
+            confidence=confidence
+        )
+        
+
+        if feedback_state:
+            response = self._apply_feedback_filtering(response, feedback_state)
+        
+        return response
+    
+    def _extract_high_level_recommendations(
+        self,
+        chunks: List[Dict[str, Any]],
+        user_input: UserInput
+    ) -> List[str]:
+
+        
+        recommendations = []
+        
+
+        for chunk_data in chunks[:5]:  # Top 5 chunks
+            chunk = chunk_data["chunk"]
+            content = chunk.content
+            
+
+            if "prioritize" in content.lower() or "focus on" in content.lower():
+
+                sentences = content.split('.')
+                for sentence in sentences:
+                    if len(sentence.strip()) > 20 and len(sentence.strip()) < 200:
+                        if any(word in sentence.lower() for word in ["prioritize", "focus", "emphasize"]):
+                            recommendations.append(sentence.strip())
+                            break
+        
+
+        if not recommendations:
+            if user_input.diagnosis:
+                recommendations.append(f"Focus on evidence-based interventions for {user_input.diagnosis}")
+            if user_input.desired_outcome:
+                recommendations.append(f"Target specific outcomes: {user_input.desired_outcome}")
+        
+        return recommendations[:3]  # Limit to 3 recommendations
+    
+    def _extract_subsections(
+        self,
+        chunks: List[Dict[str, Any]],
+        user_input: UserInput
+    ) -> List[Subsection]:
+
+        
+        subsections = []
+        
+
+        topic_groups = self._group_chunks_by_topic(chunks)
+        
+        for topic, topic_chunks in topic_groups.items():
+            if len(topic_chunks) < 2:  # Need at least 2 chunks for a subsection
+                continue
+            
+
+            exercises = self._extract_exercises_from_chunks(topic_chunks, user_input)
+            
+            if exercises:
+                subsection = Subsection(
+                    title=topic,
+                    rationale=self._generate_rationale(topic_chunks, user_input),
+                    exercises=exercises
+                )
+                subsections.append(subsection)
+        
+        return subsections[:4]  # Limit to 4 subsections
+    
+    def _group_chunks_by_topic(self, chunks: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+
+        
+        topic_groups = {}
+        
+        for chunk_data in chunks:
+            chunk = chunk_data["chunk"]
+            
+
+            topic = annotations_for(chunk).topic
+            
+            if topic not in topic_groups:
+                topic_groups[topic] = []
+            topic_groups[topic].append(chunk_data)
+        
+        return topic_groups
+    
+    def _extract_exercises_from_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        user_input: UserInput
+    ) -> List[Exercise]:
+
+        
+        exercises = []
+        
+        for chunk_data in chunks[:3]:  # Limit to 3 exercises per subsection
+            chunk = chunk_data["chunk"]
+            
+
+            exercise = self._parse_exercise_from_chunk(chunk, user_input)
+            if exercise:
+                exercises.append(exercise)
+        
+        return exercises
+    
+    def _parse_exercise_from_chunk(
+        self,
+        chunk: DocumentChunk,
+        user_input: UserInput
+    ) -> Optional[Exercise]:
+
+        
+        content = chunk.content
+        annotations = annotations_for(chunk)
+        
+
+        title = chunk.title
+        if chunk.headers:
+            title = chunk.headers[0]
+        
+
+        sentences = content.split('.')
+        description = '. '.join(sentences[:3]) + '.'
+        
+
+        cues = self._extract_cues(annotations)
+        
+
+        documentation = self._generate_documentation(annotations, user_input)
+        
+
+        cpt = annotations.primary_cpt
+        
+
+        sources = [Source(
+            type=SourceType.NOTE_NINJAS if chunk.source_type == "note_ninjas" else SourceType.CPG,
+            id=chunk.source_id,
+            section=chunk.headers[0] if chunk.headers else None,
+            page=chunk.page_ref,
+            quote=content[:300]  # First 300 chars
+        )]
+        
+        exercise = Exercise(
+            title=title,
+            description=description,
+            cues=cues,
+            documentation=documentation,
+            cpt=cpt,
+            notes=None,
+            sources=sources
+        )
+        
+        return exercise
+    
+    def _extract_cues(self, annotations: ChunkAnnotations) -> List[str]:
+
+        if annotations.cue_lines:
+            return list(annotations.cue_lines)
+        
+
+        if annotations.mentions_balance:
+            return ["Maintain stable base of support", "Focus on core activation"]
+        elif annotations.mentions_strength:
+            return ["Maintain proper form", "Control the movement"]
+        return ["Follow proper technique", "Monitor for safety"]
+    
+    def _generate_documentation(self, annotations: ChunkAnnotations, user_input: UserInput) -> str:
+
+        
+
+        diagnosis = user_input.diagnosis or "condition"
+        
+
+        if annotations.instructed:
+            return f"Instructed {diagnosis} management techniques; patient demonstrated understanding and performed exercises with minimal assistance."
+        elif annotations.assessed:
+            return f"Assessed {diagnosis} functional limitations; patient showed improvement in targeted areas with skilled intervention."
+        else:
+            return f"Provided skilled intervention for {diagnosis}; patient participated actively and showed positive response to treatment."
+    
+    def _generate_rationale(self, chunks: List[Dict[str, Any]], user_input: UserInput) -> str:
+
+        
+
+        for chunk_data in chunks:
+            content = chunk_data["chunk"].content
+            if "rationale" in content.lower() or "evidence" in content.lower():
+                sentences = content.split('.')
+                for sentence in sentences:
+                    if len(sentence.strip()) > 20 and len(sentence.strip()) < 150:
+                        if "rationale" in sentence.lower() or "evidence" in sentence.lower():
+                            return sentence.strip()
+        
+
+        diagnosis = user_input.diagnosis or "condition"
+        return f"Evidence-based interventions for {diagnosis} management with focus on functional outcomes."
+    
+    def _extract_alternatives(
+        self,
+        chunks: List[Dict[str, Any]],
+        user_input: UserInput
+    ) -> List[Alternative]:
+
+        
+        alternatives = []
+        
+        for chunk_data in chunks[:3]:  # Limit to 3 alternatives
+            chunk = chunk_data["chunk"]
+            content = chunk.content
+            
+
+            if "alternative" in content.lower() or "instead" in content.lower():
+
+                when = "When primary intervention is not effective"
+                
+
+                instead_try = content[:200] + "" if len(content) > 200 else content
+                
+                alternative = Alternative(
+                    when=when,
+                    instead_try=instead_try,
+                    sources=[Source(
+                        type=SourceType.CPG,
+                        id=chunk.source_id,
+                        section=chunk.headers[0] if chunk.headers else None,
+                        page=chunk.page_ref,
+                        quote=content[:300]
+                    )]
+                )
+                alternatives.append(alternative)
+        
+        return alternatives
+    
+    def _determine_confidence(
+        self,
+        all_chunks: List[Dict[str, Any]],
+        note_ninjas_chunks: List[Dict[str, Any]]
+    ) -> ConfidenceLevel:
+
+        
+
+        if len(note_ninjas_chunks) >= 3:
+            avg_score = sum(c["combined_score"] for c in note_ninjas_chunks[:3]) / 3
+            if avg_score > 0.7:
+                return ConfidenceLevel.HIGH
+        
+
+        if len(note_ninjas_chunks) >= 1:
+            return ConfidenceLevel.MEDIUM
+        
+
+        return ConfidenceLevel.LOW
+    
+    def _apply_feedback_filtering(
+        self,
+        response: RecommendationResponse,
+        feedback_state: FeedbackState
+    ) -> RecommendationResponse:
+
+        
+
+        if feedback_state.blocked_cpts:
+            for subsection in response.subsections:
+                subsection.exercises = [
+                    ex for ex in subsection.exercises
+                    if ex.cpt not in feedback_state.blocked_cpts
+                ]
+        
+
+        if feedback_state.blocked_exercises:
+            for subsection in response.subsections:
+                subsection.exercises = [
+                    ex for ex in subsection.exercises
+                    if ex.title not in feedback_state.blocked_exercises
+                ]
+        
+        return response
@@ -36,6 +36,22 @@ class FeedbackState:
     blocked_exercises: List[str]
     preferred_sources: List[str]
     last_updated: datetime
+def as_feedback_state(feedback_state: Any) -> Optional[FeedbackState]:
+
+    # Requests carry feedback as a plain dict; the pipeline works on FeedbackState
+    if not feedback_state:
+        return None
+    if isinstance(feedback_state, FeedbackState):
+        return feedback_state
+    return FeedbackState(
+        session_id=feedback_state.get("session_id", ""),
+        feedback_entries=[],
+        preferences=feedback_state.get("preferences") or {},
+        blocked_cpts=feedback_state.get("blocked_cpts") or [],
+        blocked_exercises=feedback_state.get("blocked_exercises") or [],
+        preferred_sources=feedback_state.get("preferred_sources") or [],
+        last_updated=feedback_state.get("last_updated")
+    )
 class FeedbackManager:
     def __init__(self, storage_type: str = "memory", storage_path: Optional[str] = None):
         self.storage_type = FeedbackStorageType(storage_type)
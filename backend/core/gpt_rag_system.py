@@ -1,21 +1,48 @@
 
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import json
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from .document_processor import DocumentProcessorFactory, DocumentChunk
 from .retriever import Retriever
 from .reranker import Reranker
-from .feedback_manager import FeedbackManager, FeedbackState
+from .feedback_manager import FeedbackManager, as_feedback_state
+from .response_cache import create_response_cache, request_fingerprint
+from .semantic_cache import create_semantic_cache, normalize_case_text, constraints_key
+from .tracing import tracer
+from .stream_parser import IncrementalJSONParser
+from .context_packer import ContextPacker
+from .candidate_cache import CandidateSet, SessionCandidateCache, feedback_boosts, retrieval_key
+from .execution import get_execution_pools
+from .extractive_generator import ExtractiveGenerator
 from models.request_models import UserInput, RAGManifest
 from models.response_models import (
     RecommendationResponse, Subsection, Exercise, Source, Alternative,
     SourceType, ConfidenceLevel
 )
 from config import settings
+from llm_usage import llm_usage
+from llm_calls import llm_caller
+from llm_limiter import estimate_tokens, llm_limiter, llm_user
+from single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
+
+# Everything before the per-request context is byte-identical across requests so the
+# provider's prompt cache can reuse it
+USER_PROMPT_PREFIX = "Based on the following context, generate OT recommendations:\n\n"
+
+# Values of the model's JSON document that are streamed as soon as they close
+STREAM_PATTERNS = [
+    ("high_level", "*"),
+    ("subsections", "*", "exercises", "*"),
+    ("subsections", "*"),
+    ("suggested_alternatives", "*"),
+    ()
+]
 SYSTEM_PROMPT = """
 Role & Purpose
 
@@ -96,7 +123,15 @@ class GPTRAGSystem:
         self.retriever = Retriever(vector_store_path=vector_store_path)
         self.reranker = Reranker()
         self.feedback_manager = FeedbackManager()
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Retries are handled by llm_caller, not the SDK
+        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        self.response_cache = create_response_cache()
+        self.semantic_cache = create_semantic_cache()
+        self.context_packer = ContextPacker()
+        self.candidate_cache = SessionCandidateCache()
+        self.single_flight = SingleFlight("recommendations", enabled=settings.SINGLE_FLIGHT_ENABLED)
+        self.extractive_generator = ExtractiveGenerator()
+        self.deadline_stats = {"degraded": 0, "late_results_cached": 0}
         self.processed_documents: List[DocumentChunk] = []
         self.is_initialized = False
         
@@ -107,6 +142,7 @@ class GPTRAGSystem:
             await self._process_documents()
             self.retriever.initialize(self.processed_documents)
             self.reranker.initialize()
+            self.reranker.index_chunks(self.retriever.document_chunks)
             self.is_initialized = True
             logger.info("RAG system initialized")
             
@@ -155,22 +191,411 @@ class GPTRAGSystem:
         if not self.is_initialized:
             raise RuntimeError("RAG system not initialized")
         
-        query = self._build_query(user_input)
-        
-        retrieval_results = self.retriever.search(
-            query=query,
-            top_k=rag_manifest.max_sources
+        rag_manifest = rag_manifest or RAGManifest()
+        llm_user.set(session_id)
+        # Retries and double-submits of the same request share one pipeline run
+        return await self.single_flight.do(
+            self._flight_key(user_input, rag_manifest, feedback_state),
+            lambda: self._generate_recommendations(user_input, rag_manifest, session_id, feedback_state)
         )
+    
+    async def stream_recommendations(
+        self,
+        user_input: UserInput,
+        rag_manifest: RAGManifest,
+        session_id: str,
+        feedback_state: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if not self.is_initialized:
+            raise RuntimeError("RAG system not initialized")
         
-        reranked_results = self.reranker.rerank(
-            query=query,
-            results=retrieval_results,
-            top_n=min(rag_manifest.max_sources, 12)
+        rag_manifest = rag_manifest or RAGManifest()
+        llm_user.set(session_id)
+        async for event in self.single_flight.stream(
+            self._flight_key(user_input, rag_manifest, feedback_state),
+            lambda: self._stream_recommendations(user_input, rag_manifest, session_id, feedback_state)
+        ):
+            yield event
+    
+    async def prepare_batch_request(
+        self,
+        user_input: UserInput,
+        rag_manifest: RAGManifest,
+        session_id: str,
+        feedback_state: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Optional[RecommendationResponse], Dict[str, Any]]:
+        # Returns the cached response, or the completion body to submit plus the state
+        # finish_batch_request needs once the provider batch returns
+        if not self.is_initialized:
+            raise RuntimeError("RAG system not initialized")
+        
+        rag_manifest = rag_manifest or RAGManifest()
+        with tracer.span("batch_prepare", session_id=session_id) as root:
+            cached, cache_context = await self._lookup_cached_response(
+                user_input, rag_manifest, session_id, feedback_state
+            )
+            if cached is not None:
+                root.set_attribute("served_from", cache_context["served_from"])
+                return RecommendationResponse.model_validate(cached), {}
+            
+            context, reranked_results = await self._retrieve_context(
+                user_input, rag_manifest, session_id, feedback_state
+            )
+        
+        return None, {
+            "body": self._completion_params(self._build_messages(context)),
+            "cache_context": cache_context,
+            "reranked_results": reranked_results,
+            "user_input": user_input,
+            "feedback_state": feedback_state
+        }
+    
+    def finish_batch_request(self, content: Optional[str], pending: Dict[str, Any]) -> RecommendationResponse:
+        if content is None:
+            return self._extractive_response(pending["reranked_results"], pending["user_input"], pending["feedback_state"])
+        
+        recommendations = self._parse_gpt_response(content)
+        self._store_cached_response(pending["cache_context"], recommendations)
+        return recommendations
+    
+    def _flight_key(
+        self,
+        user_input: UserInput,
+        rag_manifest: RAGManifest,
+        feedback_state: Optional[Dict[str, Any]]
+    ) -> str:
+        return request_fingerprint(
+            user_input,
+            rag_manifest,
+            feedback_state,
+            settings.OPENAI_CHAT_MODEL,
+            self.retriever.index_version
         )
+    
+    async def _generate_recommendations(
+        self,
+        user_input: UserInput,
+        rag_manifest: RAGManifest,
+        session_id: str,
+        feedback_state: Optional[Dict[str, Any]]
+    ) -> RecommendationResponse:
+        started = time.perf_counter()
+        with tracer.span("recommendations", session_id=session_id) as root:
+            cached, cache_context = await self._lookup_cached_response(
+                user_input, rag_manifest, session_id, feedback_state
+            )
+            if cached is not None:
+                root.set_attribute("served_from", cache_context["served_from"])
+                return RecommendationResponse.model_validate(cached)
+            
+            context, reranked_results = await self._retrieve_context(
+                user_input, rag_manifest, session_id, feedback_state
+            )
+            
+            with tracer.span("llm_call", model=settings.OPENAI_CHAT_MODEL) as span:
+                llm_task = asyncio.ensure_future(self._generate_gpt_response(context, user_input, rag_manifest))
+                done, _ = await asyncio.wait({llm_task}, timeout=self._remaining_budget(started))
+                span.set_attribute("deadline_missed", not done)
+            
+            if not done:
+                logger.warning(f"LLM missed the {settings.RECOMMENDATION_DEADLINE_SECONDS}s deadline for session {session_id}")
+                self.deadline_stats["degraded"] += 1
+                self._finish_late(llm_task, cache_context)
+                root.set_attribute("served_from", "extractive")
+                return self._extractive_response(reranked_results, user_input, feedback_state)
+            
+            response = llm_task.result()
+            if response is None:
+                root.set_attribute("served_from", "extractive")
+                return self._extractive_response(reranked_results, user_input, feedback_state)
+            
+            with tracer.span("parsing") as span:
+                recommendations = self._parse_gpt_response(response)
+                span.set_attribute("subsections", len(recommendations.subsections))
+            root.set_attribute("served_from", "generation")
+            
+            self._store_cached_response(cache_context, recommendations)
+            return recommendations
+    
+    async def _stream_recommendations(
+        self,
+        user_input: UserInput,
+        rag_manifest: RAGManifest,
+        session_id: str,
+        feedback_state: Optional[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        started = time.perf_counter()
+        with tracer.span("recommendations", session_id=session_id, streaming=True) as root:
+            cached, cache_context = await self._lookup_cached_response(
+                user_input, rag_manifest, session_id, feedback_state
+            )
+            if cached is not None:
+                root.set_attribute("served_from", cache_context["served_from"])
+                for event in self._replay_events(RecommendationResponse.model_validate(cached)):
+                    yield event
+                return
+            
+            context, reranked_results = await self._retrieve_context(
+                user_input, rag_manifest, session_id, feedback_state
+            )
+            
+            # The deadline applies to the first streamed item; once content flows the tail is not cut off
+            queue: asyncio.Queue = asyncio.Queue()
+            producer = asyncio.ensure_future(self._pump_llm_stream(context, queue))
+            document = None
+            waiting_for_first = True
+            degraded = False
+            try:
+                while True:
+                    timeout = self._remaining_budget(started) if waiting_for_first and not degraded else None
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        degraded = True
+                        self.deadline_stats["degraded"] += 1
+                        root.set_attribute("degraded", True)
+                        fallback = self._extractive_response(reranked_results, user_input, feedback_state)
+                        yield {"event": "degraded", "data": fallback.model_dump(mode="json")}
+                        continue
+                    if item is None:
+                        break
+                    path, value = item
+                    if path == ():
+                        document = value
+                        continue
+                    event = self._stream_event(path, value)
+                    if event is not None:
+                        waiting_for_first = False
+                        yield event
+            finally:
+                if not producer.done():
+                    producer.cancel()
+            
+            if document is None:
+                root.set_attribute("served_from", "extractive")
+                fallback = self._extractive_response(reranked_results, user_input, feedback_state)
+                yield {"event": "complete", "data": fallback.model_dump(mode="json")}
+                return
+            
+            with tracer.span("parsing"):
+                recommendations = self._build_response(document)
+            root.set_attribute("served_from", "generation")
+            
+            self._store_cached_response(cache_context, recommendations)
+            yield {"event": "complete", "data": recommendations.model_dump(mode="json")}
+    
+    async def _pump_llm_stream(self, context: str, queue: asyncio.Queue):
+        parser = IncrementalJSONParser(STREAM_PATTERNS)
+        with tracer.span("llm_call", model=settings.OPENAI_CHAT_MODEL, streaming=True) as span:
+            started = time.perf_counter()
+            items = 0
+            try:
+                # Timeouts, retries and hedging cover the wait for the stream to open;
+                # the limiter lease is held until the stream is read to the end or closed
+                params = self._completion_params(self._build_messages(context))
+                stream = await llm_caller.call(
+                    "recommendations_stream",
+                    lambda: self.openai_client.chat.completions.create(
+                        **params,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    ),
+                    tokens=estimate_tokens(params["messages"], params["max_tokens"]),
+                    stream=True
+                )
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage is not None:
+                            self._record_usage(chunk.usage)
+                        if not chunk.choices or not chunk.choices[0].delta.content:
+                            continue
+                        for path, value in parser.feed(chunk.choices[0].delta.content):
+                            if items == 0 and path != ():
+                                span.set_attribute("first_item_ms", round((time.perf_counter() - started) * 1000, 1))
+                            items += 1
+                            queue.put_nowait((path, value))
+            except Exception as e:
+                logger.error(f"Error streaming GPT response: {e}")
+            finally:
+                span.set_attributes(streamed_items=items, completion_chars=len(parser.text))
+                queue.put_nowait(None)
+    
+    def _remaining_budget(self, started: float) -> Optional[float]:
+        if settings.RECOMMENDATION_DEADLINE_SECONDS <= 0:
+            return None
+        return max(0.0, settings.RECOMMENDATION_DEADLINE_SECONDS - (time.perf_counter() - started))
+    
+    def _extractive_response(
+        self,
+        reranked_results: List[Any],
+        user_input: UserInput,
+        feedback_state: Optional[Any]
+    ) -> RecommendationResponse:
+        with tracer.span("extractive_generation", candidates=len(reranked_results)):
+            chunks = [
+                {
+                    "chunk": result.chunk,
+                    "combined_score": result.combined_score,
+                    "rerank_score": getattr(result, "rerank_score", result.combined_score)
+                }
+                for result in reranked_results
+            ]
+            return self.extractive_generator.generate(
+                chunks,
+                user_input,
+                as_feedback_state(feedback_state)
+            )
+    
+    def _finish_late(self, llm_task: asyncio.Future, cache_context: Dict[str, Any]):
+        # The late LLM answer is parsed and cached so the next identical request gets it
+        if not settings.DEADLINE_CACHE_LATE_RESULTS or (
+            cache_context["key"] is None and cache_context["embedding"] is None
+        ):
+            llm_task.cancel()
+            return
+        
+        def store(task: asyncio.Future):
+            if task.cancelled() or task.exception() is not None or task.result() is None:
+                return
+            recommendations = self._parse_gpt_response(task.result())
+            if recommendations.subsections:
+                self._store_cached_response(cache_context, recommendations)
+                self.deadline_stats["late_results_cached"] += 1
         
-        context = self._prepare_context(reranked_results, user_input, feedback_state)
-        response = await self._generate_gpt_response(context, user_input, rag_manifest)
-        return self._parse_gpt_response(response)
+        llm_task.add_done_callback(store)
+    
+    async def _lookup_cached_response(
+        self,
+        user_input: UserInput,
+        rag_manifest: RAGManifest,
+        session_id: str,
+        feedback_state: Optional[Dict[str, Any]]
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        cache_context = {"key": None, "embedding": None, "constraints": None, "served_from": None}
+        
+        if self.response_cache is not None:
+            with tracer.span("response_cache_lookup") as span:
+                cache_context["key"] = request_fingerprint(
+                    user_input,
+                    rag_manifest,
+                    feedback_state,
+                    settings.OPENAI_CHAT_MODEL,
+                    self.retriever.index_version
+                )
+                cached = self.response_cache.get(cache_context["key"])
+                span.set_attribute("cache_hit", cached is not None)
+            if cached is not None:
+                logger.info(f"Response cache hit for session {session_id}")
+                cache_context["served_from"] = "response_cache"
+                return cached, cache_context
+        
+        if self.semantic_cache is not None:
+            with tracer.span("semantic_cache_lookup") as span:
+                cache_context["embedding"] = await self.retriever.aembed_query(normalize_case_text(user_input))
+                cache_context["constraints"] = constraints_key(
+                    rag_manifest,
+                    feedback_state,
+                    settings.OPENAI_CHAT_MODEL,
+                    self.retriever.index_version
+                )
+                semantic_hit = self.semantic_cache.lookup(cache_context["embedding"], cache_context["constraints"])
+                span.set_attribute("cache_hit", semantic_hit is not None)
+            if semantic_hit is not None:
+                cached, similarity = semantic_hit
+                logger.info(f"Semantic cache hit for session {session_id} (similarity {similarity:.3f})")
+                cache_context["served_from"] = "semantic_cache"
+                return cached, cache_context
+        
+        return None, cache_context
+    
+    def _store_cached_response(self, cache_context: Dict[str, Any], recommendations: RecommendationResponse):
+        # Fallbacks carry no subsections and should not be served from cache
+        if not recommendations.subsections:
+            return
+        serialized = recommendations.model_dump(mode="json")
+        if cache_context["key"] is not None:
+            self.response_cache.set(cache_context["key"], serialized)
+        if cache_context["embedding"] is not None:
+            self.semantic_cache.store(cache_context["embedding"], cache_context["constraints"], serialized)
+    
+    async def _retrieve_context(
+        self,
+        user_input: UserInput,
+        rag_manifest: RAGManifest,
+        session_id: str,
+        feedback_state: Optional[Dict[str, Any]]
+    ) -> Tuple[str, List[Any]]:
+        with tracer.span("query_building") as span:
+            query = self._build_query(user_input)
+            span.set_attribute("query_chars", len(query))
+        
+        top_k = max(rag_manifest.max_sources, settings.CANDIDATE_POOL_SIZE)
+        top_n = min(rag_manifest.max_sources, 12)
+        key = retrieval_key(query, top_k)
+        candidates = self.candidate_cache.lookup(session_id, key, self.retriever.index_version)
+        
+        if candidates is None:
+            with tracer.span("retrieval", top_k=top_k) as span:
+                retrieval_results = await self.retriever.asearch(query=query, top_k=top_k)
+                span.set_attribute("candidates", len(retrieval_results))
+            
+            with tracer.span("rerank", candidates_in=len(retrieval_results)) as span:
+                try:
+                    rerank_scores = await self.reranker.ascore(query, retrieval_results)
+                except Exception as e:
+                    logger.error(f"Error in cross-encoder prediction: {e}")
+                    rerank_scores = None
+                if rerank_scores is not None:
+                    candidates = CandidateSet.from_results(
+                        key, self.retriever.index_version, query, retrieval_results, rerank_scores
+                    )
+                    self.candidate_cache.set(session_id, candidates)
+                    reranked_results = await self._select_candidates(candidates, feedback_state, top_n)
+                else:
+                    reranked_results = retrieval_results[:top_n]
+                span.set_attribute("candidates_out", len(reranked_results))
+        else:
+            # Same query in this session: only the feedback boosts are reapplied
+            with tracer.span("rerank", candidates_in=len(candidates.chunks), reused=True) as span:
+                reranked_results = await self._select_candidates(candidates, feedback_state, top_n)
+                span.set_attribute("candidates_out", len(reranked_results))
+        
+        with tracer.span("context_building") as span:
+            context = self._prepare_context(reranked_results, user_input, feedback_state)
+            span.set_attribute("context_chars", len(context))
+        return context, reranked_results
+    
+    async def _select_candidates(
+        self,
+        candidates: CandidateSet,
+        feedback_state: Optional[Dict[str, Any]],
+        top_n: int
+    ) -> List[Any]:
+        source_boosts, topic_boosts = feedback_boosts(self.feedback_manager, feedback_state)
+        multipliers = None
+        if source_boosts or topic_boosts:
+            multipliers = self.retriever.boost_multipliers(source_boosts, None, topic_boosts)
+        return await get_execution_pools().run(
+            "rerank",
+            self.reranker.select,
+            candidates.results(),
+            candidates.boosted_rerank_scores(multipliers),
+            top_n,
+            0.8
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "response_cache": self.response_cache.get_stats() if self.response_cache else None,
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None,
+            "context_packer": self.context_packer.get_stats(),
+            "candidate_cache": self.candidate_cache.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "deadline": {"seconds": settings.RECOMMENDATION_DEADLINE_SECONDS, **self.deadline_stats},
+            "token_usage": llm_usage.get_stats(),
+            "llm_calls": llm_caller.get_stats(),
+            "llm_limiter": llm_limiter.get_stats()
+        }
     
     def _build_query(self, user_input: UserInput) -> str:
         query_parts = []
@@ -203,18 +628,15 @@ class GPTRAGSystem:
                 context_parts.append(json.dumps(feedback_state, indent=2))
         
         context_parts.append("\nRETRIEVED SOURCES:")
-        for i, result in enumerate(retrieval_results[:10]):
-            chunk = result.chunk
-            context_parts.append(f"\nSource {i+1}:")
-            context_parts.append(f"Type: {chunk.source_type}")
-            context_parts.append(f"File: {chunk.source_id}")
-            if chunk.headers:
-                context_parts.append(f"Headers: {', '.join(chunk.headers)}")
-            if chunk.page_ref:
-                context_parts.append(f"Page: {chunk.page_ref}")
-            context_parts.append(f"Content: {chunk.content[:500]}")
         
-        return "\n".join(context_parts)
+        query = retrieval_results[0].query if retrieval_results else ""
+        packed = self.context_packer.pack(retrieval_results, query, header="\n".join(context_parts))
+        tracer.current_span().set_attributes(**{f"context_{key}": value for key, value in packed.to_dict().items()})
+        logger.info(
+            f"Packed {packed.included} sources into {packed.tokens} context tokens "
+            f"({packed.dropped} dropped, {packed.overlap_chars_removed} overlap chars removed)"
+        )
+        return packed.text
     
     def _convert_feedback_state_to_dict(self, feedback_state) -> Dict[str, Any]:
         from datetime import datetime
@@ -250,89 +672,123 @@ class GPTRAGSystem:
         else:
             return obj
     
-    async def _generate_gpt_response(self, context: str, user_input: UserInput, rag_manifest: RAGManifest) -> str:
-        messages = [
+    def _build_messages(self, context: str) -> List[Dict[str, str]]:
+        return [
             {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Based on the following context, generate OT recommendations:\n\n{context}"}
+            {"role": "user", "content": USER_PROMPT_PREFIX + context}
         ]
-        
+    
+    def _completion_params(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            "model": settings.OPENAI_CHAT_MODEL,
+            "messages": messages,
+            "temperature": 0.1,
+            "max_tokens": 2000,
+            "response_format": {"type": "json_object"}
+        }
+    
+    async def _generate_gpt_response(self, context: str, user_input: UserInput, rag_manifest: RAGManifest) -> Optional[str]:
         try:
-            response = self.openai_client.chat.completions.create(
-                model=settings.OPENAI_CHAT_MODEL,
-                messages=messages,
-                temperature=0.1,
-                max_tokens=2000,
-                response_format={"type": "json_object"}
+            params = self._completion_params(self._build_messages(context))
+            response = await llm_caller.call(
+                "recommendations",
+                lambda: self.openai_client.chat.completions.create(**params),
+                tokens=estimate_tokens(params["messages"], params["max_tokens"])
             )
+            if response.usage is not None:
+                self._record_usage(response.usage)
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Error generating GPT response: {e}")
-            return self._get_fallback_response(user_input)
+            return None
+    
+    def _record_usage(self, usage: Any):
+        tracer.current_span().set_attributes(**llm_usage.record("recommendations", usage))
     
     def _parse_gpt_response(self, response: str) -> RecommendationResponse:
         try:
-            data = json.loads(response)
-            
-            subsections = []
-            for sub_data in data.get("subsections", []):
-                exercises = []
-                for ex_data in sub_data.get("exercises", []):
-                    sources = []
-                    for src_data in ex_data.get("sources", []):
-                        sources.append(Source(
-                            type=SourceType(src_data["type"]),
-                            id=src_data["id"],
-                            section=src_data.get("section"),
-                            page=src_data.get("page"),
-                            quote=src_data["quote"]
-                        ))
-                    
-                    exercise = Exercise(
-                        description=ex_data["description"],
-                        cues=ex_data.get("cues", []),
-                        documentation_exemplar=[ex_data.get("documentation", "")],
-                        cpt_code=ex_data.get("cpt"),
-                        sources=sources
-                    )
-                    exercises.append(exercise)
-                
-                subsection = Subsection(
-                    title=sub_data["title"],
-                    description=sub_data.get("rationale", ""),
-                    exercises=exercises
-                )
-                subsections.append(subsection)
-            
-            alternatives = []
-            for alt_data in data.get("suggested_alternatives", []):
-                sources = []
-                for src_data in alt_data.get("sources", []):
-                    sources.append(Source(
-                        type=SourceType(src_data["type"]),
-                        id=src_data["id"],
-                        section=src_data.get("section"),
-                        page=src_data.get("page"),
-                        quote=src_data.get("quote", "")
-                    ))
-                
-                alternative = Alternative(
-                    when=alt_data["when"],
-                    instead_try=alt_data["instead_try"],
-                    sources=sources
-                )
-                alternatives.append(alternative)
-            
-            return RecommendationResponse(
-                high_level=data.get("high_level", []),
-                subsections=subsections,
-                suggested_alternatives=alternatives,
-                confidence=ConfidenceLevel(data.get("confidence", "medium"))
-            )
-            
+            return self._build_response(json.loads(response))
         except Exception as e:
             logger.error(f"Error parsing GPT response: {e}")
             return self._get_fallback_response()
     
+    def _build_response(self, data: Dict[str, Any]) -> RecommendationResponse:
+        return RecommendationResponse(
+            high_level=data.get("high_level", []),
+            subsections=[self._build_subsection(sub_data) for sub_data in data.get("subsections", [])],
+            suggested_alternatives=[
+                self._build_alternative(alt_data) for alt_data in data.get("suggested_alternatives", [])
+            ],
+            confidence=ConfidenceLevel(data.get("confidence", "medium"))
+        )
+    
+    def _build_source(self, src_data: Dict[str, Any]) -> Source:
+        return Source(
+            type=SourceType(src_data["type"]),
+            id=src_data["id"],
+            section=src_data.get("section"),
+            page=src_data.get("page"),
+            quote=src_data.get("quote", "")
+        )
+    
+    def _build_exercise(self, ex_data: Dict[str, Any]) -> Exercise:
+        return Exercise(
+            title=ex_data.get("title"),
+            description=ex_data["description"],
+            cues=ex_data.get("cues") or [],
+            documentation=ex_data.get("documentation"),
+            cpt=ex_data.get("cpt"),
+            notes=ex_data.get("notes"),
+            sources=[self._build_source(src_data) for src_data in ex_data.get("sources", [])]
+        )
+    
+    def _build_subsection(self, sub_data: Dict[str, Any]) -> Subsection:
+        return Subsection(
+            title=sub_data["title"],
+            rationale=sub_data.get("rationale"),
+            exercises=[self._build_exercise(ex_data) for ex_data in sub_data.get("exercises", [])]
+        )
+    
+    def _build_alternative(self, alt_data: Dict[str, Any]) -> Alternative:
+        return Alternative(
+            when=alt_data["when"],
+            instead_try=alt_data["instead_try"],
+            sources=[self._build_source(src_data) for src_data in alt_data.get("sources", [])]
+        )
+    
+    def _stream_event(self, path: Tuple, value: Any) -> Optional[Dict[str, Any]]:
+        try:
+            if path[0] == "high_level":
+                return {"event": "high_level", "data": {"index": path[1], "text": value}}
+            if path[0] == "subsections" and len(path) == 4:
+                exercise = self._build_exercise(value)
+                return {
+                    "event": "exercise",
+                    "data": {"subsection_index": path[1], "index": path[3], "exercise": exercise.model_dump(mode="json")}
+                }
+            if path[0] == "subsections":
+                subsection = self._build_subsection(value)
+                return {"event": "subsection", "data": {"index": path[1], "subsection": subsection.model_dump(mode="json")}}
+            if path[0] == "suggested_alternatives":
+                alternative = self._build_alternative(value)
+                return {"event": "alternative", "data": {"index": path[1], "alternative": alternative.model_dump(mode="json")}}
+        except Exception as e:
+            logger.warning(f"Skipping malformed streamed item at {path}: {e}")
+        return None
+    
+    def _replay_events(self, recommendations: RecommendationResponse) -> List[Dict[str, Any]]:
+        # Cached responses go out in the same event shape as a live stream
+        data = recommendations.model_dump(mode="json")
+        events = [{"event": "high_level", "data": {"index": i, "text": text}} for i, text in enumerate(data["high_level"])]
+        for i, subsection in enumerate(data["subsections"]):
+            for j, exercise in enumerate(subsection["exercises"]):
+                events.append({"event": "exercise", "data": {"subsection_index": i, "index": j, "exercise": exercise}})
+            events.append({"event": "subsection", "data": {"index": i, "subsection": subsection}})
+        for i, alternative in enumerate(data["suggested_alternatives"]):
+            events.append({"event": "alternative", "data": {"index": i, "alternative": alternative}})
+        events.append({"event": "complete", "data": data})
+        return events
+    
     def _get_fallback_response(self, user_input: Optional[UserInput] = None) -> RecommendationResponse:
         return RecommendationResponse(
             high_level=["Unable to generate recommendations. Please try again."],
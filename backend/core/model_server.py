@@ -0,0 +1,361 @@
+"""
+Shared local model server for the embedding model and cross-encoder reranker
+
+One process per host owns the PyTorch models; uvicorn workers talk to it over a
+Unix domain socket using a length-prefixed binary protocol. Requests from all
+workers are micro-batched together before hitting the models.
+
+Run with: python -m core.model_server [socket_path]
+"""
+
+import asyncio
+import logging
+import socket
+import struct
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .batching import MicroBatcher
+from .execution import get_execution_pools
+from config import settings
+from resources import resource_config
+
+logger = logging.getLogger(__name__)
+
+OP_EMBED = 1
+OP_RERANK = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_FRAME = struct.Struct("!I")
+_REQUEST_HEADER = struct.Struct("!BI")
+_RESPONSE_HEADER = struct.Struct("!BIB")
+_COUNT = struct.Struct("!I")
+_MATRIX = struct.Struct("!II")
+def _pack_str(value: str) -> bytes:
+
+    data = value.encode("utf-8")
+    return _COUNT.pack(len(data)) + data
+def _pack_floats(values: np.ndarray) -> bytes:
+
+    return np.asarray(values, dtype="<f4").tobytes()
+class _Reader:
+
+
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.offset = offset
+
+    def unpack(self, fmt: struct.Struct) -> Tuple:
+
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def read_str(self) -> str:
+
+        (length,) = self.unpack(_COUNT)
+        value = self.data[self.offset:self.offset + length].decode("utf-8")
+        self.offset += length
+        return value
+
+    def read_floats(self, count: int) -> np.ndarray:
+
+        end = self.offset + count * 4
+        values = np.frombuffer(self.data[self.offset:end], dtype="<f4").astype(np.float32)
+        self.offset = end
+        return values
+def encode_embed_request(texts: List[str]) -> bytes:
+
+    return _COUNT.pack(len(texts)) + b"".join(_pack_str(text) for text in texts)
+def decode_embed_request(reader: _Reader) -> List[str]:
+
+    (count,) = reader.unpack(_COUNT)
+    return [reader.read_str() for _ in range(count)]
+def encode_rerank_request(groups: List[Tuple[str, List[Tuple[str, str]]]]) -> bytes:
+
+    parts = [_COUNT.pack(len(groups))]
+    for query, passages in groups:
+        parts.append(_pack_str(query))
+        parts.append(_COUNT.pack(len(passages)))
+        for chunk_id, content in passages:
+            parts.append(_pack_str(chunk_id))
+            parts.append(_pack_str(content))
+    return b"".join(parts)
+def decode_rerank_request(reader: _Reader) -> List[Tuple[str, List[Tuple[str, str]]]]:
+
+    (group_count,) = reader.unpack(_COUNT)
+    groups = []
+    for _ in range(group_count):
+        query = reader.read_str()
+        (passage_count,) = reader.unpack(_COUNT)
+        passages = [(reader.read_str(), reader.read_str()) for _ in range(passage_count)]
+        groups.append((query, passages))
+    return groups
+class _RemoteChunk:
+
+
+    def __init__(self, chunk_id: str, content: str):
+        self.chunk_id = chunk_id
+        self.content = content
+class _RemoteResult:
+
+
+    def __init__(self, chunk_id: str, content: str):
+        self.chunk = _RemoteChunk(chunk_id, content)
+class ModelServer:
+
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.embedding_model = None
+        self.reranker = None
+        self.embedding_batcher = MicroBatcher(
+            self._embed_batch,
+            max_batch_size=settings.EMBEDDING_MICRO_BATCH_SIZE,
+            max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS,
+            name="server_embeddings"
+        )
+
+    def initialize(self):
+
+        from sentence_transformers import SentenceTransformer
+        from .reranker import Reranker
+
+        logger.info(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
+        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+
+        self.reranker = Reranker(model_name=settings.RERANK_MODEL, max_length=512)
+        self.reranker.initialize(use_remote=False)
+
+    async def _embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+
+        embeddings = await get_execution_pools().run(
+            "retrieval", self.embedding_model.encode, texts
+        )
+        return list(embeddings)
+
+    async def _handle_embed(self, reader: _Reader) -> bytes:
+
+        texts = decode_embed_request(reader)
+        rows = await asyncio.gather(*[self.embedding_batcher.submit(text) for text in texts])
+        matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        return _MATRIX.pack(*matrix.shape) + _pack_floats(matrix)
+
+    async def _handle_rerank(self, reader: _Reader) -> bytes:
+
+        groups = decode_rerank_request(reader)
+        scores = await asyncio.gather(*[
+            self.reranker.score_batcher.submit(
+                (query, [_RemoteResult(chunk_id, content) for chunk_id, content in passages])
+            )
+            for query, passages in groups
+        ])
+        flat = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+        return _COUNT.pack(len(flat)) + _pack_floats(flat)
+
+    async def _dispatch(self, payload: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+
+        reader = _Reader(payload)
+        op, request_id = reader.unpack(_REQUEST_HEADER)
+        try:
+            if op == OP_EMBED:
+                body = await self._handle_embed(reader)
+            elif op == OP_RERANK:
+                body = await self._handle_rerank(reader)
+            else:
+                raise ValueError(f"Unknown op {op}")
+            status = STATUS_OK
+        except Exception as e:
+            logger.error(f"Model server request {request_id} failed: {e}")
+            status = STATUS_ERROR
+            body = _pack_str(str(e))
+
+        response = _RESPONSE_HEADER.pack(op, request_id, status) + body
+        async with write_lock:
+            writer.write(_FRAME.pack(len(response)) + response)
+            await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                (length,) = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+                payload = await reader.readexactly(length)
+                task = asyncio.create_task(self._dispatch(payload, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        logger.info(f"Model server listening on {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+class ModelServerClient:
+
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._sync_lock = threading.Lock()
+
+    async def _ensure_connected(self):
+
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+                self._reader_task = asyncio.create_task(self._read_responses(self._reader))
+
+    async def _read_responses(self, reader: asyncio.StreamReader):
+
+        try:
+            while True:
+                (length,) = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+                payload = await reader.readexactly(length)
+                (_, request_id, _) = _RESPONSE_HEADER.unpack_from(payload)
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result(payload)
+        except Exception as e:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Model server connection lost: {e}"))
+            self._pending.clear()
+            self._writer = None
+
+    async def _request(self, op: int, body: bytes) -> _Reader:
+
+        await self._ensure_connected()
+        self._next_id = (self._next_id + 1) % 2**32
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        payload = _REQUEST_HEADER.pack(op, request_id) + body
+        self._writer.write(_FRAME.pack(len(payload)) + payload)
+        await self._writer.drain()
+
+        return self._parse_response(await future)
+
+    def _request_sync(self, op: int, body: bytes) -> _Reader:
+
+        payload = _REQUEST_HEADER.pack(op, 0) + body
+        with self._sync_lock, socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            sock.sendall(_FRAME.pack(len(payload)) + payload)
+            (length,) = _FRAME.unpack(self._recv_exactly(sock, _FRAME.size))
+            return self._parse_response(self._recv_exactly(sock, length))
+
+    def _recv_exactly(self, sock: socket.socket, size: int) -> bytes:
+
+        data = bytearray()
+        while len(data) < size:
+            block = sock.recv(size - len(data))
+            if not block:
+                raise ConnectionError("Model server closed the connection")
+            data.extend(block)
+        return bytes(data)
+
+    def _parse_response(self, payload: bytes) -> _Reader:
+
+        reader = _Reader(payload)
+        _, _, status = reader.unpack(_RESPONSE_HEADER)
+        if status != STATUS_OK:
+            raise RuntimeError(f"Model server error: {reader.read_str()}")
+        return reader
+
+    def _decode_matrix(self, reader: _Reader) -> np.ndarray:
+
+        rows, dim = reader.unpack(_MATRIX)
+        return reader.read_floats(rows * dim).reshape(rows, dim)
+
+    def _split_scores(self, reader: _Reader, items: List[Tuple[str, List[Any]]]) -> List[np.ndarray]:
+
+        (count,) = reader.unpack(_COUNT)
+        flat = reader.read_floats(count)
+        split_scores = []
+        offset = 0
+        for _, results in items:
+            split_scores.append(flat[offset:offset + len(results)])
+            offset += len(results)
+        return split_scores
+
+    def _rerank_body(self, items: List[Tuple[str, List[Any]]]) -> bytes:
+
+        return encode_rerank_request([
+            (query, [(result.chunk.chunk_id, result.chunk.content) for result in results])
+            for query, results in items
+        ])
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+
+        return self._decode_matrix(await self._request(OP_EMBED, encode_embed_request(texts)))
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+
+        return self._decode_matrix(self._request_sync(OP_EMBED, encode_embed_request(texts)))
+
+    async def score(self, items: List[Tuple[str, List[Any]]]) -> List[np.ndarray]:
+
+        return self._split_scores(await self._request(OP_RERANK, self._rerank_body(items)), items)
+
+    def score_sync(self, items: List[Tuple[str, List[Any]]]) -> List[np.ndarray]:
+
+        return self._split_scores(self._request_sync(OP_RERANK, self._rerank_body(items)), items)
+class RemoteEmbeddingModel:
+
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, batch_size: int = 256) -> np.ndarray:
+
+        batches = [
+            self.client.embed_sync(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        return np.vstack(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+_client: Optional[ModelServerClient] = None
+def get_model_server_client() -> Optional[ModelServerClient]:
+
+    global _client
+    if not settings.MODEL_SERVER_SOCKET:
+        return None
+    if _client is None:
+        _client = ModelServerClient(settings.MODEL_SERVER_SOCKET)
+    return _client
+def main():
+
+    import os
+
+    logging.basicConfig(level=logging.INFO)
+    resource_config.apply()
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else settings.MODEL_SERVER_SOCKET
+    if not socket_path:
+        raise SystemExit("Set MODEL_SERVER_SOCKET or pass a socket path")
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = ModelServer(socket_path)
+    server.initialize()
+    asyncio.run(server.serve_forever())
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,12 @@ from typing import List, Dict, Any, Optional
 import numpy as np
 from sentence_transformers import CrossEncoder
 from .retriever import RetrievalResult
+from .execution import get_execution_pools
+from .batching import MicroBatcher
+from .model_server import get_model_server_client
+from .tracing import tracer
+from config import settings
+from resources import resource_config
 
 logger = logging.getLogger(__name__)
 class Reranker:
@@ -20,15 +26,38 @@ class Reranker:
         self.model_name = model_name
         self.max_length = max_length
         self.model = None
+        self.remote_client = None
+        self.tokenizer = None
+        self.predict_batch_size = 32
+        self._passage_token_cache: Dict[str, List[int]] = {}
+        self.score_batcher = MicroBatcher(
+            self._score_batch,
+            max_batch_size=settings.RERANK_MICRO_BATCH_SIZE,
+            max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS,
+            name="rerank_scores"
+        )
     
-    def initialize(self):
+    def initialize(self, use_remote: bool = True):
 
+        # The model server itself passes use_remote=False so it never connects to its own socket
+        self.remote_client = get_model_server_client() if use_remote else None
+        if self.remote_client:
+            logger.info(f"Using shared model server at {self.remote_client.socket_path} for reranking")
+            return
+        
         logger.info(f"Initializing reranker with model: {self.model_name}")
+        import torch
+        
+        resource_config.configure_torch()
         try:
+            # The sigmoid is applied here and nowhere else, so rerank_score is a probability on every
+            # path; the model server runs this same initialize, so remote scores arrive squashed too
             self.model = CrossEncoder(
                 self.model_name,
-                max_length=self.max_length
+                max_length=self.max_length,
+                activation_fn=torch.nn.Sigmoid()
             )
+            self.tokenizer = getattr(self.model, "tokenizer", None)
             logger.info("Reranker initialized")
         except Exception as e:
             logger.error(f"Failed to initialize reranker: {e}")
@@ -43,33 +72,33 @@ class Reranker:
     ) -> List[RetrievalResult]:
 
         
-        if not self.model:
+        if not self.model and not self.remote_client:
             raise ValueError("Reranker not initialized")
         
         if not results:
             return results
         
-        logger.info("Reranking {len(results)} results for query: {query[:50]}")
-        
-
-        query_doc_pairs = []
-        for result in results:
-
-            doc_content = result.chunk.content
-            if len(doc_content) > self.max_length - len(query) - 10:
-                doc_content = doc_content[:self.max_length - len(query) - 10] + ""
-            
-            query_doc_pairs.append([query, doc_content])
+        logger.info(f"Reranking {len(results)} results for query: {query[:50]}")
         
 
         try:
-            rerank_scores = self.model.predict(query_doc_pairs)
+            rerank_scores = self._score_many([(query, results)])[0]
         except Exception as e:
             logger.error(f"Error in cross-encoder prediction: {e}")
 
             return results[:top_n]
         
+        return self.select(results, rerank_scores, top_n, diversity_threshold)
+    
+    def select(
+        self,
+        results: List[RetrievalResult],
+        rerank_scores: np.ndarray,
+        top_n: int = 12,
+        diversity_threshold: float = 0.8
+    ) -> List[RetrievalResult]:
 
+        # Orders and filters results by scores computed earlier, e.g. kept from ascore
         for i, result in enumerate(results):
             result.rerank_score = float(rerank_scores[i])
         
@@ -88,6 +117,163 @@ class Reranker:
         
         return reranked_results[:top_n]
     
+    async def arerank(
+        self,
+        query: str,
+        results: List[RetrievalResult],
+        top_n: int = 12,
+        diversity_threshold: float = 0.8
+    ) -> List[RetrievalResult]:
+
+        pools = get_execution_pools()
+        if not settings.MICRO_BATCH_ENABLED:
+            return await pools.run("rerank", self.rerank, query, results, top_n, diversity_threshold)
+        
+        if not self.model and not self.remote_client:
+            raise ValueError("Reranker not initialized")
+        
+        if not results:
+            return results
+        
+        try:
+            with tracer.span("cross_encoder_batched", pairs=len(results)):
+                rerank_scores = await self.score_batcher.submit((query, results))
+        except Exception as e:
+            logger.error(f"Error in cross-encoder prediction: {e}")
+            return results[:top_n]
+        
+        return await pools.run("rerank", self.select, results, rerank_scores, top_n, diversity_threshold)
+    
+    async def ascore(self, query: str, results: List[RetrievalResult]) -> np.ndarray:
+
+        # Cross-encoder probabilities, for callers that keep them and select later
+        if not self.model and not self.remote_client:
+            raise ValueError("Reranker not initialized")
+        if not results:
+            return np.array([])
+        if not settings.MICRO_BATCH_ENABLED:
+            return (await get_execution_pools().run("rerank", self._score_many, [(query, results)]))[0]
+        with tracer.span("cross_encoder_batched", pairs=len(results)):
+            return await self.score_batcher.submit((query, results))
+    
+    async def _score_batch(self, items: List[tuple]) -> List[np.ndarray]:
+
+        if self.remote_client:
+            return await self.remote_client.score(items)
+        return await get_execution_pools().run("rerank", self._score_many, items)
+    
+    def _score_many(self, items: List[tuple]) -> List[np.ndarray]:
+
+        # One forward pass over the (query, results) pairs of every caller in the batch
+        if self.remote_client:
+            return self.remote_client.score_sync(items)
+        
+        pairs = sum(len(results) for _, results in items)
+        with tracer.span("cross_encoder", pairs=pairs, callers=len(items)):
+            if self.tokenizer is not None:
+                query_ids = {}
+                pair_features = []
+                for query, results in items:
+                    if query not in query_ids:
+                        query_ids[query] = self.tokenizer(query, add_special_tokens=False)["input_ids"]
+                    for result in results:
+                        pair_features.append(
+                            self._build_pair_features(query_ids[query], self._get_passage_ids(result.chunk))
+                        )
+                scores = self._predict_features(pair_features)
+            else:
+                scores = np.asarray(self.model.predict(
+                    [[query, result.chunk.content] for query, results in items for result in results],
+                    batch_size=self.predict_batch_size
+                ))
+        
+        split_scores = []
+        offset = 0
+        for _, results in items:
+            split_scores.append(scores[offset:offset + len(results)])
+            offset += len(results)
+        return split_scores
+    
+    def index_chunks(self, chunks: List[Any]):
+
+        if self.remote_client:
+            return
+        
+        if self.tokenizer is None:
+            logger.warning("Reranker tokenizer unavailable, skipping passage pre-tokenization")
+            return
+        
+        pending = [c for c in chunks if c.chunk_id not in self._passage_token_cache]
+        for i in range(0, len(pending), 256):
+            batch = pending[i:i + 256]
+            encoded = self.tokenizer(
+                [chunk.content for chunk in batch],
+                add_special_tokens=False,
+                truncation=True,
+                max_length=self.max_length
+            )
+            for chunk, input_ids in zip(batch, encoded["input_ids"]):
+                self._passage_token_cache[chunk.chunk_id] = input_ids
+        
+        logger.info(f"Cached reranker token ids for {len(self._passage_token_cache)} chunks")
+    
+    def _get_passage_ids(self, chunk: Any) -> List[int]:
+
+        input_ids = self._passage_token_cache.get(chunk.chunk_id)
+        if input_ids is None:
+            input_ids = self.tokenizer(
+                chunk.content,
+                add_special_tokens=False,
+                truncation=True,
+                max_length=self.max_length
+            )["input_ids"]
+            self._passage_token_cache[chunk.chunk_id] = input_ids
+        return input_ids
+    
+    def _build_pair_features(self, query_ids: List[int], passage_ids: List[int]) -> Dict[str, List[int]]:
+
+        # Truncate on token boundaries so [CLS] query [SEP] passage [SEP] fits max_length
+        special_tokens = self.tokenizer.num_special_tokens_to_add(pair=True)
+        query_ids = query_ids[:max(self.max_length // 2, 1)]
+        passage_budget = max(self.max_length - len(query_ids) - special_tokens, 0)
+        passage_ids = passage_ids[:passage_budget]
+        
+        features = {
+            "input_ids": self.tokenizer.build_inputs_with_special_tokens(query_ids, passage_ids)
+        }
+        if "token_type_ids" in self.tokenizer.model_input_names:
+            features["token_type_ids"] = self.tokenizer.create_token_type_ids_from_sequences(
+                query_ids, passage_ids
+            )
+        return features
+    
+    def _predict_features(self, pair_features: List[Dict[str, List[int]]]) -> np.ndarray:
+
+        import torch
+        
+        hf_model = self.model.model
+        device = next(hf_model.parameters()).device
+        activation = self.model.activation_fn
+        
+        scores = []
+        hf_model.eval()
+        with torch.no_grad():
+            for i in range(0, len(pair_features), self.predict_batch_size):
+                batch = self.tokenizer.pad(
+                    pair_features[i:i + self.predict_batch_size],
+                    padding=True,
+                    return_tensors="pt"
+                )
+                batch = {key: value.to(device) for key, value in batch.items()}
+                logits = hf_model(**batch).logits
+                if activation is not None:
+                    logits = activation(logits)
+                if logits.dim() > 1 and logits.shape[1] == 1:
+                    logits = logits[:, 0]
+                scores.extend(logits.cpu().tolist())
+        
+        return np.array(scores)
+    
     def _apply_diversity_filter(
         self,
         results: List[RetrievalResult],
@@ -164,7 +350,7 @@ class Reranker:
     ) -> List[List[RetrievalResult]]:
 
         
-        if not self.model:
+        if not self.model and not self.remote_client:
             raise ValueError("Reranker not initialized")
         
         reranked_results = []
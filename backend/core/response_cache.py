@@ -0,0 +1,293 @@
+"""
+End-to-end recommendation response cache keyed by a canonical request fingerprint
+
+The in-memory backend also holds the per-subsection cache of simple_main and
+app_with_db, which hands out copies because callers edit what they get back.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_VERSION = 1
+class CacheBackendType(str, Enum):
+    NONE = "none"
+    MEMORY = "memory"
+    SQLITE = "sqlite"
+def normalize_text(value: Optional[str]) -> str:
+
+    if not value:
+        return ""
+    return re.sub(r"\s+", " ", value.strip().lower())
+def request_key(payload: Any) -> str:
+
+    def normalize(value):
+        if isinstance(value, str):
+            return normalize_text(value)
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+
+    canonical = json.dumps(normalize(payload), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+def prompt_version(*parts: str) -> str:
+
+    # Changes whenever the prompt text does, so edited prompts never hit stale entries
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+def subsection_key(
+    patient_condition: str,
+    desired_outcome: str,
+    subsection_info: Dict[str, Any],
+    version: str,
+    model: str
+) -> str:
+
+    return request_key({
+        "condition": patient_condition,
+        "outcome": desired_outcome,
+        "title": subsection_info["title"],
+        "focus": subsection_info.get("focus", ""),
+        "prompt": version,
+        "model": model
+    })
+def feedback_digest(feedback_state: Any) -> str:
+
+    # Only the fields that change generation output; timestamps and raw entries are ignored
+    if feedback_state is None:
+        return ""
+    if is_dataclass(feedback_state):
+        feedback_state = asdict(feedback_state)
+    if not isinstance(feedback_state, dict):
+        return ""
+
+    relevant = {
+        "preferences": feedback_state.get("preferences", {}),
+        "blocked_cpts": sorted(feedback_state.get("blocked_cpts", [])),
+        "blocked_exercises": sorted(feedback_state.get("blocked_exercises", [])),
+        "preferred_sources": sorted(feedback_state.get("preferred_sources", []))
+    }
+    if not any(relevant.values()):
+        return ""
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+def request_fingerprint(
+    user_input: Any,
+    rag_manifest: Any,
+    feedback_state: Any,
+    model_name: str,
+    index_version: str
+) -> str:
+
+    input_data = user_input.model_dump() if hasattr(user_input, "model_dump") else dict(user_input)
+    normalized_input = {
+        key: normalize_text(value) if isinstance(value, str) else value
+        for key, value in sorted(input_data.items())
+    }
+    manifest_data = rag_manifest.model_dump() if hasattr(rag_manifest, "model_dump") else (rag_manifest or {})
+
+    payload = {
+        "v": FINGERPRINT_VERSION,
+        "input": normalized_input,
+        "manifest": manifest_data,
+        "feedback": feedback_digest(feedback_state),
+        "model": model_name,
+        "index": index_version
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+class ResponseCache(ABC):
+
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]):
+
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+
+        pass
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.__class__.__name__,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+class InMemoryResponseCache(ResponseCache):
+
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 1000, copy_on_read: bool = False):
+        super().__init__(ttl_seconds, max_entries)
+        self.copy_on_read = copy_on_read
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value) if self.copy_on_read else value
+
+    def set(self, key: str, value: Dict[str, Any]):
+
+        if self.max_entries <= 0:
+            return
+        if self.copy_on_read:
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+
+        return {
+            **super().get_stats(),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions
+        }
+class SQLiteResponseCache(ResponseCache):
+
+
+    def __init__(self, path: str, ttl_seconds: float = 3600, max_entries: int = 10000):
+        super().__init__(ttl_seconds, max_entries)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now + self.ttl_seconds, now)
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+def create_response_cache(
+    backend: Optional[str] = None,
+    ttl_seconds: Optional[float] = None,
+    max_entries: Optional[int] = None,
+    path: Optional[str] = None
+) -> Optional[ResponseCache]:
+
+    backend_type = CacheBackendType(backend or settings.RESPONSE_CACHE_BACKEND)
+    ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.RESPONSE_CACHE_TTL_SECONDS
+    max_entries = max_entries if max_entries is not None else settings.RESPONSE_CACHE_MAX_ENTRIES
+
+    if backend_type == CacheBackendType.NONE:
+        return None
+    if backend_type == CacheBackendType.SQLITE:
+        return SQLiteResponseCache(path or settings.RESPONSE_CACHE_PATH, ttl_seconds, max_entries)
+    return InMemoryResponseCache(ttl_seconds, max_entries)
+def create_subsection_cache(
+    ttl_seconds: Optional[float] = None,
+    max_entries: Optional[int] = None
+) -> InMemoryResponseCache:
+
+    return InMemoryResponseCache(
+        ttl_seconds if ttl_seconds is not None else settings.SUBSECTION_CACHE_TTL_SECONDS,
+        max_entries if max_entries is not None else settings.SUBSECTION_CACHE_MAX_ENTRIES,
+        copy_on_read=True
+    )
@@ -12,11 +12,19 @@ import pickle
 from pathlib import Path
 import asyncio
 import openai
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import hashlib
+import threading
+from collections import OrderedDict
 
+from .chunk_annotations import ChunkAnnotations, annotate_chunks
 from .document_processor import DocumentChunk
+from .execution import get_execution_pools
+from .batching import MicroBatcher
+from .model_server import RemoteEmbeddingModel, get_model_server_client
+from .tracing import tracer
 from config import settings
+from resources import resource_config
 
 logger = logging.getLogger(__name__)
 class RetrievalResult:
@@ -28,13 +36,16 @@ class RetrievalResult:
         bm25_score: float,
         dense_score: float,
         combined_score: float,
-        query: str
+        query: str,
+        position: Optional[int] = None
     ):
         self.chunk = chunk
         self.bm25_score = bm25_score
         self.dense_score = dense_score
         self.combined_score = combined_score
         self.query = query
+        # Index of the chunk in the retriever's document_chunks
+        self.position = position
     
     def to_dict(self) -> Dict[str, Any]:
 
@@ -57,14 +68,27 @@ class Retriever:
         self.vector_store_path = Path(vector_store_path)
         self.embedding_model = None
         self.openai_client = None
+        self.async_openai_client = None
         self.use_openai = settings.USE_OPENAI_EMBEDDINGS
         self.bm25 = None
         self.document_chunks = []
         self.chunk_embeddings = None
+        self.index_version = ""
+        self._static_query_scores: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._static_scores_version = ""
+        self._boost_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._boost_cache_lock = threading.Lock()
+        self.embedding_batcher = MicroBatcher(
+            self._embed_query_batch,
+            max_batch_size=settings.EMBEDDING_MICRO_BATCH_SIZE,
+            max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS,
+            name="query_embeddings"
+        )
         
 
         if self.use_openai and settings.OPENAI_API_KEY:
             self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            self.async_openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
             logger.info(f"Using OpenAI embeddings: {settings.OPENAI_EMBEDDING_MODEL}")
         else:
             self.use_openai = False
@@ -77,11 +101,12 @@ class Retriever:
 
         logger.info(f"Initializing retriever with {len(chunks)} chunks")
         
+        annotate_chunks(chunks)
         self.document_chunks = chunks
         
 
         if not self.use_openai:
-            self.embedding_model = SentenceTransformer(self.embedding_model_name)
+            self.embedding_model = self._load_embedding_model()
         
 
         self._prepare_bm25()
@@ -95,8 +120,36 @@ class Retriever:
 
             self._prepare_embeddings_sync()
         
+        self._index_loaded()
         logger.info("Retriever initialized")
     
+    def load_index(self):
+
+        # Serves the index written by process_documents.py; no documents are re-processed
+        if not self._load_embeddings():
+            raise RuntimeError(f"No processed index in {self.vector_store_path}")
+        if not self.use_openai:
+            self.embedding_model = self._load_embedding_model()
+        self._prepare_bm25()
+        self._index_loaded()
+        logger.info(f"Loaded processed index {self.index_version} with {len(self.document_chunks)} chunks")
+    
+    def _index_loaded(self):
+
+        # Chunks loaded from an index written before annotations existed
+        annotate_chunks(self.document_chunks)
+        self.index_version = self._generate_documents_hash(self.document_chunks)[:16]
+        self._boost_cache.clear()
+    
+    def _load_embedding_model(self):
+
+        model_server = get_model_server_client()
+        if model_server:
+            logger.info(f"Using shared model server at {model_server.socket_path} for embeddings")
+            return RemoteEmbeddingModel(model_server)
+        resource_config.configure_torch()
+        return SentenceTransformer(self.embedding_model_name)
+    
     def _prepare_bm25(self):
 
         logger.info("Preparing BM25 index")
@@ -179,7 +232,7 @@ class Retriever:
                 logger.error(f"Error generating embeddings for batch {i//batch_size + 1}: {e}")
 
                 if self.embedding_model is None:
-                    self.embedding_model = SentenceTransformer(self.embedding_model_name)
+                    self.embedding_model = self._load_embedding_model()
                 fallback_embeddings = self.embedding_model.encode(batch, show_progress_bar=False)
                 all_embeddings.extend(fallback_embeddings.tolist())
         
@@ -214,9 +267,9 @@ class Retriever:
     
     async def _generate_query_embedding(self, query: str) -> np.ndarray:
 
-        if self.use_openai and self.openai_client:
+        if self.use_openai and self.async_openai_client:
             try:
-                response = self.openai_client.embeddings.create(
+                response = await self.async_openai_client.embeddings.create(
                     input=[query],
                     model=settings.OPENAI_EMBEDDING_MODEL
                 )
@@ -231,6 +284,43 @@ class Retriever:
         else:
             return self.embedding_model.encode([query])
     
+    async def aembed_query(self, query: str) -> np.ndarray:
+
+        if settings.MICRO_BATCH_ENABLED:
+            return await self.embedding_batcher.submit(query)
+        if self.use_openai and self.async_openai_client:
+            return await self._generate_query_embedding(query)
+        return await get_execution_pools().run("retrieval", self._generate_query_embedding_sync, query)
+    
+    async def _embed_query_batch(self, queries: List[str]) -> List[np.ndarray]:
+
+        # Identical queries from concurrent requests share one embedding
+        unique_queries = list(dict.fromkeys(queries))
+        embeddings = None
+        
+        if self.use_openai and self.async_openai_client:
+            try:
+                response = await self.async_openai_client.embeddings.create(
+                    input=unique_queries,
+                    model=settings.OPENAI_EMBEDDING_MODEL
+                )
+                ordered = sorted(response.data, key=lambda data: data.index)
+                embeddings = np.array([data.embedding for data in ordered])
+            except Exception as e:
+                logger.error(f"Error generating batched OpenAI query embeddings: {e}")
+                if not self.embedding_model:
+                    raise
+        
+        if embeddings is None and isinstance(self.embedding_model, RemoteEmbeddingModel):
+            embeddings = await self.embedding_model.client.embed(unique_queries)
+        elif embeddings is None:
+            embeddings = await get_execution_pools().run(
+                "retrieval", self.embedding_model.encode, unique_queries
+            )
+        
+        by_query = {query: embeddings[i:i + 1] for i, query in enumerate(unique_queries)}
+        return [by_query[query] for query in queries]
+    
     def _generate_query_embedding_sync(self, query: str) -> np.ndarray:
 
         if self.use_openai and self.openai_client:
@@ -309,7 +399,8 @@ class Retriever:
                     title=data["title"],
                     headers=data["headers"],
                     page_ref=data["page_ref"],
-                    chunk_id=data["chunk_id"]
+                    chunk_id=data["chunk_id"],
+                    annotations=ChunkAnnotations.from_dict(data.get("annotations"))
                 )
                 self.document_chunks.append(chunk)
             
@@ -355,31 +446,149 @@ class Retriever:
         if not self.bm25 or self.chunk_embeddings is None:
             raise ValueError("Retriever not initialized")
         
+        query_embedding = self._generate_query_embedding_sync(query)
+        return self.search_with_embedding(
+            query,
+            query_embedding,
+            top_k=top_k,
+            source_boosts=source_boosts,
+            header_boosts=header_boosts,
+            topic_boosts=topic_boosts
+        )
+    
+    async def asearch(
+        self,
+        query: str,
+        top_k: int = 50,
+        source_boosts: Optional[Dict[str, float]] = None,
+        header_boosts: Optional[Dict[str, float]] = None,
+        topic_boosts: Optional[Dict[str, float]] = None
+    ) -> List[RetrievalResult]:
 
-        query_tokens = self._tokenize(query)
+        if not self.bm25 or self.chunk_embeddings is None:
+            raise ValueError("Retriever not initialized")
         
+        pools = get_execution_pools()
+        if query in self._static_query_scores:
+            precomputed = await pools.run(
+                "retrieval",
+                self.search_precomputed,
+                query,
+                top_k,
+                source_boosts,
+                header_boosts,
+                topic_boosts
+            )
+            if precomputed is not None:
+                tracer.current_span().set_attribute("precomputed", True)
+                return precomputed
+        
+        with tracer.span("embedding"):
+            query_embedding = await self.aembed_query(query)
+        
+        return await pools.run(
+            "retrieval",
+            self.search_with_embedding,
+            query,
+            query_embedding,
+            top_k,
+            source_boosts,
+            header_boosts,
+            topic_boosts
+        )
+    
+    def search_with_embedding(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        top_k: int = 50,
+        source_boosts: Optional[Dict[str, float]] = None,
+        header_boosts: Optional[Dict[str, float]] = None,
+        topic_boosts: Optional[Dict[str, float]] = None
+    ) -> List[RetrievalResult]:
 
-        bm25_scores = self.bm25.get_scores(query_tokens)
-        
+        bm25_scores, dense_scores = self._component_scores(query, query_embedding)
+        return self._rank_results(
+            query,
+            bm25_scores,
+            dense_scores,
+            top_k,
+            source_boosts,
+            header_boosts,
+            topic_boosts
+        )
+    
+    def search_precomputed(
+        self,
+        query: str,
+        top_k: int = 50,
+        source_boosts: Optional[Dict[str, float]] = None,
+        header_boosts: Optional[Dict[str, float]] = None,
+        topic_boosts: Optional[Dict[str, float]] = None
+    ) -> Optional[List[RetrievalResult]]:
+
+        cached = self._static_query_scores.get(query)
+        if cached is None or self._static_scores_version != self.index_version:
+            return None
+        
+        bm25_scores, dense_scores = cached
+        return self._rank_results(
+            query,
+            bm25_scores,
+            dense_scores,
+            top_k,
+            source_boosts,
+            header_boosts,
+            topic_boosts
+        )
+    
+    def precompute_static_queries(self, queries: List[str]):
 
-        query_embedding = self._generate_query_embedding_sync(query)
-        dense_scores = np.dot(query_embedding, self.chunk_embeddings.T)[0]
+        if not self.bm25 or self.chunk_embeddings is None:
+            raise ValueError("Retriever not initialized")
         
+        self._static_query_scores = {}
+        for query in queries:
+            query_embedding = self._generate_query_embedding_sync(query)
+            self._static_query_scores[query] = self._component_scores(query, query_embedding)
+        self._static_scores_version = self.index_version
+        
+        logger.info(f"Precomputed scores for {len(queries)} static queries (index {self.index_version})")
+    
+    def _component_scores(self, query: str, query_embedding: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
 
-        bm25_scores = self._normalize_scores(bm25_scores)
-        dense_scores = self._normalize_scores(dense_scores)
+        with tracer.span("bm25"):
+            query_tokens = self._tokenize(query)
+            bm25_scores = self.bm25.get_scores(query_tokens)
+        
+        with tracer.span("dense_scoring", chunks=len(self.document_chunks)):
+            dense_scores = np.dot(query_embedding, self.chunk_embeddings.T)[0]
         
 
+        return self._normalize_scores(bm25_scores), self._normalize_scores(dense_scores)
+    
+    def _rank_results(
+        self,
+        query: str,
+        bm25_scores: np.ndarray,
+        dense_scores: np.ndarray,
+        top_k: int,
+        source_boosts: Optional[Dict[str, float]],
+        header_boosts: Optional[Dict[str, float]],
+        topic_boosts: Optional[Dict[str, float]]
+    ) -> List[RetrievalResult]:
+
         combined_scores = 0.5 * bm25_scores + 0.5 * dense_scores
         
 
         if source_boosts or header_boosts or topic_boosts:
-            combined_scores = self._apply_boosts(
-                combined_scores,
-                source_boosts,
-                header_boosts,
-                topic_boosts
-            )
+            with tracer.span("boosting"):
+                combined_scores = self._apply_boosts(
+                    combined_scores,
+                    source_boosts,
+                    header_boosts,
+                    topic_boosts
+                )
         
 
         top_indices = np.argsort(combined_scores)[::-1][:top_k]
@@ -391,7 +600,8 @@ class Retriever:
                 bm25_score=bm25_scores[idx],
                 dense_score=dense_scores[idx],
                 combined_score=combined_scores[idx],
-                query=query
+                query=query,
+                position=int(idx)
             )
             results.append(result)
         
@@ -419,7 +629,38 @@ class Retriever:
     ) -> np.ndarray:
 
         
-        boosted_scores = scores.copy()
+        return scores * self.boost_multipliers(source_boosts, header_boosts, topic_boosts)
+    
+    def boost_multipliers(
+        self,
+        source_boosts: Optional[Dict[str, float]],
+        header_boosts: Optional[Dict[str, float]],
+        topic_boosts: Optional[Dict[str, float]]
+    ) -> np.ndarray:
+
+        # One multiplier per chunk, indexed like document_chunks (RetrievalResult.position).
+        # They depend only on the boosts and the corpus, so reuse them across queries
+        boost_key = json.dumps([source_boosts, header_boosts, topic_boosts], sort_keys=True)
+        with self._boost_cache_lock:
+            multipliers = self._boost_cache.get(boost_key)
+            if multipliers is not None:
+                self._boost_cache.move_to_end(boost_key)
+        if multipliers is None:
+            multipliers = self._boost_multipliers(source_boosts, header_boosts, topic_boosts)
+            with self._boost_cache_lock:
+                self._boost_cache[boost_key] = multipliers
+                while len(self._boost_cache) > 64:
+                    self._boost_cache.popitem(last=False)
+        return multipliers
+    
+    def _boost_multipliers(
+        self,
+        source_boosts: Optional[Dict[str, float]],
+        header_boosts: Optional[Dict[str, float]],
+        topic_boosts: Optional[Dict[str, float]]
+    ) -> np.ndarray:
+
+        multipliers = np.ones(len(self.document_chunks))
         
         for i, chunk in enumerate(self.document_chunks):
             boost_multiplier = 1.0
@@ -437,13 +678,14 @@ class Retriever:
             
 
             if topic_boosts:
+                content_lower = chunk.content.lower()
                 for topic, boost_value in topic_boosts.items():
-                    if topic.lower() in chunk.content.lower():
+                    if topic.lower() in content_lower:
                         boost_multiplier *= boost_value
             
-            boosted_scores[i] *= boost_multiplier
+            multipliers[i] = boost_multiplier
         
-        return boosted_scores
+        return multipliers
     
     def get_sources_info(self) -> Dict[str, Any]:
 
@@ -0,0 +1,172 @@
+"""
+Semantic response cache for near-duplicate patient cases
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .response_cache import feedback_digest
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_ABBREVIATIONS = [
+    (r"\b(\d+)\s*(?:y/o|yo|y\.o\.|yrs? old|year old|years old)\b", r"\1 year old"),
+    (r"\bf\b", "female"),
+    (r"\bm\b", "male"),
+    (r"\bw/o\b", "without"),
+    (r"\bw/(?=\s|\w)", "with "),
+    (r"\bs/p\b", "status post"),
+    (r"\bl\b", "left"),
+    (r"\br\b", "right"),
+    (r"\bb/l\b", "bilateral"),
+    (r"\bpt\b", "patient")
+]
+
+_CASE_FIELDS = [
+    "patient_condition",
+    "desired_outcome",
+    "treatment_progression",
+    "age",
+    "gender",
+    "diagnosis",
+    "comorbidities",
+    "severity",
+    "prior_level_of_function",
+    "work_life_requirements"
+]
+def normalize_case_text(user_input: Any) -> str:
+
+    parts = []
+    for field in _CASE_FIELDS:
+        value = getattr(user_input, field, None)
+        if value:
+            parts.append(str(value))
+
+    text = " | ".join(parts).lower()
+    for pattern, replacement in _ABBREVIATIONS:
+        text = re.sub(pattern, replacement, text)
+    text = re.sub(r"[^\w\s|°]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+def constraints_key(rag_manifest: Any, feedback_state: Any, model_name: str, index_version: str) -> str:
+
+    manifest_data = rag_manifest.model_dump() if hasattr(rag_manifest, "model_dump") else (rag_manifest or {})
+    payload = {
+        "manifest": manifest_data,
+        "feedback": feedback_digest(feedback_state),
+        "model": model_name,
+        "index": index_version
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+class SemanticResponseCache:
+
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries: int = 500,
+        ttl_seconds: float = 3600,
+        histogram_buckets: int = 20
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Tuple[str, float, Dict[str, Any]]] = []
+        self.hits = 0
+        self.misses = 0
+        self.histogram_buckets = histogram_buckets
+        self._similarity_histogram = [0] * histogram_buckets
+        self._hit_similarities: List[float] = []
+
+    def _normalize(self, embedding: np.ndarray) -> np.ndarray:
+
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _record_similarity(self, similarity: float):
+
+        bucket = min(int(max(similarity, 0.0) * self.histogram_buckets), self.histogram_buckets - 1)
+        self._similarity_histogram[bucket] += 1
+
+    def _expire(self):
+
+        now = time.time()
+        keep = [i for i, (_, expires_at, _) in enumerate(self._entries) if expires_at >= now]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = self._vectors[keep] if keep else None
+
+    def lookup(self, embedding: np.ndarray, constraints: str) -> Optional[Tuple[Dict[str, Any], float]]:
+
+        self._expire()
+        if self._vectors is None:
+            self.misses += 1
+            return None
+
+        similarities = self._vectors @ self._normalize(embedding)
+        mask = np.array([key == constraints for key, _, _ in self._entries])
+        if not mask.any():
+            self.misses += 1
+            return None
+
+        similarities = np.where(mask, similarities, -1.0)
+        best = int(np.argmax(similarities))
+        best_similarity = float(similarities[best])
+        self._record_similarity(best_similarity)
+
+        if best_similarity < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._hit_similarities.append(best_similarity)
+        self._hit_similarities = self._hit_similarities[-1000:]
+        return self._entries[best][2], best_similarity
+
+    def store(self, embedding: np.ndarray, constraints: str, response: Dict[str, Any]):
+
+        vector = self._normalize(embedding)[np.newaxis, :]
+        self._entries.append((constraints, time.time() + self.ttl_seconds, response))
+        self._vectors = vector if self._vectors is None else np.vstack([self._vectors, vector])
+
+        if len(self._entries) > self.max_entries:
+            overflow = len(self._entries) - self.max_entries
+            self._entries = self._entries[overflow:]
+            self._vectors = self._vectors[overflow:]
+
+    def get_stats(self) -> Dict[str, Any]:
+
+        lookups = self.hits + self.misses
+        step = 1.0 / self.histogram_buckets
+        return {
+            "entries": len(self._entries),
+            "threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "similarity_histogram": {
+                f"{i * step:.2f}-{(i + 1) * step:.2f}": count
+                for i, count in enumerate(self._similarity_histogram)
+                if count
+            },
+            "hit_similarity_p50": float(np.percentile(self._hit_similarities, 50)) if self._hit_similarities else None,
+            "hit_similarity_min": min(self._hit_similarities) if self._hit_similarities else None
+        }
+def create_semantic_cache() -> Optional[SemanticResponseCache]:
+
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticResponseCache(
+        similarity_threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS
+    )
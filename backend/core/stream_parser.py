@@ -0,0 +1,131 @@
+"""
+Incremental JSON parsing of streamed model output
+"""
+
+import json
+import logging
+from typing import Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+
+_SCALAR_DELIMITERS = set(",}] \t\r\n")
+class _Frame:
+
+    __slots__ = ("kind", "start", "key", "index", "awaiting_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.awaiting_key = kind == "{"
+
+    def path_element(self):
+        return self.key if self.kind == "{" else self.index
+class IncrementalJSONParser:
+
+
+    def __init__(self, patterns: Sequence[Tuple]):
+        self.patterns = [tuple(pattern) for pattern in patterns]
+        self._text = ""
+        self._stack: List[_Frame] = []
+        self._started = False
+        self.done = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+
+    def _matches(self, path: Tuple) -> bool:
+
+        for pattern in self.patterns:
+            if len(pattern) == len(path) and all(
+                expected == WILDCARD or expected == actual for expected, actual in zip(pattern, path)
+            ):
+                return True
+        return False
+
+    def _path(self) -> Tuple:
+
+        return tuple(frame.path_element() for frame in self._stack)
+
+    def _value_done(self, start: int, end: int, events: List[Tuple[Tuple, Any]]):
+
+        path = self._path()
+        if self._matches(path):
+            try:
+                events.append((path, json.loads(self._text[start:end])))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Could not decode streamed value at {path}: {e}")
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple, Any]]:
+
+        events: List[Tuple[Tuple, Any]] = []
+        if self.done or not chunk:
+            return events
+
+        offset = len(self._text)
+        self._text += chunk
+
+        for k in range(offset, len(self._text)):
+            c = self._text[k]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._stack[-1].key = json.loads(self._text[self._string_start:k + 1])
+                        self._stack[-1].awaiting_key = False
+                    else:
+                        self._value_done(self._string_start, k + 1, events)
+                continue
+
+            if not self._started:
+                # Anything before the root object (e.g. a stray code fence) is ignored
+                if c == "{":
+                    self._started = True
+                    self._stack.append(_Frame("{", k))
+                continue
+
+            if self._scalar_start is not None and c in _SCALAR_DELIMITERS:
+                self._value_done(self._scalar_start, k, events)
+                self._scalar_start = None
+
+            if c in " \t\r\n":
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = k
+                self._string_is_key = self._stack[-1].kind == "{" and self._stack[-1].awaiting_key
+            elif c in "{[":
+                self._stack.append(_Frame(c, k))
+            elif c in "}]":
+                frame = self._stack.pop()
+                self._value_done(frame.start, k + 1, events)
+                if not self._stack:
+                    self.done = True
+                    break
+            elif c == ",":
+                frame = self._stack[-1]
+                if frame.kind == "[":
+                    frame.index += 1
+                else:
+                    frame.awaiting_key = True
+            elif c == ":":
+                continue
+            elif self._scalar_start is None:
+                self._scalar_start = k
+
+        return events
+
+    @property
+    def text(self) -> str:
+
+        return self._text
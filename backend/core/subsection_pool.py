@@ -0,0 +1,177 @@
+"""
+Shared retrieval candidate pool for the six-way subsection fan-out
+
+One search and one rerank per request produce a candidate pool. The pool is
+split by topic labels that are computed once per chunk when the index loads, so
+each parallel subsection prompt carries only the few sources for its own focus.
+Chunks without a label top up slices that come out short.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from .tracing import tracer
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Subsection title -> terms that mark a chunk as relevant to its focus
+SUBSECTION_TOPICS: Dict[str, List[str]] = {
+    "Manual Therapy Techniques": [
+        "manual therapy", "mobilization", "mobilisation", "soft tissue", "massage", "joint glide", "97140"
+    ],
+    "Progressive Strengthening Protocol": [
+        "strengthen", "strength", "resistance", "theraband", "progressive loading", "eccentric", "97110"
+    ],
+    "Neuromuscular Re-education": [
+        "neuromuscular", "balance", "coordination", "proprioception", "motor control", "re-education", "97112"
+    ],
+    "Work-Specific Functional Training": [
+        "functional", "work", "task-specific", "activities of daily living", "adl", "occupation", "97530", "97535"
+    ],
+    "Pain Management Modalities": [
+        "pain", "modalit", "ultrasound", "electrical stimulation", "tens", "paraffin", "cryotherapy", "heat",
+        "97010", "97018", "97032", "97035"
+    ],
+    "Home Exercise Program": [
+        "home exercise", "home program", "hep", "self-management", "independent", "handout"
+    ]
+}
+class SubsectionPool:
+
+
+    def __init__(
+        self,
+        retriever: Any,
+        reranker: Any,
+        topics: Optional[Dict[str, List[str]]] = None,
+        pool_size: Optional[int] = None,
+        rerank_top_n: Optional[int] = None,
+        per_subsection: Optional[int] = None
+    ):
+        self.retriever = retriever
+        self.reranker = reranker
+        self.topics = topics or SUBSECTION_TOPICS
+        self.pool_size = pool_size or settings.SUBSECTION_POOL_SIZE
+        self.rerank_top_n = rerank_top_n or settings.SUBSECTION_POOL_RERANK_TOP_N
+        self.per_subsection = per_subsection or settings.SUBSECTION_SOURCES_PER_PROMPT
+        self._labels: Dict[str, List[str]] = {}
+        self._labels_version = None
+        self.requests = 0
+        self.sources_used = 0
+        self.empty_slices = 0
+
+    @classmethod
+    def load(cls, vector_store_path: str) -> "SubsectionPool":
+
+        from .reranker import Reranker
+        from .retriever import Retriever
+
+        retriever = Retriever(embedding_model=settings.EMBEDDING_MODEL, vector_store_path=vector_store_path)
+        retriever.load_index()
+
+        reranker = Reranker(model_name=settings.RERANK_MODEL, max_length=512)
+        reranker.initialize()
+        reranker.index_chunks(retriever.document_chunks)
+
+        pool = cls(retriever, reranker)
+        pool.label_chunks()
+        return pool
+
+    @property
+    def index_version(self) -> str:
+
+        return self.retriever.index_version
+
+    def label_chunks(self):
+
+        self._labels = {chunk.chunk_id: self._label(chunk) for chunk in self.retriever.document_chunks}
+        self._labels_version = self.retriever.index_version
+        labelled = sum(1 for labels in self._labels.values() if labels)
+        logger.info(f"Labelled {labelled}/{len(self._labels)} chunks with subsection topics")
+
+    def _label(self, chunk: Any) -> List[str]:
+
+        text = (" ".join(chunk.headers or []) + " " + chunk.content).lower()
+        return [title for title, terms in self.topics.items() if any(term in text for term in terms)]
+
+    def labels_for(self, chunk: Any) -> List[str]:
+
+        if self._labels_version != self.retriever.index_version:
+            self.label_chunks()
+        labels = self._labels.get(chunk.chunk_id)
+        if labels is None:
+            labels = self._labels[chunk.chunk_id] = self._label(chunk)
+        return labels
+
+    async def build(self, query: str) -> Dict[str, List[Any]]:
+
+        with tracer.span("subsection_pool", top_k=self.pool_size) as span:
+            candidates = await self.retriever.asearch(query=query, top_k=self.pool_size)
+            reranked = await self.reranker.arerank(
+                query=query,
+                results=candidates,
+                top_n=self.rerank_top_n
+            )
+            slices = self.partition(reranked)
+            span.set_attribute("candidates", len(reranked))
+
+        self.requests += 1
+        self.sources_used += sum(len(items) for items in slices.values())
+        self.empty_slices += sum(1 for items in slices.values() if not items)
+        return slices
+
+    def partition(self, results: List[Any]) -> Dict[str, List[Any]]:
+
+        slices: Dict[str, List[Any]] = {title: [] for title in self.topics}
+        unlabelled = []
+        for result in results:
+            labels = self.labels_for(result.chunk)
+            if not labels:
+                unlabelled.append(result)
+            for title in labels:
+                if len(slices[title]) < self.per_subsection:
+                    slices[title].append(result)
+
+        for items in slices.values():
+            for result in unlabelled:
+                if len(items) >= self.per_subsection:
+                    break
+                items.append(result)
+        return slices
+
+    def format_sources(self, results: List[Any], max_chars: int = 600) -> str:
+
+        if not results:
+            return ""
+        lines = ["Ground the exercises in these sources where they apply:"]
+        for number, result in enumerate(results, start=1):
+            chunk = result.chunk
+            details = [chunk.source_type, chunk.source_id]
+            if chunk.headers:
+                details.append(chunk.headers[0])
+            if chunk.page_ref:
+                details.append(chunk.page_ref)
+            content = " ".join(chunk.content.split())
+            if len(content) > max_chars:
+                content = content[:max_chars].rsplit(" ", 1)[0] + "..."
+            lines.append(f"[{number}] {' | '.join(details)}\n{content}")
+        return "\n\n".join(lines)
+
+    async def sources_by_subsection(self, query: str) -> Dict[str, str]:
+
+        slices = await self.build(query)
+        return {title: self.format_sources(items) for title, items in slices.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+
+        return {
+            "index_version": self.index_version,
+            "chunks": len(self.retriever.document_chunks),
+            "labelled_chunks": sum(1 for labels in self._labels.values() if labels),
+            "requests": self.requests,
+            "avg_sources_per_subsection": (
+                round(self.sources_used / (self.requests * len(self.topics)), 2) if self.requests else 0.0
+            ),
+            "empty_slices": self.empty_slices
+        }
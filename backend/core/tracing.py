@@ -0,0 +1,239 @@
+"""
+Lightweight tracing with nested spans and pluggable exporters
+
+Spans nest through a context variable, so they follow asyncio tasks and work
+submitted through the execution pools. When tracing is disabled every span is a
+shared no-op object.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+class Span:
+
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._trace_spans: List["Span"] = parent._trace_spans if parent else []
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self._trace_spans.append(self)
+        if self.parent is None:
+            self.tracer._export(self._trace_spans)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+class NoopSpan:
+
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+_NOOP_SPAN = NoopSpan()
+class SpanExporter(ABC):
+
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+
+        pass
+class LogSpanExporter(SpanExporter):
+
+
+    def export(self, spans: List[Span]):
+
+        root = spans[-1]
+        stages = " ".join(
+            f"{span.name}={span.duration_ms:.1f}ms" for span in sorted(spans[:-1], key=lambda s: s.start_ns)
+        )
+        logger.info(f"trace={root.trace_id} {root.name}={root.duration_ms:.1f}ms {stages}")
+class JSONLSpanExporter(SpanExporter):
+
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+class OTLPSpanExporter(SpanExporter):
+
+
+    def __init__(self, endpoint: str, service_name: str = "note-ninjas-backend"):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self._queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=1000)
+        self._worker = threading.Thread(target=self._send_loop, name="otlp-exporter", daemon=True)
+        self._worker.start()
+
+    def export(self, spans: List[Span]):
+
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("OTLP export queue full, dropping trace")
+
+    def _attribute(self, key: str, value: Any) -> Dict[str, Any]:
+
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "note-ninjas"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": 1,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+                            "status": {"code": 2, "message": span.error} if span.error else {}
+                        }
+                        for span in spans
+                    ]
+                }]
+            }]
+        }
+
+    def _send_loop(self):
+
+        while True:
+            spans = self._queue.get()
+            try:
+                request = urllib.request.Request(
+                    self.url,
+                    data=json.dumps(self._payload(spans)).encode("utf-8"),
+                    headers={"Content-Type": "application/json"},
+                    method="POST"
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            except Exception as e:
+                logger.warning(f"OTLP export failed: {e}")
+class Tracer:
+
+
+    def __init__(self, enabled: bool = False, exporters: Optional[List[SpanExporter]] = None):
+        self.enabled = enabled
+        self.exporters = exporters or []
+
+    def span(self, name: str, **attributes):
+
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def current_span(self):
+
+        span = _current_span.get() if self.enabled else None
+        return span or _NOOP_SPAN
+
+    def _export(self, spans: List[Span]):
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                logger.warning(f"Span exporter {exporter.__class__.__name__} failed: {e}")
+def detach_current_span():
+
+    # Work shared by several requests (e.g. micro-batches) should not nest under one caller's trace
+    _current_span.set(None)
+def _build_exporters() -> List[SpanExporter]:
+
+    exporters: List[SpanExporter] = []
+    for name in [n.strip() for n in settings.TRACING_EXPORTERS.split(",") if n.strip()]:
+        if name == "log":
+            exporters.append(LogSpanExporter())
+        elif name == "jsonl":
+            exporters.append(JSONLSpanExporter(settings.TRACING_JSONL_PATH))
+        elif name == "otlp":
+            exporters.append(OTLPSpanExporter(settings.TRACING_OTLP_ENDPOINT))
+        else:
+            logger.warning(f"Unknown span exporter: {name}")
+    return exporters
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    exporters=_build_exporters() if settings.TRACING_ENABLED else []
+)
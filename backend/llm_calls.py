@@ -0,0 +1,274 @@
+"""
+Timeouts, jittered retries and hedging for chat completion calls
+
+Each call gets a per-attempt timeout. Transient failures (timeouts, connection
+errors, 429 and 5xx) are retried with full-jitter exponential backoff. With
+hedging enabled, a duplicate request is fired once an attempt runs past the
+recent p95 latency for that call name; the first success wins and the other is
+cancelled. Every attempt, hedges included, is admitted through the shared
+llm_limiter before it is sent; time spent queued there does not count against
+the attempt timeout. A streamed call keeps its limiter lease until the stream
+is consumed or closed.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import openai
+
+from config import settings
+from llm_limiter import llm_limiter
+
+logger = logging.getLogger(__name__)
+
+_RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+class _CallStats:
+
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        p95 = self.percentile(95)
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "attempts_per_call": self.attempts / self.calls if self.calls else 0.0,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": self.hedge_wins / self.hedges if self.hedges else 0.0,
+            "p95_latency_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+class LeasedStream:
+
+
+    def __init__(self, stream: Any, lease: Any, lease_context: Any):
+        self.stream = stream
+        self.lease = lease
+        self._lease_context = lease_context
+        self._closed = False
+
+    def __aiter__(self) -> "LeasedStream":
+
+        return self
+
+    async def __anext__(self) -> Any:
+
+        if self._closed:
+            raise StopAsyncIteration
+        try:
+            chunk = await self.stream.__anext__()
+        except BaseException:
+            # Exhausted, failed or cancelled: the lease goes back either way
+            await self.aclose()
+            raise
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.lease.settle(usage)
+        return chunk
+
+    async def aclose(self):
+
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self.stream, "close", None)
+            if close is not None:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+        finally:
+            await self._lease_context.__aexit__(None, None, None)
+
+    async def __aenter__(self) -> "LeasedStream":
+
+        return self
+
+    async def __aexit__(self, *exc_info):
+
+        await self.aclose()
+class LLMCaller:
+
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        hedging: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        latency_window: int = 200
+    ):
+        self.timeout = timeout if timeout is not None else settings.LLM_CALL_TIMEOUT_SECONDS
+        self.max_retries = max_retries if max_retries is not None else settings.LLM_MAX_RETRIES
+        self.base_delay = base_delay if base_delay is not None else settings.LLM_RETRY_BASE_DELAY_SECONDS
+        self.max_delay = max_delay if max_delay is not None else settings.LLM_RETRY_MAX_DELAY_SECONDS
+        self.hedging = hedging if hedging is not None else settings.LLM_HEDGING_ENABLED
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else settings.LLM_HEDGE_PERCENTILE
+        self.hedge_min_samples = hedge_min_samples if hedge_min_samples is not None else settings.LLM_HEDGE_MIN_SAMPLES
+        self.latency_window = latency_window
+        self._stats: Dict[str, _CallStats] = {}
+        self._lock = threading.Lock()
+
+    def _get_stats(self, name: str) -> _CallStats:
+
+        with self._lock:
+            if name not in self._stats:
+                self._stats[name] = _CallStats(self.latency_window)
+            return self._stats[name]
+
+    async def call(
+        self,
+        name: str,
+        attempt_fn: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        stream: bool = False
+    ) -> Any:
+
+        stats = self._get_stats(name)
+        stats.calls += 1
+
+        for retry in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                result = await self._hedged(stats, attempt_fn, tokens, stream)
+                stats.latencies.append(time.perf_counter() - started)
+                return result
+            except _RETRYABLE_ERRORS as e:
+                if retry == self.max_retries:
+                    stats.failures += 1
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+                logger.warning(f"{name} attempt {retry + 1} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                stats.retries += 1
+                await asyncio.sleep(delay)
+            except Exception:
+                stats.failures += 1
+                raise
+
+    async def _attempt(
+        self,
+        stats: _CallStats,
+        attempt_fn: Callable[[], Awaitable[Any]],
+        tokens: int,
+        stream: bool = False
+    ) -> Any:
+
+        if stream:
+            return await self._open_stream(stats, attempt_fn, tokens)
+        async with llm_limiter.acquire(tokens) as lease:
+            stats.attempts += 1
+            try:
+                result = await asyncio.wait_for(attempt_fn(), self.timeout)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                raise
+            lease.settle(getattr(result, "usage", None))
+            return result
+
+    async def _open_stream(self, stats: _CallStats, attempt_fn: Callable[[], Awaitable[Any]], tokens: int) -> LeasedStream:
+
+        # Tokens are generated while the stream is read, so the lease outlives this attempt
+        lease_context = llm_limiter.acquire(tokens)
+        lease = await lease_context.__aenter__()
+        try:
+            stats.attempts += 1
+            try:
+                result = await asyncio.wait_for(attempt_fn(), self.timeout)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                raise
+        except BaseException:
+            await lease_context.__aexit__(None, None, None)
+            raise
+        return LeasedStream(result, lease, lease_context)
+
+    def _hedge_delay(self, stats: _CallStats) -> Optional[float]:
+
+        if not self.hedging or len(stats.latencies) < self.hedge_min_samples:
+            return None
+        return stats.percentile(self.hedge_percentile)
+
+    async def _hedged(
+        self,
+        stats: _CallStats,
+        attempt_fn: Callable[[], Awaitable[Any]],
+        tokens: int,
+        stream: bool = False
+    ) -> Any:
+
+        primary = asyncio.ensure_future(self._attempt(stats, attempt_fn, tokens, stream))
+        tasks = {primary}
+        winner = None
+        try:
+            hedge_delay = self._hedge_delay(stats)
+            if hedge_delay is None:
+                winner = primary
+                return await primary
+
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                stats.hedges += 1
+                hedge = asyncio.ensure_future(self._attempt(stats, attempt_fn, tokens, stream))
+                tasks.add(hedge)
+
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            stats.hedge_wins += 1
+                        winner = task
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # The losing request (or both, if the caller was cancelled) is cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif task is not winner and not task.cancelled() and task.exception() is None:
+                    # A losing stream that opened at the same moment still holds a lease
+                    if isinstance(task.result(), LeasedStream):
+                        await task.result().aclose()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+llm_caller = LLMCaller()
@@ -0,0 +1,209 @@
+"""
+Process-wide admission control for chat completion calls
+
+Requests/min and tokens/min are enforced as continuously refilling allowances,
+alongside a cap on calls in flight. Callers that cannot be admitted wait in a
+per-user queue and users are served round-robin, so one request's six-way
+fan-out cannot starve everyone else.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fairness key for calls made from the current request (session or user id)
+llm_user: contextvars.ContextVar[str] = contextvars.ContextVar("llm_user", default="anonymous")
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+
+    # Reserved up front and settled against the reported usage once the call returns
+    prompt_chars = sum(len(message.get("content") or "") for message in messages)
+    return (prompt_chars + 3) // 4 + max_tokens
+class _Waiter:
+
+    __slots__ = ("tokens", "future")
+
+    def __init__(self, tokens: int, future: asyncio.Future):
+        self.tokens = tokens
+        self.future = future
+class _Lease:
+
+
+    def __init__(self, limiter: "LLMLimiter", tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+
+    def settle(self, usage: Any):
+
+        total = getattr(usage, "total_tokens", None)
+        if total is None:
+            return
+        self.limiter._refund(self.tokens - total)
+        self.tokens = total
+class LLMLimiter:
+
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_in_flight: Optional[int] = None
+    ):
+        self.requests_per_minute = (
+            requests_per_minute if requests_per_minute is not None else settings.LLM_REQUESTS_PER_MINUTE
+        )
+        self.tokens_per_minute = (
+            tokens_per_minute if tokens_per_minute is not None else settings.LLM_TOKENS_PER_MINUTE
+        )
+        self.max_in_flight = max_in_flight if max_in_flight is not None else settings.LLM_MAX_IN_FLIGHT
+        self._request_allowance = float(self.requests_per_minute)
+        self._token_allowance = float(self.tokens_per_minute)
+        self._refilled = time.monotonic()
+        self._in_flight = 0
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int = 0, user: Optional[str] = None) -> AsyncIterator[_Lease]:
+
+        user = user or llm_user.get()
+        started = time.monotonic()
+        self._refill()
+
+        if not self._queues and self._admit_delay(tokens) == 0:
+            self._take(tokens)
+        else:
+            waiter = _Waiter(tokens, asyncio.get_running_loop().create_future())
+            self._queues.setdefault(user, deque()).append(waiter)
+            self.queued += 1
+            self._dispatch()
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Admitted just as the caller went away
+                    self._release()
+                self._dispatch()
+                raise
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+        lease = _Lease(self, tokens)
+        try:
+            yield lease
+        finally:
+            self._release()
+
+    def _refill(self):
+
+        now = time.monotonic()
+        elapsed = now - self._refilled
+        self._refilled = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def _admit_delay(self, tokens: int) -> Optional[float]:
+
+        # 0 admits now, None waits for a call to finish, otherwise seconds until the allowances refill
+        if self.max_in_flight and self._in_flight >= self.max_in_flight:
+            return None
+        delay = 0.0
+        if self.requests_per_minute and self._request_allowance < 1:
+            delay = max(delay, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            # A call larger than the whole budget is admitted once the allowance is full
+            needed = min(tokens, self.tokens_per_minute)
+            if self._token_allowance < needed:
+                delay = max(delay, (needed - self._token_allowance) * 60.0 / self.tokens_per_minute)
+        return delay
+
+    def _take(self, tokens: int):
+
+        self._in_flight += 1
+        if self.requests_per_minute:
+            self._request_allowance -= 1
+        if self.tokens_per_minute:
+            self._token_allowance -= tokens
+
+    def _release(self):
+
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _refund(self, tokens: int):
+
+        if self.tokens_per_minute:
+            self._token_allowance = min(float(self.tokens_per_minute), self._token_allowance + tokens)
+        if tokens > 0:
+            self._dispatch()
+
+    def _dispatch(self):
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+
+        while self._queues:
+            user, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            if waiter.future.done():
+                # Cancelled while queued
+                queue.popleft()
+                if not queue:
+                    del self._queues[user]
+                continue
+
+            delay = self._admit_delay(waiter.tokens)
+            if delay is None:
+                return
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            queue.popleft()
+            self._take(waiter.tokens)
+            waiter.future.set_result(None)
+            # Round-robin: the user goes to the back of the rotation
+            if queue:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+
+    def get_stats(self) -> Dict[str, Any]:
+
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "waiting": sum(len(queue) for queue in self._queues.values()),
+            "waiting_users": len(self._queues),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1)
+        }
+llm_limiter = LLMLimiter()
@@ -0,0 +1,50 @@
+"""
+Token usage and provider prompt-cache accounting for chat completion calls
+
+Prompts are laid out with all static instructions first so the provider's
+automatic prompt caching can reuse the prefix. cached_tokens reports how much
+of each prompt was served from that cache.
+"""
+
+import threading
+from typing import Any, Dict
+class LLMUsageTracker:
+
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def record(self, prompt_name: str, usage: Any) -> Dict[str, int]:
+
+        if usage is None:
+            return {}
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        counts = {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0
+        }
+
+        with self._lock:
+            totals = self._totals.setdefault(
+                prompt_name,
+                {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+            )
+            totals["calls"] += 1
+            for key, value in counts.items():
+                totals[key] += value
+        return counts
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+
+        with self._lock:
+            return {
+                name: {
+                    **totals,
+                    "cached_ratio": totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+                }
+                for name, totals in self._totals.items()
+            }
+llm_usage = LLMUsageTracker()
@@ -0,0 +1,3 @@
+"""
+Load-testing tools: a local OpenAI-compatible mock server and a request driver
+"""
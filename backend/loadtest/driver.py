@@ -0,0 +1,299 @@
+"""
+Load driver that replays request mixes against the FastAPI apps
+
+Virtual users pick endpoints by weight from a mix and send recommendation
+requests, either closed-loop (--concurrency users back to back) or open-loop
+(--rate arrivals per second). The report gives count, error rate, throughput and
+p50/p95/p99 latency per endpoint; streamed endpoints also report time to first
+event.
+
+Run with: python -m loadtest.driver --app main --base-url http://127.0.0.1:8002 --concurrency 16 --duration 60
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# name, method, path, weight, streamed
+DEFAULT_MIXES: Dict[str, List[Dict[str, Any]]] = {
+    "main": [
+        {"name": "recommendations", "method": "POST", "path": "/recommendations", "weight": 0.7, "stream": False},
+        {"name": "recommendations_stream", "method": "POST", "path": "/recommendations/stream", "weight": 0.3, "stream": True}
+    ],
+    "simple": [
+        {"name": "recommendations", "method": "POST", "path": "/recommendations", "weight": 0.5, "stream": False},
+        {"name": "recommendations_stream", "method": "POST", "path": "/recommendations/stream", "weight": 0.5, "stream": True}
+    ],
+    "db": [
+        {"name": "recommendations", "method": "POST", "path": "/recommendations", "weight": 0.9, "stream": False},
+        {"name": "health", "method": "GET", "path": "/health", "weight": 0.1, "stream": False}
+    ]
+}
+
+SAMPLE_CASES = [
+    {"patient_condition": "21 year old female with torn rotator cuff", "desired_outcome": "increase shoulder abduction to 150 degrees"},
+    {"patient_condition": "68 year old male 6 weeks post total knee replacement", "desired_outcome": "independent stair climbing"},
+    {"patient_condition": "45 year old carpenter with lateral epicondylitis", "desired_outcome": "return to full work duties"},
+    {"patient_condition": "72 year old female with left hemiparesis after stroke", "desired_outcome": "independent upper body dressing"},
+    {"patient_condition": "35 year old office worker with carpal tunnel syndrome", "desired_outcome": "pain-free typing for 2 hours"},
+    {"patient_condition": "80 year old with Parkinson's disease and falls", "desired_outcome": "safe household ambulation"}
+]
+def percentile(values: List[float], pct: float) -> Optional[float]:
+
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(-(-pct * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+class EndpointStats:
+
+
+    def __init__(self, name: str, stream: bool):
+        self.name = name
+        self.stream = stream
+        self.count = 0
+        self.errors = 0
+        self.statuses: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.first_event: List[float] = []
+
+    def record(self, status: str, latency: float, ok: bool, first_event: Optional[float] = None):
+
+        self.count += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+            return
+        self.latencies.append(latency)
+        if first_event is not None:
+            self.first_event.append(first_event)
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        report = {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.count, 4) if self.count else 0.0,
+            "throughput_rps": round((self.count - self.errors) / elapsed, 3) if elapsed else 0.0,
+            "p50_ms": ms(percentile(self.latencies, 50)),
+            "p95_ms": ms(percentile(self.latencies, 95)),
+            "p99_ms": ms(percentile(self.latencies, 99)),
+            "statuses": self.statuses
+        }
+        if self.stream:
+            report["first_event_p50_ms"] = ms(percentile(self.first_event, 50))
+            report["first_event_p95_ms"] = ms(percentile(self.first_event, 95))
+        return report
+class LoadDriver:
+
+
+    def __init__(
+        self,
+        base_url: str,
+        mix: List[Dict[str, Any]],
+        cases: Optional[List[Dict[str, Any]]] = None,
+        repeat_rate: float = 0.0,
+        timeout: float = 120.0,
+        seed: Optional[int] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.mix = mix
+        self.cases = cases or SAMPLE_CASES
+        self.repeat_rate = repeat_rate
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.stats = {entry["name"]: EndpointStats(entry["name"], entry.get("stream", False)) for entry in mix}
+        self._sequence = itertools.count(1)
+        self._last_body: Optional[Dict[str, Any]] = None
+
+    def _pick(self) -> Dict[str, Any]:
+
+        return self.random.choices(self.mix, weights=[entry["weight"] for entry in self.mix])[0]
+
+    def _body(self) -> Dict[str, Any]:
+
+        n = next(self._sequence)
+        if self._last_body is not None and self.random.random() < self.repeat_rate:
+            # Identical payloads exercise coalescing and the response caches
+            return {**self._last_body, "session_id": f"load-{n}"}
+
+        case = dict(self.random.choice(self.cases))
+        # A unique marker keeps fresh requests from being served by the caches
+        case["patient_condition"] = f"{case['patient_condition']} (load {n})"
+        body = {"user_input": {"input_mode": "simple", **case}, "session_id": f"load-{n}"}
+        self._last_body = body
+        return body
+
+    async def _send(self, client: httpx.AsyncClient, entry: Dict[str, Any]):
+
+        stats = self.stats[entry["name"]]
+        url = self.base_url + entry["path"]
+        body = self._body() if entry["method"] == "POST" else None
+        started = time.perf_counter()
+        try:
+            if not entry.get("stream"):
+                response = await client.request(entry["method"], url, json=body)
+                stats.record(str(response.status_code), time.perf_counter() - started, response.is_success)
+                return
+
+            first_event = None
+            stream_error = False
+            async with client.stream(entry["method"], url, json=body) as response:
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    if first_event is None:
+                        first_event = time.perf_counter() - started
+                    if line == "event: error" or ('"type": "error"' in line and line.startswith("data:")):
+                        stream_error = True
+            status = "stream_error" if stream_error and response.is_success else str(response.status_code)
+            stats.record(status, time.perf_counter() - started, response.is_success and not stream_error, first_event)
+        except httpx.HTTPError as e:
+            stats.record(type(e).__name__, time.perf_counter() - started, False)
+
+    async def run_closed(self, concurrency: int, duration: Optional[float], requests: Optional[int]) -> Dict[str, Any]:
+
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+        budget = itertools.count() if requests is None else iter(range(requests))
+
+        async def user(client: httpx.AsyncClient):
+            for _ in budget:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                await self._send(client, self._pick())
+
+        async with httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+            await asyncio.gather(*[user(client) for _ in range(concurrency)])
+        return self.report(time.perf_counter() - started, {"mode": "closed", "concurrency": concurrency})
+
+    async def run_open(self, rate: float, duration: float, max_in_flight: int) -> Dict[str, Any]:
+
+        started = time.perf_counter()
+        deadline = started + duration
+        in_flight = asyncio.Semaphore(max_in_flight)
+        tasks = set()
+        dropped = 0
+
+        async def one(client: httpx.AsyncClient, entry: Dict[str, Any]):
+            try:
+                await self._send(client, entry)
+            finally:
+                in_flight.release()
+
+        async with httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_connections=max_in_flight)) as client:
+            while time.perf_counter() < deadline:
+                # Poisson arrivals; when the app falls behind arrivals beyond max_in_flight are dropped
+                await asyncio.sleep(self.random.expovariate(rate))
+                if in_flight.locked():
+                    dropped += 1
+                    continue
+                await in_flight.acquire()
+                task = asyncio.ensure_future(one(client, self._pick()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        return self.report(
+            time.perf_counter() - started,
+            {"mode": "open", "rate": rate, "max_in_flight": max_in_flight, "dropped_arrivals": dropped}
+        )
+
+    def report(self, elapsed: float, run: Dict[str, Any]) -> Dict[str, Any]:
+
+        total = sum(stats.count for stats in self.stats.values())
+        errors = sum(stats.errors for stats in self.stats.values())
+        return {
+            "run": {**run, "base_url": self.base_url, "seconds": round(elapsed, 2)},
+            "total": {
+                "count": total,
+                "errors": errors,
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "throughput_rps": round((total - errors) / elapsed, 3) if elapsed else 0.0
+            },
+            "endpoints": {name: stats.to_dict(elapsed) for name, stats in self.stats.items()}
+        }
+def format_report(report: Dict[str, Any]) -> str:
+
+    header = f"{'endpoint':<26}{'count':>7}{'err%':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttfe p50':>10}"
+    lines = [header, "-" * len(header)]
+    for name, stats in report["endpoints"].items():
+        lines.append(
+            f"{name:<26}{stats['count']:>7}{stats['error_rate'] * 100:>7.1f}%{stats['throughput_rps']:>9.2f}"
+            f"{stats['p50_ms'] or 0:>10.0f}{stats['p95_ms'] or 0:>10.0f}{stats['p99_ms'] or 0:>10.0f}"
+            f"{stats.get('first_event_p50_ms') or 0:>10.0f}"
+        )
+    total = report["total"]
+    lines.append("-" * len(header))
+    lines.append(
+        f"{'total':<26}{total['count']:>7}{total['error_rate'] * 100:>7.1f}%{total['throughput_rps']:>9.2f}"
+        f"   ({report['run']['seconds']}s, {report['run']['mode']})"
+    )
+    return "\n".join(lines)
+def _load_cases(path: str) -> List[Dict[str, Any]]:
+
+    # Same JSONL shape as the batch input; only user_input is used
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                cases.append(record.get("user_input", record))
+    return cases
+def main():
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay request mixes against a running app")
+    parser.add_argument("--app", choices=sorted(DEFAULT_MIXES), default="main", help="Built-in endpoint mix")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mix", help="JSON file with a list of {name, method, path, weight, stream}")
+    parser.add_argument("--cases", help="JSONL of requests or user inputs to draw from")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop virtual users")
+    parser.add_argument("--rate", type=float, default=None, help="Open-loop arrivals per second instead of closed-loop users")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=None, help="Stop closed-loop runs after this many requests")
+    parser.add_argument("--repeat-rate", type=float, default=0.0, help="Fraction of requests that resend the previous payload")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    mix = DEFAULT_MIXES[args.app]
+    if args.mix:
+        with open(args.mix, "r", encoding="utf-8") as f:
+            mix = json.load(f)
+
+    driver = LoadDriver(
+        args.base_url,
+        mix,
+        cases=_load_cases(args.cases) if args.cases else None,
+        repeat_rate=args.repeat_rate,
+        timeout=args.timeout,
+        seed=args.seed
+    )
+    if args.rate:
+        report = asyncio.run(driver.run_open(args.rate, args.duration, args.max_in_flight))
+    else:
+        duration = None if args.requests else args.duration
+        report = asyncio.run(driver.run_closed(args.concurrency, duration, args.requests))
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+if __name__ == "__main__":
+    main()
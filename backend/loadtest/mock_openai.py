@@ -0,0 +1,310 @@
+"""
+Local OpenAI-compatible mock server for load testing
+
+Serves /v1/chat/completions (plain and streamed) and /v1/embeddings with
+configurable latency, error and 429 injection, so the apps can be driven at
+load without spending quota. Point an app at it with
+OPENAI_BASE_URL=http://127.0.0.1:9100/v1 and any non-empty OPENAI_API_KEY.
+
+Chat responses are canned JSON shaped for whichever prompt was sent: a
+subsection (app_with_db / simple_main), a case name, or the full recommendation
+document (main). Embeddings are deterministic unit vectors seeded by the input
+text, so identical texts always embed identically.
+
+Run with: python -m loadtest.mock_openai [--port 9100] [--latency-ms 800] [--rate-limit-rate 0.02] ...
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
+class MockConfig:
+
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.4,
+        tail_rate: float = 0.0,
+        tail_ms: float = 5000.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        stream_chunks: int = 40,
+        stream_chunk_ms: float = 15.0,
+        embedding_latency_ms: float = 40.0,
+        embedding_dimensions: int = 1536,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_chunks = stream_chunks
+        self.stream_chunk_ms = stream_chunk_ms
+        self.embedding_latency_ms = embedding_latency_ms
+        self.embedding_dimensions = embedding_dimensions
+        self.random = random.Random(seed)
+
+    def sample_latency(self, median_ms: float) -> float:
+
+        # Lognormal around the median, plus an optional slow tail
+        latency = median_ms * math.exp(self.random.gauss(0.0, self.latency_sigma)) if self.latency_sigma else median_ms
+        if self.tail_rate and self.random.random() < self.tail_rate:
+            latency += self.tail_ms
+        return latency / 1000.0
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        return {key: value for key, value in vars(self).items() if key != "random"}
+def _count_tokens(text: str) -> int:
+
+    return (len(text) + 3) // 4
+def _message_text(messages: List[Dict[str, Any]], role: str) -> str:
+
+    return "\n".join(str(message.get("content") or "") for message in messages if message.get("role") == role)
+def deterministic_embedding(text: str, dimensions: int) -> List[float]:
+
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+def _exercise(title: str) -> Dict[str, Any]:
+
+    return {
+        "name": title,
+        "title": title,
+        "description": f"{title} performed for 3 sets of 10 with rest as tolerated, progressing load weekly.",
+        "cues": [
+            "Verbal: Keep your shoulder blade set down and back through the movement.",
+            "Tactile: Light pressure at the inferior angle of the scapula to guide upward rotation.",
+            "Visual: Mirror feedback to monitor trunk compensation."
+        ],
+        "documentation": f"Pt instructed in {title.lower()}; required min verbal cues for form, tolerated well.",
+        "documentation_examples": [f"Pt instructed in {title.lower()}; required min verbal cues for form, tolerated well."],
+        "cpt": "97110",
+        "cpt_codes": [{"code": "97110", "description": "Therapeutic exercise", "notes": "Each 15 minutes"}],
+        "notes": "Stop if pain exceeds 4/10.",
+        "sources": [{"type": "note_ninjas", "id": "mock-source", "section": None, "page": None, "quote": "Mock quote."}]
+    }
+def canned_content(body: Dict[str, Any]) -> str:
+
+    messages = body.get("messages") or []
+    user_text = _message_text(messages, "user")
+
+    if "treatment subsection" in user_text:
+        title = "Mock Subsection"
+        for line in user_text.splitlines():
+            if line.startswith("Use \"") and "\" as the title" in line:
+                title = line.split("\"")[1]
+        exercises = [_exercise(f"{title} Exercise {i + 1}") for i in range(2)]
+        return json.dumps({
+            "title": title,
+            "description": f"Start with {exercises[0]['name']}, then {exercises[1]['name']}.",
+            "rationale": "Mock rationale for load testing.",
+            "exercises": exercises
+        })
+
+    if (body.get("max_tokens") or 0) <= 50:
+        return "Mock Case Name"
+
+    return json.dumps({
+        "high_level": ["Progress strengthening as tolerated", "Reassess range of motion weekly"],
+        "subsections": [
+            {
+                "title": f"Mock Subsection {i + 1}",
+                "rationale": "Mock rationale for load testing.",
+                "exercises": [_exercise(f"Mock Exercise {i + 1}.{j + 1}") for j in range(2)]
+            }
+            for i in range(3)
+        ],
+        "suggested_alternatives": [
+            {"when": "Pain limits loading", "instead_try": "Isometrics", "sources": [{"type": "cpg", "id": "mock-cpg"}]}
+        ],
+        "confidence": "medium"
+    })
+class MockOpenAI:
+
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.counts: Dict[str, int] = {}
+        self._seen_prefixes = set()
+
+    def _count(self, key: str):
+
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _injected_failure(self) -> Optional[JSONResponse]:
+
+        roll = self.config.random.random()
+        if roll < self.config.rate_limit_rate:
+            self._count("rate_limited")
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "1"},
+                content={"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}}
+            )
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self._count("errors")
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Internal server error (mock)", "type": "server_error", "code": None}}
+            )
+        return None
+
+    def _usage(self, messages: List[Dict[str, Any]], content: str) -> Dict[str, Any]:
+
+        system_text = _message_text(messages, "system")
+        prompt_tokens = sum(_count_tokens(str(message.get("content") or "")) for message in messages)
+        # Mimic provider prefix caching: a repeated system prompt is cached in 128-token blocks
+        prefix = hashlib.sha256(system_text.encode("utf-8")).hexdigest()
+        cached = (_count_tokens(system_text) // 128) * 128 if prefix in self._seen_prefixes else 0
+        self._seen_prefixes.add(prefix)
+        completion_tokens = _count_tokens(content)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached}
+        }
+
+    async def chat_completions(self, request: Request):
+
+        body = await request.json()
+        self._count("chat_completions")
+        await asyncio.sleep(self.config.sample_latency(self.config.latency_ms))
+
+        failure = self._injected_failure()
+        if failure is not None:
+            return failure
+
+        content = canned_content(body)
+        usage = self._usage(body.get("messages") or [], content)
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4o-mini")
+
+        if body.get("stream"):
+            self._count("streams")
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(
+                self._stream(completion_id, created, model, content, usage if include_usage else None),
+                media_type="text/event-stream"
+            )
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage
+        }
+
+    async def _stream(self, completion_id: str, created: int, model: str, content: str, usage: Optional[Dict[str, Any]]):
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, chunk_usage=None, choices=True):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if choices else [],
+                "usage": chunk_usage
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        size = max(1, math.ceil(len(content) / max(1, self.config.stream_chunks)))
+        for start in range(0, len(content), size):
+            await asyncio.sleep(self.config.stream_chunk_ms / 1000.0)
+            yield chunk({"content": content[start:start + size]})
+        yield chunk({}, finish_reason="stop")
+        if usage is not None:
+            yield chunk({}, chunk_usage=usage, choices=False)
+        yield "data: [DONE]\n\n"
+
+    async def embeddings(self, request: Request):
+
+        body = await request.json()
+        self._count("embeddings")
+        await asyncio.sleep(self.config.sample_latency(self.config.embedding_latency_ms))
+
+        failure = self._injected_failure()
+        if failure is not None:
+            return failure
+
+        inputs = body.get("input")
+        texts = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        dimensions = body.get("dimensions") or self.config.embedding_dimensions
+        tokens = sum(_count_tokens(str(text)) for text in texts)
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": deterministic_embedding(str(text), dimensions)}
+                for i, text in enumerate(texts)
+            ],
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+
+    mock = MockOpenAI(config or MockConfig())
+    app = FastAPI(title="Mock OpenAI")
+    app.state.mock = mock
+    app.add_api_route("/v1/chat/completions", mock.chat_completions, methods=["POST"])
+    app.add_api_route("/v1/embeddings", mock.embeddings, methods=["POST"])
+    app.add_api_route("/mock/stats", lambda: {"config": mock.config.to_dict(), "counts": mock.counts}, methods=["GET"])
+    return app
+def main():
+
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median chat completion latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="Lognormal spread of latency (0 = fixed)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Fraction of calls that get --tail-ms extra")
+    parser.add_argument("--tail-ms", type=float, default=5000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls answered with a 429")
+    parser.add_argument("--stream-chunks", type=int, default=40)
+    parser.add_argument("--stream-chunk-ms", type=float, default=15.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=40.0)
+    parser.add_argument("--embedding-dimensions", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        stream_chunks=args.stream_chunks,
+        stream_chunk_ms=args.stream_chunk_ms,
+        embedding_latency_ms=args.embedding_latency_ms,
+        embedding_dimensions=args.embedding_dimensions,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
 
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 import uvicorn
 import logging
-from typing import Optional
+import json
+from typing import Any, Dict, Optional
+
+from resources import resource_config
+resource_config.apply()
 
 from core.gpt_rag_system import GPTRAGSystem
 from core.feedback_manager import FeedbackManager
-from models.request_models import RecommendationRequest, FeedbackRequest
+from core.execution import get_execution_pools, shutdown_execution_pools
+from core.batch import BatchRunner
+from models.request_models import RecommendationRequest, BatchRecommendationRequest, FeedbackRequest
 from models.response_models import RecommendationResponse, FeedbackResponse, HealthResponse
 from config import settings
 
@@ -43,6 +50,7 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         logger.info("Shutting down")
+        shutdown_execution_pools()
 
 
 app = FastAPI(
@@ -78,7 +86,9 @@ async def health_check():
         status="healthy",
         version="1.0.0",
         rag_system_ready=rag_system is not None,
-        feedback_system_ready=feedback_manager is not None
+        feedback_system_ready=feedback_manager is not None,
+        execution_pools=get_execution_pools().get_stats(),
+        threads=resource_config.effective_threads()
     )
 
 @app.post("/recommendations", response_model=RecommendationResponse)
@@ -106,6 +116,58 @@ async def get_recommendations(
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
 
+def _format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+@app.post("/recommendations/stream")
+async def stream_recommendations(
+    request: RecommendationRequest,
+    rag: GPTRAGSystem = Depends(get_rag_system),
+    feedback: FeedbackManager = Depends(get_feedback_manager)
+):
+    logger.info(f"Streaming request for session: {request.session_id}")
+    feedback_state = feedback.get_feedback_state(request.session_id)
+    
+    async def event_stream():
+        try:
+            async for event in rag.stream_recommendations(
+                user_input=request.user_input,
+                rag_manifest=request.rag_manifest,
+                session_id=request.session_id,
+                feedback_state=feedback_state
+            ):
+                yield _format_sse(event)
+        except Exception as e:
+            logger.error(f"Error streaming recommendations: {e}")
+            yield _format_sse({"event": "error", "data": {"detail": f"Failed to generate recommendations: {str(e)}"}})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/recommendations/batch")
+async def batch_recommendations(
+    request: BatchRecommendationRequest,
+    rag: GPTRAGSystem = Depends(get_rag_system),
+    feedback: FeedbackManager = Depends(get_feedback_manager)
+):
+    # Same feedback source as /recommendations: the stored session state, not the client payload
+    runner = BatchRunner(
+        rag,
+        concurrency=request.concurrency,
+        feedback_lookup=lambda item: feedback.get_feedback_state(item.session_id)
+    )
+    items = [(str(index), item) for index, item in enumerate(request.requests)]
+    
+    async def results():
+        async for record in runner.process(items):
+            yield json.dumps(record, default=str) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 @app.post("/feedback", response_model=FeedbackResponse)
 async def submit_feedback(
     request: FeedbackRequest,
@@ -156,6 +218,12 @@ async def clear_session_feedback(
         logger.error(f"Error clearing feedback: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to clear feedback: {str(e)}")
 
+@app.get("/stats")
+async def get_pipeline_stats(
+    rag: GPTRAGSystem = Depends(get_rag_system)
+):
+    return rag.get_stats()
+
 @app.get("/sources")
 async def get_available_sources(
     rag: GPTRAGSystem = Depends(get_rag_system)
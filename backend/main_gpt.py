@@ -25,6 +25,7 @@ from models.response_models import (
     HealthResponse
 )
 from config import settings
+from llm_usage import llm_usage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -128,6 +129,40 @@ Prohibited Behaviors
 • Do not output anything outside the JSON object.
 """
 
+# Static source listing and citation rules. Sent as part of the system message so the
+# whole instruction block is a byte-identical prefix that the provider can cache; only
+# the patient details in the user message vary between requests.
+SOURCE_GUIDE = """
+IMPORTANT: When citing sources, ALWAYS include the exact file path in the format:
+- For Note Ninjas files: "NoteNinjas/[filename].docx" (e.g., "NoteNinjas/Arthritis.docx")
+- For CPG files: "Titled_CPGs/[filename].pdf" or "Untitled_CPGs/[filename].pdf"
+
+Available source files include:
+Note Ninjas Documents:
+- Activities of Daily Living.docx, Acute Care Guide.docx, Ambulation_Gait and Functional Mobility.docx
+- Arthritis.docx, Balance.docx, Bed Mobility.docx, Cognition.docx, Current Events.docx
+- Dementia.docx, Discharge.docx, Documentation Bank.docx, Endurance.docx
+- Evidence-Based Research.docx, Fine Motor Coordination.docx, Goal Writing.docx
+- Group Therapy.docx, Initial Evaluation.docx, Intervention Frameworks.docx
+- Manual Therapy.docx, Mental Health.docx, Modalities.docx, Multiple Sclerosis.docx
+- Outcome Measure.docx, Parkinson_s Disease_.docx, Precautions.docx, Progress Reports.docx
+- Resources.docx, Sensory Integration.docx, Skilled Therapy Tips.docx
+- Stroke and Neuro.docx, Therapeutic Exercises.docx, Upper Extremity.docx, Vestibular.docx
+
+Clinical Practice Guidelines (CPGs):
+- Multiple PDF files in Titled_CPGs/ and Untitled_CPGs/ directories
+- Include specific page references when citing from PDFs
+
+Using the patient information in the user message, generate evidence-based OT recommendations following the Note Ninjas framework.
+Focus on practical, implementable interventions with proper CPT codes when available.
+
+CRITICAL: In your source citations, ALWAYS fill in the "file_path" field with the exact path format:
+- For Note Ninjas: "NoteNinjas/[filename].docx" (e.g., "NoteNinjas/Therapeutic Exercises.docx")
+- For CPGs: "Titled_CPGs/[filename].pdf" or "Untitled_CPGs/[filename].pdf"
+
+Do not leave file_path as null - always provide the complete file path.
+"""
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -187,6 +222,12 @@ async def health_check():
     )
 
 
+@app.get("/stats")
+async def get_usage_stats():
+    """Token usage and provider prompt-cache hits per prompt"""
+    return {"token_usage": llm_usage.get_stats()}
+
+
 @app.get("/sources")
 async def get_sources():
     """Get available sources (simplified for now)"""
@@ -207,42 +248,13 @@ async def generate_recommendations(request: RecommendationRequest):
     logger.info(f"Generating recommendations for session {request.session_id}")
     
     try:
-        # Build context from user input with file source information
+        # Per-request patient details; the static source guide lives in the system message
         user_input = request.user_input
         context = f"""
 Patient Condition: {user_input.patient_condition}
 Desired Outcome: {user_input.desired_outcome}
 Treatment Progression: {user_input.treatment_progression or "Not specified"}
 Input Mode: {user_input.input_mode}
-
-IMPORTANT: When citing sources, ALWAYS include the exact file path in the format:
-- For Note Ninjas files: "NoteNinjas/[filename].docx" (e.g., "NoteNinjas/Arthritis.docx")
-- For CPG files: "Titled_CPGs/[filename].pdf" or "Untitled_CPGs/[filename].pdf"
-
-Available source files include:
-Note Ninjas Documents:
-- Activities of Daily Living.docx, Acute Care Guide.docx, Ambulation_Gait and Functional Mobility.docx
-- Arthritis.docx, Balance.docx, Bed Mobility.docx, Cognition.docx, Current Events.docx
-- Dementia.docx, Discharge.docx, Documentation Bank.docx, Endurance.docx
-- Evidence-Based Research.docx, Fine Motor Coordination.docx, Goal Writing.docx
-- Group Therapy.docx, Initial Evaluation.docx, Intervention Frameworks.docx
-- Manual Therapy.docx, Mental Health.docx, Modalities.docx, Multiple Sclerosis.docx
-- Outcome Measure.docx, Parkinson_s Disease_.docx, Precautions.docx, Progress Reports.docx
-- Resources.docx, Sensory Integration.docx, Skilled Therapy Tips.docx
-- Stroke and Neuro.docx, Therapeutic Exercises.docx, Upper Extremity.docx, Vestibular.docx
-
-Clinical Practice Guidelines (CPGs):
-- Multiple PDF files in Titled_CPGs/ and Untitled_CPGs/ directories
-- Include specific page references when citing from PDFs
-
-Based on this information, generate evidence-based OT recommendations following the Note Ninjas framework.
-Focus on practical, implementable interventions with proper CPT codes when available.
-
-CRITICAL: In your source citations, ALWAYS fill in the "file_path" field with the exact path format:
-- For Note Ninjas: "NoteNinjas/[filename].docx" (e.g., "NoteNinjas/Therapeutic Exercises.docx")
-- For CPGs: "Titled_CPGs/[filename].pdf" or "Untitled_CPGs/[filename].pdf"
-
-Do not leave file_path as null - always provide the complete file path.
 """
         
         # Add feedback state if available
@@ -251,7 +263,7 @@ Do not leave file_path as null - always provide the complete file path.
         
         # Generate response using GPT-4o Mini
         messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": SYSTEM_PROMPT + SOURCE_GUIDE},
             {"role": "user", "content": context}
         ]
         
@@ -263,6 +275,9 @@ Do not leave file_path as null - always provide the complete file path.
             response_format={"type": "json_object"}
         )
         
+        usage = llm_usage.record("recommendations", response.usage)
+        logger.info(f"Prompt tokens: {usage.get('prompt_tokens')} ({usage.get('cached_tokens')} cached)")
+        
         # Parse response
         response_data = response.choices[0].message.content
         logger.info("GPT response received, parsing")
@@ -62,6 +62,9 @@ class RecommendationRequest(BaseModel):
     rag_manifest: Optional[RAGManifest] = Field(None, description="RAG configuration")
     feedback_state: Optional[Dict[str, Any]] = Field(None, description="Current feedback state")
     max_exercises: Optional[int] = Field(8, description="Maximum number of exercises")
+class BatchRecommendationRequest(BaseModel):
+    requests: List[RecommendationRequest] = Field(..., description="Requests to process; results are keyed by position")
+    concurrency: Optional[int] = Field(None, description="Requests processed at once")
 class FeedbackRequest(BaseModel):
     session_id: str = Field(..., description="Session identifier")
     recommendation_id: Optional[str] = Field(None, description="Specific recommendation ID")
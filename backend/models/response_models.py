@@ -3,7 +3,7 @@ Response models for Note Ninjas API
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 from enum import Enum
 class SourceType(str, Enum):
     NOTE_NINJAS = "note_ninjas"
@@ -108,3 +108,5 @@ class HealthResponse(BaseModel):
     version: str = Field(..., description="Service version")
     rag_system_ready: bool = Field(..., description="Whether RAG system is ready")
     feedback_system_ready: bool = Field(..., description="Whether feedback system is ready")
+    execution_pools: Optional[Dict[str, Any]] = Field(None, description="Per-pool worker and queue depth stats")
+    threads: Optional[Dict[str, Any]] = Field(None, description="Effective torch, BLAS and executor thread counts")
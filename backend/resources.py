@@ -0,0 +1,109 @@
+"""
+CPU thread budgeting for torch, BLAS and executor pools
+
+Each uvicorn worker gets an equal share of the host core budget. Import this
+module and call resource_config.apply() before numpy/torch are imported so the
+BLAS/OpenMP environment limits take effect.
+"""
+
+import logging
+import os
+import sys
+from typing import Any, Dict
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_BLAS_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS"
+]
+class ResourceConfig:
+
+
+    def __init__(self):
+        self.cpu_core_budget = settings.CPU_CORE_BUDGET or os.cpu_count() or 1
+        self.worker_count = max(1, settings.WORKER_COUNT or int(os.getenv("WEB_CONCURRENCY", "1")))
+        self.cores_per_worker = max(1, self.cpu_core_budget // self.worker_count)
+
+        self.retrieval_pool_size = max(1, min(settings.RETRIEVAL_POOL_SIZE, self.cores_per_worker))
+        self.rerank_pool_size = max(1, min(settings.RERANK_POOL_SIZE, self.cores_per_worker))
+
+        # Concurrent rerank jobs each run torch ops, so split the worker's cores between them
+        self.torch_intra_op_threads = settings.TORCH_INTRA_OP_THREADS or max(
+            1, self.cores_per_worker // self.rerank_pool_size
+        )
+        self.torch_inter_op_threads = 1
+        self.blas_threads = settings.BLAS_THREADS or max(
+            1, self.cores_per_worker // self.retrieval_pool_size
+        )
+
+        self._torch_configured = False
+
+    def apply(self):
+
+        for var in _BLAS_ENV_VARS:
+            os.environ.setdefault(var, str(self.blas_threads))
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=self.blas_threads, user_api="blas")
+        except ImportError:
+            pass
+
+        if "torch" in sys.modules:
+            self.configure_torch()
+
+        logger.info(
+            f"Thread budget: {self.cpu_core_budget} cores / {self.worker_count} workers, "
+            f"torch={self.torch_intra_op_threads}x{self.torch_inter_op_threads}, blas={self.blas_threads}"
+        )
+
+    def configure_torch(self):
+
+        if self._torch_configured:
+            return
+        try:
+            import torch
+        except ImportError:
+            return
+
+        torch.set_num_threads(self.torch_intra_op_threads)
+        try:
+            torch.set_num_interop_threads(self.torch_inter_op_threads)
+        except RuntimeError:
+            # Inter-op pool can only be sized before torch runs parallel work
+            logger.warning("torch inter-op threads already fixed, leaving as is")
+        self._torch_configured = True
+
+    def effective_threads(self) -> Dict[str, Any]:
+
+        report: Dict[str, Any] = {
+            "cpu_core_budget": self.cpu_core_budget,
+            "workers": self.worker_count,
+            "cores_per_worker": self.cores_per_worker,
+            "retrieval_pool_size": self.retrieval_pool_size,
+            "rerank_pool_size": self.rerank_pool_size,
+            "blas_threads": int(os.getenv("OPENBLAS_NUM_THREADS", self.blas_threads))
+        }
+
+        try:
+            from threadpoolctl import threadpool_info
+            blas_pools = [info for info in threadpool_info() if info.get("user_api") == "blas"]
+            if blas_pools:
+                report["blas_threads"] = max(info["num_threads"] for info in blas_pools)
+        except ImportError:
+            pass
+
+        if "torch" in sys.modules:
+            torch = sys.modules["torch"]
+            report["torch_intra_op_threads"] = torch.get_num_threads()
+            report["torch_inter_op_threads"] = torch.get_num_interop_threads()
+
+        return report
+resource_config = ResourceConfig()
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from uuid import UUID
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 class CaseBase(BaseModel):
     name: str
@@ -32,3 +32,10 @@ class CaseListResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class SubsectionRegenerate(BaseModel):
+    subsection_title: str
+    exercise_name: Optional[str] = None  # Replace only this exercise; omit to regenerate the whole subsection
+    comments: Optional[str] = None
+    avoid_exercises: List[str] = []
+    avoid_cpt_codes: List[str] = []
@@ -6,27 +6,36 @@ from contextlib import asynccontextmanager
 import uvicorn
 import logging
 from typing import Optional
-from openai import OpenAI
+from openai import AsyncOpenAI
 import json
 import os
 import time
 from dotenv import load_dotenv
 load_dotenv()
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from resources import resource_config
+resource_config.apply()
+from llm_usage import llm_usage
+from llm_calls import llm_caller
+from llm_limiter import estimate_tokens, llm_limiter, llm_user
+from single_flight import SingleFlight
+from core.response_cache import create_subsection_cache, prompt_version, request_key, subsection_key
+from config import settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-openai_client: Optional[OpenAI] = None
-executor = ThreadPoolExecutor(max_workers=6)
+openai_client: Optional[AsyncOpenAI] = None
+recommendation_flights = SingleFlight("recommendations", enabled=settings.SINGLE_FLIGHT_ENABLED)
+subsection_cache = create_subsection_cache()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global openai_client
     logger.info("Initializing simple GPT backend (no RAG)")
     try:
-        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Retries are handled by llm_caller
+        openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
         logger.info("Backend initialized with parallel processing and streaming")
         yield
     except Exception as e:
@@ -34,7 +43,8 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         logger.info("Shutting down")
-        executor.shutdown(wait=True)
+        if openai_client is not None:
+            await openai_client.close()
 
 app = FastAPI(title="Note Ninjas OT Recommender", version="1.0.0", lifespan=lifespan)
 
@@ -57,16 +67,28 @@ class RecommendationRequest(BaseModel):
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "1.0.0", "rag_system_ready": False, "feedback_system_ready": False}
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "rag_system_ready": False,
+        "feedback_system_ready": False,
+        "threads": resource_config.effective_threads()
+    }
 
-def generate_subsection(subsection_info: dict, patient_condition: str, desired_outcome: str) -> dict:
-    """Generate a single subsection using GPT-4o"""
-    try:
-        client = openai_client
-        
-        prompt = f"""Generate 1 OT treatment subsection for: {patient_condition} | Goal: {desired_outcome}
+@app.get("/stats")
+async def get_usage_stats():
+    return {
+        "token_usage": llm_usage.get_stats(),
+        "llm_calls": llm_caller.get_stats(),
+        "llm_limiter": llm_limiter.get_stats(),
+        "single_flight": recommendation_flights.get_stats(),
+        "subsection_cache": subsection_cache.get_stats()
+    }
 
-Subsection: {subsection_info['title']} - {subsection_info['focus']}
+# Static instructions shared by every subsection call. They form the start of the
+# prompt so the provider's prompt cache can reuse them; the patient and subsection
+# details follow in the user message.
+SUBSECTION_SYSTEM_PROMPT = """Expert OT. Generate patient-specific exercises with DETAILED cues (1-2 sentences each). Description must mention all exercise names. Documentation MUST include 'show of skill' with specific cue used. Return JSON only.
 
 Create 2-3 patient-specific exercises. Description MUST mention all exercise names naturally.
 
@@ -88,12 +110,12 @@ Example documentation with "show of skill":
 "Patient completed glenohumeral mobilization exercises in supine position for 15 minutes with grade III mobilizations. Therapist used tactile cueing by placing hand on patient's scapula to promote proper positioning and prevent compensation, which helped patient achieve better isolation of the target motion. Patient tolerated well with reported pain reduction from 6/10 to 3/10."
 
 Format:
-{{
-  "title": "{subsection_info['title']}",
+{
+  "title": "<subsection title from the request>",
   "description": "Start with [Exercise 1 name] to address X, then [Exercise 2 name] for Y, and optionally [Exercise 3 name] to improve Z.",
   "rationale": "Clinical rationale for this approach",
   "exercises": [
-    {{
+    {
       "name": "Specific Exercise Name",
       "description": "Detailed description of how to perform this exercise. Patient positioning and setup. Progression and modifications as needed.",
       "cues": [
@@ -105,24 +127,52 @@ Format:
         "Comprehensive clinical note documenting the exercise performed, patient positioning, number of repetitions or duration, patient response and tolerance, and measurable outcomes achieved. MUST include a specific cue that was used (verbal, tactile, or visual) and explain why it was chosen or how it benefited the patient."
       ],
       "cpt_codes": [
-        {{"code": "97XXX", "description": "Full billing code description", "notes": "Specific billing notes and time requirements"}}
+        {"code": "97XXX", "description": "Full billing code description", "notes": "Specific billing notes and time requirements"}
       ],
       "notes": "Detailed contraindication or precaution to consider for this specific exercise"
-    }}
+    }
   ]
-}}
+}
 
 Return ONLY JSON. Make cues detailed and comprehensive. Documentation examples MUST include "show of skill" with specific cue mentioned."""
 
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Using full GPT-4o for best quality
-            messages=[
-                {"role": "system", "content": "Expert OT. Generate patient-specific exercises with DETAILED cues (1-2 sentences each). Description must mention all exercise names. Documentation MUST include 'show of skill' with specific cue used. Return JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-            max_tokens=2000
+SUBSECTION_MODEL = "gpt-4o"
+SUBSECTION_PROMPT_VERSION = prompt_version(SUBSECTION_SYSTEM_PROMPT)
+
+async def generate_subsection(subsection_info: dict, patient_condition: str, desired_outcome: str) -> dict:
+    """Generate a single subsection using GPT-4o"""
+    try:
+        cache_key = subsection_key(
+            patient_condition, desired_outcome, subsection_info, SUBSECTION_PROMPT_VERSION, SUBSECTION_MODEL
+        )
+        cached = subsection_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        client = openai_client
+        
+        prompt = f"""Generate 1 OT treatment subsection for: {patient_condition} | Goal: {desired_outcome}
+
+Subsection: {subsection_info['title']} - {subsection_info['focus']}
+Use "{subsection_info['title']}" as the title."""
+
+        messages = [
+            {"role": "system", "content": SUBSECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        # One slow upstream response no longer holds up the whole six-way gather
+        response = await llm_caller.call(
+            "subsection",
+            lambda: client.chat.completions.create(
+                model=SUBSECTION_MODEL,  # Using full GPT-4o for best quality
+                messages=messages,
+                temperature=0.8,
+                max_tokens=2000,
+                timeout=settings.LLM_CALL_TIMEOUT_SECONDS
+            ),
+            tokens=estimate_tokens(messages, 2000)
         )
+        llm_usage.record("subsection", response.usage)
         
         content = response.choices[0].message.content.strip()
         
@@ -135,7 +185,10 @@ Return ONLY JSON. Make cues detailed and comprehensive. Documentation examples M
                 lines = lines[:-1]
             content = "\n".join(lines)
         
-        return json.loads(content)
+        subsection = json.loads(content)
+        # Fallbacks from the except branch below are never cached
+        subsection_cache.set(cache_key, subsection)
+        return subsection
         
     except Exception as e:
         logger.error(f"Error generating subsection {subsection_info['title']}: {e}")
@@ -150,14 +203,7 @@ Return ONLY JSON. Make cues detailed and comprehensive. Documentation examples M
 async def generate_subsection_stream(subsection_info: dict, patient_condition: str, desired_outcome: str):
     """Generator that yields subsection data as it's generated"""
     try:
-        loop = asyncio.get_event_loop()
-        subsection = await loop.run_in_executor(
-            executor,
-            generate_subsection,
-            subsection_info,
-            patient_condition,
-            desired_outcome
-        )
+        subsection = await generate_subsection(subsection_info, patient_condition, desired_outcome)
         
         # Yield the subsection as a JSON event
         yield f"data: {json.dumps({'type': 'subsection', 'data': subsection})}\n\n"
@@ -166,50 +212,64 @@ async def generate_subsection_stream(subsection_info: dict, patient_condition: s
         logger.error(f"Error in stream for {subsection_info['title']}: {e}")
         yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
 
+# Define 6 subsections to generate in parallel
+SUBSECTION_CONFIGS = [
+    {"title": "Manual Therapy Techniques", "focus": "mobilizations, soft tissue work"},
+    {"title": "Progressive Strengthening Protocol", "focus": "strengthening exercises"},
+    {"title": "Neuromuscular Re-education", "focus": "coordination, balance, proprioception"},
+    {"title": "Work-Specific Functional Training", "focus": "functional activities for goals"},
+    {"title": "Pain Management Modalities", "focus": "modalities for pain control"},
+    {"title": "Home Exercise Program", "focus": "home exercises patient can do"}
+]
+
+def _subsection_tasks(user_input: UserInput) -> list:
+    return [
+        asyncio.ensure_future(
+            generate_subsection(config, user_input.patient_condition, user_input.desired_outcome)
+        )
+        for config in SUBSECTION_CONFIGS
+    ]
+
+async def build_recommendations(user_input: UserInput) -> dict:
+    # Wait for all parallel tasks to complete
+    subsections = await asyncio.gather(*_subsection_tasks(user_input))
+    
+    # Build final response
+    return {
+        "high_level": [
+            f"Focus on progressive treatment for {user_input.patient_condition}",
+            f"Incorporate activities to achieve: {user_input.desired_outcome}"
+        ],
+        "subsections": subsections,
+        "suggested_alternatives": ["Consider aquatic therapy if appropriate", "Explore telehealth options for home program"],
+        "confidence": "high"
+    }
+
+async def subsection_events(user_input: UserInput):
+    # Stream each subsection as it completes
+    for i, task in enumerate(asyncio.as_completed(_subsection_tasks(user_input))):
+        try:
+            subsection = await task
+            yield f"data: {json.dumps({'type': 'subsection', 'data': subsection, 'index': i})}\n\n"
+        except Exception as e:
+            logger.error(f"Error generating subsection {i}: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'index': i, 'message': str(e)})}\n\n"
+    
+    # Send completion signal
+    yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+
 @app.post("/recommendations")
 async def get_recommendations(request: RecommendationRequest):
     """Non-streaming endpoint for backwards compatibility"""
     try:
         logger.info(f"Processing parallel request for session: {request.session_id}")
+        llm_user.set(request.session_id)
         
-        # Define 6 subsections to generate in parallel
-        subsection_configs = [
-            {"title": "Manual Therapy Techniques", "focus": "mobilizations, soft tissue work"},
-            {"title": "Progressive Strengthening Protocol", "focus": "strengthening exercises"},
-            {"title": "Neuromuscular Re-education", "focus": "coordination, balance, proprioception"},
-            {"title": "Work-Specific Functional Training", "focus": "functional activities for goals"},
-            {"title": "Pain Management Modalities", "focus": "modalities for pain control"},
-            {"title": "Home Exercise Program", "focus": "home exercises patient can do"}
-        ]
-        
-        # Generate all subsections in parallel using ThreadPoolExecutor
-        loop = asyncio.get_event_loop()
-        tasks = [
-            loop.run_in_executor(
-                executor,
-                generate_subsection,
-                config,
-                request.user_input.patient_condition,
-                request.user_input.desired_outcome
-            )
-            for config in subsection_configs
-        ]
-        
-        # Wait for all parallel tasks to complete
-        subsections = await asyncio.gather(*tasks)
-        
-        # Build final response
-        response_data = {
-            "high_level": [
-                f"Focus on progressive treatment for {request.user_input.patient_condition}",
-                f"Incorporate activities to achieve: {request.user_input.desired_outcome}"
-            ],
-            "subsections": subsections,
-            "suggested_alternatives": ["Consider aquatic therapy if appropriate", "Explore telehealth options for home program"],
-            "confidence": "high"
-        }
-        
-        return response_data
+        # Identical in-flight requests (retries, double-clicks) share one set of GPT calls
+        return await recommendation_flights.do(
+            request_key(request.user_input.model_dump()),
+            lambda: build_recommendations(request.user_input)
+        )
         
     except Exception as e:
         logger.error(f"Error: {e}", exc_info=True)
@@ -222,44 +282,17 @@ async def get_recommendations_stream(request: RecommendationRequest):
     async def event_generator():
         try:
             logger.info(f"Processing streaming request for session: {request.session_id}")
+            llm_user.set(request.session_id)
             
             # Send initial metadata
             yield f"data: {json.dumps({'type': 'start', 'session_id': request.session_id})}\n\n"
             
-            # Define 6 subsections
-            subsection_configs = [
-                {"title": "Manual Therapy Techniques", "focus": "mobilizations, soft tissue work"},
-                {"title": "Progressive Strengthening Protocol", "focus": "strengthening exercises"},
-                {"title": "Neuromuscular Re-education", "focus": "coordination, balance, proprioception"},
-                {"title": "Work-Specific Functional Training", "focus": "functional activities for goals"},
-                {"title": "Pain Management Modalities", "focus": "modalities for pain control"},
-                {"title": "Home Exercise Program", "focus": "home exercises patient can do"}
-            ]
-            
-            # Generate subsections in parallel and stream as they complete
-            loop = asyncio.get_event_loop()
-            tasks = [
-                loop.run_in_executor(
-                    executor,
-                    generate_subsection,
-                    config,
-                    request.user_input.patient_condition,
-                    request.user_input.desired_outcome
-                )
-                for config in subsection_configs
-            ]
-            
-            # Stream each subsection as it completes
-            for i, task in enumerate(asyncio.as_completed(tasks)):
-                try:
-                    subsection = await task
-                    yield f"data: {json.dumps({'type': 'subsection', 'data': subsection, 'index': i})}\n\n"
-                except Exception as e:
-                    logger.error(f"Error generating subsection {i}: {e}")
-                    yield f"data: {json.dumps({'type': 'error', 'index': i, 'message': str(e)})}\n\n"
-            
-            # Send completion signal
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            # A late joiner replays the subsections already sent, then follows the live stream
+            async for event in recommendation_flights.stream(
+                request_key(request.user_input.model_dump()),
+                lambda: subsection_events(request.user_input)
+            ):
+                yield event
             
         except Exception as e:
             logger.error(f"Stream error: {e}", exc_info=True)
@@ -0,0 +1,113 @@
+"""
+Single-flight coalescing of identical in-flight requests
+
+Concurrent callers with the same key share one computation. For streams, callers
+that join late first receive the events already emitted and then follow the live
+tail.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+class _Broadcast:
+
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    async def run(self, source: AsyncIterator[Any]):
+
+        try:
+            async for event in source:
+                async with self._changed:
+                    self.events.append(event)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.events) or self.done)
+                pending = self.events[position:]
+                finished = self.done
+            for event in pending:
+                yield event
+            position += len(pending)
+            if finished and position == len(self.events):
+                if self.error is not None:
+                    raise self.error
+                return
+class SingleFlight:
+
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.joined = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+
+        if not self.enabled:
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            self.leaders += 1
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda _: self._forget(self._calls, key, call))
+        else:
+            self.joined += 1
+            logger.info(f"{self.name}: joined in-flight request {key[:12]}")
+
+        # A disconnecting caller must not cancel the computation other callers share
+        return await asyncio.shield(call)
+
+    async def stream(self, key: str, source: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+
+        if not self.enabled:
+            async for event in source():
+                yield event
+            return
+
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self.leaders += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            producer = asyncio.ensure_future(broadcast.run(source()))
+            producer.add_done_callback(lambda _: self._forget(self._streams, key, broadcast))
+        else:
+            self.joined += 1
+            logger.info(f"{self.name}: joined in-flight stream {key[:12]} after {len(broadcast.events)} events")
+
+        async for event in broadcast.subscribe():
+            yield event
+
+    def _forget(self, registry: Dict[str, Any], key: str, entry: Any):
+
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "joined": self.joined
+        }
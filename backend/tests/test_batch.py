@@ -0,0 +1,199 @@
+"""
+Tests for offline batch recommendations
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from fastapi.testclient import TestClient
+
+from core.batch import BatchRunner, LocalBatchProvider, ProviderBatchFailed, ProviderBatchRunner, load_completed
+from core.feedback_manager import FeedbackManager, FeedbackState
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def model_dump(self, mode=None):
+        return self.payload
+
+
+class FakeRAG:
+    """Records calls and answers with the patient condition"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = []
+        self.feedback_states = []
+        self.active = 0
+        self.peak = 0
+
+    async def generate_recommendations(self, user_input, rag_manifest, session_id, feedback_state=None):
+        self.calls.append(session_id)
+        self.feedback_states.append(feedback_state)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.001)
+        self.active -= 1
+        if session_id == self.fail_on:
+            raise RuntimeError("upstream error")
+        return FakeResponse({"condition": user_input.patient_condition})
+
+    async def prepare_batch_request(self, user_input, rag_manifest, session_id, feedback_state=None):
+        self.calls.append(session_id)
+        self.feedback_states.append(feedback_state)
+        return None, {"body": {"messages": [{"role": "user", "content": user_input.patient_condition}]}}
+
+    def finish_batch_request(self, content, pending):
+        return FakeResponse(json.loads(content))
+
+
+def _write_requests(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({
+                "id": f"case-{i}",
+                "session_id": f"session-{i}",
+                "user_input": {"patient_condition": f"condition {i}", "desired_outcome": "return to work"}
+            }) + "\n")
+
+
+def _read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_online_batch_bounds_concurrency(tmp_path):
+    """Every request is processed once with at most `concurrency` in flight"""
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_requests(input_path, 10)
+    rag = FakeRAG()
+
+    stats = asyncio.run(BatchRunner(rag, concurrency=3).run(str(input_path), str(output_path)))
+
+    assert stats["ok"] == 10
+    assert rag.peak <= 3
+    results = _read_results(output_path)
+    assert sorted(record["id"] for record in results) == [f"case-{i}" for i in range(10)]
+    assert results[0]["response"]["condition"].startswith("condition")
+
+
+def test_resume_skips_completed_and_retries_errors(tmp_path):
+    """A rerun processes only ids without an ok result"""
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_requests(input_path, 4)
+
+    first = asyncio.run(BatchRunner(FakeRAG(fail_on="session-2"), concurrency=2).run(str(input_path), str(output_path)))
+    assert first["errors"] == 1
+
+    # Simulate a crash mid-write
+    with open(output_path, "a") as f:
+        f.write('{"id": "case-3", "sta')
+
+    rag = FakeRAG()
+    second = asyncio.run(BatchRunner(rag, concurrency=2).run(str(input_path), str(output_path)))
+
+    assert rag.calls == ["session-2"]
+    assert second["skipped"] == 3
+    assert load_completed(str(output_path)) == {f"case-{i}" for i in range(4)}
+
+
+def test_provider_batch_with_local_stub(tmp_path):
+    """Generations go through the batch provider and the pending state is cleared"""
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_requests(input_path, 3)
+    submitted = []
+
+    def respond(body):
+        submitted.append(body)
+        return json.dumps({"echo": body["messages"][0]["content"]})
+
+    runner = ProviderBatchRunner(FakeRAG(), LocalBatchProvider(respond), concurrency=2, poll_interval=0)
+    stats = asyncio.run(runner.run(str(input_path), str(output_path)))
+
+    assert stats["ok"] == 3
+    assert len(submitted) == 3
+    assert {record["response"]["echo"] for record in _read_results(output_path)} == {
+        "condition 0", "condition 1", "condition 2"
+    }
+    assert not Path(f"{output_path}.pending.json").exists()
+
+
+class FailingBatchProvider(LocalBatchProvider):
+    async def poll(self, batch_id):
+        raise ProviderBatchFailed(f"Provider batch {batch_id} failed: invalid input file")
+
+
+def test_failed_provider_batch_clears_pending_state(tmp_path):
+    """A terminally failed batch is recorded as errors and resubmitted on the next run"""
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_requests(input_path, 2)
+
+    failed = asyncio.run(
+        ProviderBatchRunner(FakeRAG(), FailingBatchProvider(), poll_interval=0).run(str(input_path), str(output_path))
+    )
+
+    assert failed["errors"] == 2
+    assert not Path(f"{output_path}.pending.json").exists()
+
+    provider = LocalBatchProvider()
+    retried = asyncio.run(ProviderBatchRunner(FakeRAG(), provider, poll_interval=0).run(str(input_path), str(output_path)))
+
+    assert retried["ok"] == 2
+    assert retried["batch_id"] == "local_batch_1"
+    assert load_completed(str(output_path)) == {"case-0", "case-1"}
+
+
+def test_inline_feedback_is_passed_as_feedback_state(tmp_path):
+    """Input files carry feedback as a dict; both runners hand the pipeline a FeedbackState"""
+    input_path = tmp_path / "in.jsonl"
+    with open(input_path, "w") as f:
+        f.write(json.dumps({
+            "id": "case-0",
+            "session_id": "session-0",
+            "user_input": {"patient_condition": "condition 0", "desired_outcome": "return to work"},
+            "feedback_state": {"blocked_cpts": ["97110"]}
+        }) + "\n")
+
+    online, provider = FakeRAG(), FakeRAG()
+    asyncio.run(BatchRunner(online).run(str(input_path), str(tmp_path / "online.jsonl")))
+    asyncio.run(ProviderBatchRunner(provider, LocalBatchProvider(), poll_interval=0).run(
+        str(input_path), str(tmp_path / "provider.jsonl")
+    ))
+
+    for feedback_state in online.feedback_states + provider.feedback_states:
+        assert isinstance(feedback_state, FeedbackState)
+        assert feedback_state.blocked_cpts == ["97110"]
+
+
+def test_batch_endpoint_uses_stored_session_feedback():
+    """The API ignores client-supplied feedback and looks up each session like /recommendations"""
+    import main
+
+    feedback = FeedbackManager()
+    feedback.get_feedback_state("session-0").blocked_cpts.append("97530")
+    rag = FakeRAG()
+    main.app.dependency_overrides[main.get_rag_system] = lambda: rag
+    main.app.dependency_overrides[main.get_feedback_manager] = lambda: feedback
+    try:
+        response = TestClient(main.app).post("/recommendations/batch", json={"requests": [
+            {
+                "session_id": f"session-{i}",
+                "user_input": {"patient_condition": f"condition {i}", "desired_outcome": "return to work"},
+                "feedback_state": {"blocked_cpts": ["97110"]}
+            }
+            for i in range(2)
+        ]})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    states = dict(zip(rag.calls, rag.feedback_states))
+    assert states["session-0"].blocked_cpts == ["97530"]
+    assert states["session-1"].blocked_cpts == []
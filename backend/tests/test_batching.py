@@ -0,0 +1,86 @@
+"""
+Tests for the micro-batcher
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.batching import MicroBatcher
+
+
+def test_concurrent_submits_share_one_batch():
+    """Items submitted within the wait window are resolved by a single call"""
+    calls = []
+
+    async def batch_fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(batch_fn, max_batch_size=10, max_wait_ms=5)
+        return await asyncio.gather(*[batcher.submit(i) for i in range(4)]), batcher
+
+    results, batcher = asyncio.run(run())
+
+    assert results == [0, 2, 4, 6]
+    assert calls == [[0, 1, 2, 3]]
+    assert batcher.get_stats()["largest_batch"] == 4
+
+
+def test_full_batch_flushes_immediately():
+    """Reaching max_batch_size splits work into several batches"""
+    calls = []
+
+    async def batch_fn(items):
+        calls.append(len(items))
+        return items
+
+    async def run():
+        batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=1000)
+        return await asyncio.wait_for(
+            asyncio.gather(*[batcher.submit(i) for i in range(4)]), timeout=1
+        )
+
+    assert asyncio.run(run()) == [0, 1, 2, 3]
+    assert calls == [2, 2]
+
+
+def test_batch_errors_propagate_to_callers():
+    """A failing batch call fails every waiting caller"""
+
+    async def batch_fn(items):
+        raise RuntimeError("upstream down")
+
+    async def run():
+        batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=1)
+        await batcher.submit("query")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+
+def test_in_flight_batches_are_kept_alive():
+    """The batcher holds a reference to each running batch until it finishes"""
+    release = asyncio.Event()
+
+    async def batch_fn(items):
+        await release.wait()
+        return items
+
+    async def run():
+        batcher = MicroBatcher(batch_fn, max_batch_size=1, max_wait_ms=1)
+        waiter = asyncio.ensure_future(batcher.submit("query"))
+        await asyncio.sleep(0)
+        in_flight = len(batcher._tasks)
+        release.set()
+        result = await waiter
+        await asyncio.sleep(0)
+        return in_flight, result, len(batcher._tasks)
+
+    assert asyncio.run(run()) == (1, "query", 0)
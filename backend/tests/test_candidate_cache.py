@@ -0,0 +1,113 @@
+"""
+Tests for session-scoped candidate reuse
+"""
+
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from config import settings
+from core.candidate_cache import CandidateSet, SessionCandidateCache, feedback_boosts, retrieval_key
+from core.document_processor import DocumentChunk
+from core.feedback_manager import FeedbackManager, FeedbackState
+from core.retriever import RetrievalResult, Retriever
+
+CORPUS = [
+    DocumentChunk("unrelated textbook passage", "textbook", "tb", "t", [], chunk_id="t"),
+    DocumentChunk("basic wall slides", "note_ninjas", "nn", "a", [], chunk_id="a"),
+    DocumentChunk("advanced loading", "cpg", "cpg", "b", [], chunk_id="b")
+]
+
+
+def _candidates(key="k", version="v1"):
+    results = [
+        RetrievalResult(CORPUS[1], 0.9, 0.8, 0.85, "q", position=1),
+        RetrievalResult(CORPUS[2], 0.7, 0.6, 0.65, "q", position=2)
+    ]
+    return CandidateSet.from_results(key, version, "q", results, np.array([0.9, 0.8]))
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "USE_OPENAI_EMBEDDINGS", False)
+    retriever = Retriever(vector_store_path=str(tmp_path))
+    retriever.document_chunks = CORPUS
+    return retriever
+
+
+def _state(**overrides):
+    fields = dict(
+        session_id="s", feedback_entries=[], preferences={}, blocked_cpts=[],
+        blocked_exercises=[], preferred_sources=[], last_updated=datetime.now()
+    )
+    fields.update(overrides)
+    return FeedbackState(**fields)
+
+
+def test_cache_hits_only_for_same_query_and_index():
+    cache = SessionCandidateCache(ttl_seconds=60, max_sessions=10)
+    key = retrieval_key("rotator cuff tear", 5)
+    cache.set("s", _candidates(key))
+
+    assert cache.lookup("s", retrieval_key("Rotator  cuff tear ", 5), "v1") is not None
+    assert cache.lookup("s", retrieval_key("ankle sprain", 5), "v1") is None
+    assert cache.lookup("s", key, "v2") is None
+    assert cache.lookup("other", key, "v1") is None
+
+
+def test_entries_expire_and_zero_sessions_disables():
+    cache = SessionCandidateCache(ttl_seconds=0.05, max_sessions=10)
+    cache.set("s", _candidates())
+    time.sleep(0.06)
+    assert cache.lookup("s", "k", "v1") is None
+
+    disabled = SessionCandidateCache(ttl_seconds=60, max_sessions=0)
+    disabled.set("s", _candidates())
+    assert disabled.lookup("s", "k", "v1") is None
+
+
+def test_feedback_boosts_reorder_cached_candidates(retriever):
+    candidates = _candidates()
+    manager = FeedbackManager()
+
+    assert feedback_boosts(manager, None) == ({}, {})
+    assert feedback_boosts(manager, _state()) == ({}, {})
+    assert np.array_equal(candidates.boosted_rerank_scores(None), candidates.rerank_scores)
+
+    source_boosts, topic_boosts = feedback_boosts(manager, _state(preferences={"difficulty": "harder"}))
+    multipliers = retriever.boost_multipliers(source_boosts, None, topic_boosts)
+    boosted = candidates.boosted_rerank_scores(multipliers)
+    assert boosted[1] > boosted[0]
+    # Only the boosted candidate's score moves, and by its multiplier in the corpus-wide table
+    assert boosted[0] == candidates.rerank_scores[0]
+    assert boosted[1] == candidates.rerank_scores[1] * multipliers[2]
+
+
+def test_candidate_multipliers_come_from_the_retriever_cache(retriever, monkeypatch):
+    calls = []
+    compute = retriever._boost_multipliers
+    monkeypatch.setattr(retriever, "_boost_multipliers", lambda *args: calls.append(args) or compute(*args))
+
+    first = retriever.boost_multipliers({"cpg": 1.5}, None, {"loading": 1.2})
+    second = retriever.boost_multipliers({"cpg": 1.5}, None, {"loading": 1.2})
+
+    assert second is first and len(calls) == 1
+    assert _candidates().boosted_rerank_scores(first).tolist() == pytest.approx([0.9, 0.8 * 1.5 * 1.2])
+
+
+def test_results_are_fresh_objects():
+    candidates = _candidates()
+    first = candidates.results()
+    first[0].rerank_score = 99.0
+
+    second = candidates.results()
+    assert not hasattr(second[0], "rerank_score")
+    assert second[0].bm25_score == 0.9 and second[0].query == "q"
+    assert [result.position for result in second] == [1, 2]
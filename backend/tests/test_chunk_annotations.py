@@ -0,0 +1,77 @@
+"""
+Tests for the per-chunk annotation columns
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.chunk_annotations import ChunkAnnotations, annotate_chunk, annotate_chunks, annotations_for
+from core.document_processor import DocumentChunk
+from core.extractive_generator import ExtractiveGenerator
+from core.feedback_manager import FeedbackState
+from models.request_models import UserInput
+
+
+def _chunk(content, headers=None):
+    return DocumentChunk(content, "note_ninjas", "doc", "Title", headers or [])
+
+
+def test_topic_prefers_content_keywords_over_headers():
+    assert annotate_chunk(_chunk("Plain text", ["Shoulder Mobility"])).topic == "Shoulder Mobility"
+    assert annotate_chunk(_chunk("Plain text", ["Tiny"])).topic == "General Exercises"
+    assert annotate_chunk(_chunk("Single-leg Balance work", ["Shoulder Mobility"])).topic == "Balance Training"
+    assert annotate_chunk(_chunk("Sit to stand from a chair, balance as needed")).topic == "Transfer Training"
+
+
+def test_cpt_codes_cues_and_flags():
+    content = "Patient instructed in HEP (97110, 97530, 97110).\n• Keep the trunk upright\n* Slow eccentric lowering\n- ok"
+    annotations = annotate_chunk(_chunk(content))
+
+    assert annotations.cpt_codes == ["97110", "97530"]
+    assert annotations.primary_cpt == "97110"
+    assert annotations.cue_lines == ["Keep the trunk upright", "Slow eccentric lowering"]
+    assert annotations.instructed and not annotations.assessed
+
+
+def test_primary_cpt_falls_back_to_phrases():
+    assert annotate_chunk(_chunk("Self-care training for dressing")).primary_cpt == "97535"
+    assert annotate_chunk(_chunk("Nothing billable here")).primary_cpt is None
+
+
+def test_annotations_round_trip_through_chunk_dict():
+    chunk = _chunk("Resistance band rows\n- Squeeze shoulder blades")
+    annotate_chunks([chunk])
+
+    data = chunk.to_dict()
+    assert ChunkAnnotations.from_dict(data["annotations"]) == chunk.annotations
+    assert ChunkAnnotations.from_dict({**data["annotations"], "version": 0}) is None
+
+
+def test_annotations_are_computed_once():
+    chunk = _chunk("Endurance walking program")
+    first = annotations_for(chunk)
+
+    chunk.content = "Cognitive dual-task training"
+    assert annotations_for(chunk) is first
+    assert annotate_chunks([chunk]) == 0
+
+
+def test_blocked_cpt_chunks_give_up_their_slots():
+    chunks = [
+        {"chunk": _chunk(f"Shoulder exercise {i} (CPT {code})", ["Shoulder Mobility"]), "combined_score": 0.9}
+        for i, code in enumerate(["97110", "97530", "97530", "97530"])
+    ]
+    feedback_state = FeedbackState(
+        session_id="s", feedback_entries=[], preferences={}, blocked_cpts=["97110"],
+        blocked_exercises=[], preferred_sources=[], last_updated=datetime.now()
+    )
+    user_input = UserInput(patient_condition="rotator cuff tear", desired_outcome="return to work")
+
+    response = ExtractiveGenerator().generate(chunks, user_input, feedback_state)
+
+    exercises = response.subsections[0].exercises
+    assert [exercise.cpt for exercise in exercises] == ["97530", "97530", "97530"]
@@ -0,0 +1,117 @@
+"""
+Tests for token-budgeted context packing
+"""
+
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.context_packer import ContextPacker, TokenCounter
+
+
+class WordCounter(TokenCounter):
+    """One token per whitespace-separated word, independent of tiktoken"""
+
+    def __init__(self):
+        self.model_name = "words"
+        self.encoding = None
+
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+class FakeChunk:
+    def __init__(self, content, source_id="doc", headers=None):
+        self.content = content
+        self.source_type = "note_ninjas"
+        self.source_id = source_id
+        self.headers = headers or []
+        self.page_ref = None
+
+
+class FakeResult:
+    def __init__(self, chunk, score):
+        self.chunk = chunk
+        self.combined_score = score
+        self.rerank_score = score
+        self.query = "shoulder abduction"
+
+
+def _packer(budget, per_source=400):
+    return ContextPacker(
+        token_budget=budget,
+        max_tokens_per_source=per_source,
+        min_overlap_chars=20,
+        counter=WordCounter()
+    )
+
+
+def test_packs_by_rerank_score_within_budget():
+    """Higher-scored sources go first and the budget is never exceeded"""
+    low = FakeResult(FakeChunk("low " * 60, source_id="a"), 0.1)
+    high = FakeResult(FakeChunk("high " * 60, source_id="b"), 0.9)
+    packer = _packer(budget=100)
+
+    packed = packer.pack([low, high], "shoulder")
+
+    assert packed.included == 1
+    assert packed.dropped == 1
+    assert "high high" in packed.text and "low low" not in packed.text
+    assert packed.tokens <= 100
+
+
+def test_removes_overlap_between_adjacent_chunks():
+    """The boundary shared by consecutive chunks of one source is sent once"""
+    shared = "the overlapping boundary sentence appears in both chunks."
+    first = FakeResult(FakeChunk("Opening material about the shoulder. " + shared), 0.9)
+    second = FakeResult(FakeChunk(shared + " Follow-up material about abduction."), 0.8)
+
+    packed = _packer(budget=1000).pack([first, second], "shoulder")
+
+    assert packed.included == 2
+    assert packed.text.count(shared) == 1
+    assert "Follow-up material about abduction." in packed.text
+    assert packed.overlap_chars_removed >= len(shared)
+
+
+def test_truncation_keeps_query_relevant_sentences():
+    """When a source must be cut, sentences matching the query survive"""
+    filler = "General background text that does not mention the treatment goal at all here. "
+    content = filler * 2 + "Progress shoulder abduction to 150 degrees. " + filler * 2
+    result = FakeResult(FakeChunk(content), 0.9)
+
+    packed = _packer(budget=1000, per_source=40).pack([result], "shoulder abduction")
+
+    assert packed.truncated == 1
+    assert "Progress shoulder abduction to 150 degrees." in packed.text
+
+
+def test_default_packer_constructs_with_real_counter():
+    """The default packer builds its tiktoken counter (or the fallback) and counts tokens"""
+    packer = ContextPacker()
+
+    assert isinstance(packer.counter, TokenCounter)
+    assert packer.counter.count("shoulder abduction painless arc") > 0
+
+
+def test_encoding_download_failure_falls_back(monkeypatch):
+    """An offline host without cached tiktoken files still gets a working counter"""
+    import requests
+    import tiktoken
+
+    def offline(*args, **kwargs):
+        raise requests.ConnectionError("no network")
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", offline)
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+
+    counter = TokenCounter("gpt-4o-mini")
+
+    assert counter.encoding is None
+    assert counter.count("x" * 40) == 10
+    assert counter.truncate("x" * 40, 2) == "x" * 8
@@ -0,0 +1,125 @@
+"""
+Tests for the recommendation deadline and the extractive fallback
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from config import settings
+from core.document_processor import DocumentChunk
+from core.gpt_rag_system import GPTRAGSystem
+from core.retriever import RetrievalResult
+from models.request_models import RAGManifest, UserInput
+
+FEEDBACK = {"session_id": "s", "blocked_cpts": ["97110"]}
+
+LLM_DOCUMENT = {
+    "high_level": ["Progress loading"],
+    "subsections": [{
+        "title": "Strengthening",
+        "rationale": "Rotator cuff loading",
+        "exercises": [{
+            "title": "Side-lying external rotation",
+            "description": "3x12 with a light dumbbell",
+            "cpt": "97530",
+            "sources": [{"type": "note_ninjas", "id": "doc", "quote": "external rotation"}]
+        }]
+    }],
+    "suggested_alternatives": [],
+    "confidence": "high"
+}
+
+
+def _results():
+    chunks = [
+        DocumentChunk(f"Shoulder exercise {i} (CPT {code})", "note_ninjas", "doc", "Title", ["Shoulder Mobility"])
+        for i, code in enumerate(["97110", "97530", "97530", "97530"])
+    ]
+    return [RetrievalResult(chunk, 0.5, 0.5, 0.9, "query") for chunk in chunks]
+
+
+@pytest.fixture
+def system(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "RECOMMENDATION_DEADLINE_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "DEADLINE_CACHE_LATE_RESULTS", True)
+    system = GPTRAGSystem(str(tmp_path), [], str(tmp_path / "vector_store"))
+    system.is_initialized = True
+
+    async def retrieve(user_input, rag_manifest, session_id, feedback_state):
+        return "context", _results()
+
+    system._retrieve_context = retrieve
+    return system
+
+
+def _request():
+    return UserInput(patient_condition="rotator cuff tear", desired_outcome="return to work"), RAGManifest()
+
+
+def _cpts(response):
+    return [exercise["cpt"] for subsection in response["subsections"] for exercise in subsection["exercises"]]
+
+
+def test_llm_failure_falls_back_to_extractive_with_dict_feedback(system):
+    async def failed(context, user_input, rag_manifest):
+        return None
+
+    system._generate_gpt_response = failed
+    user_input, manifest = _request()
+
+    response = asyncio.run(system.generate_recommendations(user_input, manifest, "s", FEEDBACK))
+
+    cpts = _cpts(response.model_dump(mode="json"))
+    assert cpts and "97110" not in cpts
+
+
+def test_late_llm_result_is_cached_for_the_next_request(system):
+    async def slow(context, user_input, rag_manifest):
+        await asyncio.sleep(0.15)
+        return json.dumps(LLM_DOCUMENT)
+
+    system._generate_gpt_response = slow
+    user_input, manifest = _request()
+
+    async def run():
+        first = await system.generate_recommendations(user_input, manifest, "s", FEEDBACK)
+        await asyncio.sleep(0.3)
+        second = await system.generate_recommendations(user_input, manifest, "s", FEEDBACK)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert "97110" not in _cpts(first.model_dump(mode="json"))
+    assert second.subsections[0].title == "Strengthening"
+    assert system.deadline_stats == {"degraded": 1, "late_results_cached": 1}
+
+
+def test_stream_sends_degraded_event_then_llm_result(system):
+    async def slow_pump(context, queue):
+        await asyncio.sleep(0.15)
+        queue.put_nowait((("high_level", 0), "Progress loading"))
+        queue.put_nowait(((), LLM_DOCUMENT))
+        queue.put_nowait(None)
+
+    system._pump_llm_stream = slow_pump
+    user_input, manifest = _request()
+
+    async def run():
+        return [event async for event in system.stream_recommendations(user_input, manifest, "s", FEEDBACK)]
+
+    events = asyncio.run(run())
+
+    assert [event["event"] for event in events] == ["degraded", "high_level", "complete"]
+    degraded = _cpts(events[0]["data"])
+    assert degraded and "97110" not in degraded
+    assert events[-1]["data"]["subsections"][0]["title"] == "Strengthening"
@@ -0,0 +1,71 @@
+"""
+Tests for the retrieval evaluation metrics and configuration sweep
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from benchmarks.evaluate import DenseIndex, RetrievalConfig, build_configs, pareto_frontier, score_ranking
+from core.document_processor import DocumentChunk
+
+
+def _chunk(chunk_id, source_id="doc"):
+    return DocumentChunk(
+        content=chunk_id,
+        source_type="cpg",
+        source_id=source_id,
+        title=chunk_id,
+        headers=[],
+        chunk_id=chunk_id
+    )
+
+
+def test_score_ranking_counts_each_relevant_id_once():
+    """Chunk and source ids both match, and repeated source hits add no gain"""
+    ranked = [_chunk("a"), _chunk("b", "src"), _chunk("c", "src"), _chunk("d")]
+    metrics = score_ranking(ranked, ["src", "missing"], k=3)
+    assert metrics["recall"] == 0.5
+    assert metrics["mrr"] == 0.5
+    assert 0 < metrics["ndcg"] < 1
+
+
+def test_score_ranking_perfect_and_empty():
+    assert score_ranking([_chunk("a"), _chunk("b")], ["a", "b"], k=2) == {"recall": 1.0, "ndcg": 1.0, "mrr": 1.0}
+    assert score_ranking([_chunk("a")], ["z"], k=1) == {"recall": 0.0, "ndcg": 0.0, "mrr": 0.0}
+
+
+def test_pareto_frontier_drops_dominated_configs():
+    rows = [
+        {"config": "fast", "ndcg": 0.6, "p50_ms": 1.0},
+        {"config": "slow-better", "ndcg": 0.9, "p50_ms": 5.0},
+        {"config": "dominated", "ndcg": 0.5, "p50_ms": 3.0}
+    ]
+    assert pareto_frontier(rows, "ndcg") == ["fast", "slow-better"]
+
+
+def test_build_configs_skips_redundant_bm25_variants():
+    configs = build_configs(["exact", "ann"], ["float32", "int8"], ["linear", "bm25"], [0], [4, 16])
+    names = [config.name for config in configs]
+    assert names.count("exact/float32/bm25/no-rerank") == 1
+    assert not any("bm25" in name and name != "exact/float32/bm25/no-rerank" for name in names)
+    assert RetrievalConfig("ann", "int8", "linear", 0, 16) in configs
+
+
+def test_quantized_and_ann_scores_track_exact():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(400, 32)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    query = embeddings[7]
+
+    exact = DenseIndex(embeddings, "float32").scores(query)
+    assert int(np.argmax(DenseIndex(embeddings, "int8").scores(query))) == 7
+    assert np.allclose(DenseIndex(embeddings, "float16").scores(query), exact, atol=1e-2)
+
+    ann = DenseIndex(embeddings, "float32", lists=8)
+    assert int(np.argmax(ann.scores(query, nprobe=2))) == 7
+    assert np.allclose(ann.scores(query, nprobe=8), exact)
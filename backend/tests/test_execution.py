@@ -0,0 +1,70 @@
+"""
+Tests for execution pools
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.execution import ExecutionPools
+
+
+def test_pool_runs_off_event_loop():
+    """Work submitted to a pool runs on a pool thread"""
+    pools = ExecutionPools({"retrieval": 2})
+
+    async def run():
+        return await pools.run("retrieval", threading.current_thread)
+
+    thread = asyncio.run(run())
+
+    assert thread.name.startswith("retrieval-pool")
+    stats = pools.get_stats()["retrieval"]
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0
+    pools.shutdown()
+
+
+def test_queue_depth_reported():
+    """Jobs waiting for a worker are counted in queue_depth"""
+    pools = ExecutionPools({"rerank": 1})
+    release = threading.Event()
+
+    async def run():
+        blocked = asyncio.ensure_future(pools.run("rerank", release.wait))
+        waiting = asyncio.ensure_future(pools.run("rerank", lambda: "done"))
+        await asyncio.sleep(0.05)
+        depth = pools.get_stats()["rerank"]["queue_depth"]
+        release.set()
+        await asyncio.gather(blocked, waiting)
+        return depth
+
+    assert asyncio.run(run()) == 1
+    pools.shutdown()
+
+
+def test_cancelled_queued_job_leaves_queue_depth():
+    """A caller cancelled before its job starts does not leave the job counted as queued"""
+    pools = ExecutionPools({"rerank": 1})
+    release = threading.Event()
+    ran = []
+
+    async def run():
+        blocked = asyncio.ensure_future(pools.run("rerank", release.wait))
+        waiting = asyncio.ensure_future(pools.run("rerank", lambda: ran.append(True)))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await blocked
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+
+    assert pools.get_stats()["rerank"]["queue_depth"] == 0
+    assert ran == []
+    pools.shutdown()
@@ -0,0 +1,175 @@
+"""
+Tests for LLM call timeouts, retries and hedging
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import llm_calls
+from llm_calls import LLMCaller
+from llm_limiter import LLMLimiter
+
+
+def _caller(**overrides):
+    options = dict(
+        timeout=0.05,
+        max_retries=2,
+        base_delay=0.001,
+        max_delay=0.002,
+        hedging=False,
+        hedge_percentile=95.0,
+        hedge_min_samples=3
+    )
+    options.update(overrides)
+    return LLMCaller(**options)
+
+
+def test_timed_out_attempt_is_retried():
+    """A hung attempt times out and the retry's result is returned"""
+    caller = _caller()
+    attempts = []
+
+    async def attempt():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(1)
+        return "ok"
+
+    assert asyncio.run(caller.call("test", attempt)) == "ok"
+
+    stats = caller.get_stats()["test"]
+    assert stats["attempts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["retries"] == 1
+    assert stats["failures"] == 0
+
+
+def test_non_retryable_errors_fail_immediately():
+    """Errors outside the transient set are raised without retrying"""
+    caller = _caller()
+
+    async def attempt():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(caller.call("test", attempt))
+
+    stats = caller.get_stats()["test"]
+    assert stats["attempts"] == 1
+    assert stats["failures"] == 1
+
+
+def test_retries_are_bounded():
+    """After max_retries the last transient error is raised"""
+    caller = _caller(max_retries=1)
+
+    async def attempt():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(caller.call("test", attempt))
+
+    stats = caller.get_stats()["test"]
+    assert stats["attempts"] == 2
+    assert stats["failures"] == 1
+
+
+def test_hedge_wins_over_slow_primary():
+    """A slow primary past the recent p95 is raced by a hedge and cancelled"""
+    caller = _caller(timeout=1.0, hedging=True)
+    cancelled = []
+
+    async def fast():
+        await asyncio.sleep(0.005)
+        return "warm"
+
+    async def run():
+        for _ in range(3):
+            await caller.call("test", fast)
+
+        attempts = []
+
+        async def attempt():
+            attempts.append(1)
+            if len(attempts) == 1:
+                try:
+                    await asyncio.sleep(0.5)
+                except asyncio.CancelledError:
+                    cancelled.append(1)
+                    raise
+                return "primary"
+            return "hedge"
+
+        result = await caller.call("test", attempt)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "hedge"
+    assert cancelled == [1]
+
+    stats = caller.get_stats()["test"]
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.closed = False
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_stream_holds_lease_until_consumed(monkeypatch):
+    """A streamed call stays in flight while its tokens are read"""
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=1000, max_in_flight=4)
+    monkeypatch.setattr(llm_calls, "llm_limiter", limiter)
+    usage = type("Usage", (), {"total_tokens": 100})()
+    chunks = [type("Chunk", (), {"usage": None})(), type("Chunk", (), {"usage": usage})()]
+
+    async def attempt():
+        return FakeStream(chunks)
+
+    async def run():
+        stream = await _caller().call("test", attempt, tokens=900, stream=True)
+        opened = limiter.get_stats()["in_flight"]
+        received = [chunk async for chunk in stream]
+        return opened, len(received), stream
+
+    opened, received, stream = asyncio.run(run())
+
+    assert (opened, received) == (1, 2)
+    assert stream.stream.closed
+    assert limiter.get_stats()["in_flight"] == 0
+    assert stream.lease.tokens == 100
+
+
+def test_closed_stream_releases_lease(monkeypatch):
+    """Leaving a stream early returns its slot"""
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=0, max_in_flight=1)
+    monkeypatch.setattr(llm_calls, "llm_limiter", limiter)
+
+    async def attempt():
+        return FakeStream([type("Chunk", (), {"usage": None})()] * 3)
+
+    async def run():
+        caller = _caller()
+        async with await caller.call("test", attempt, stream=True) as stream:
+            async for _ in stream:
+                break
+        # With max_in_flight=1 this only gets a slot if the first stream released it
+        await asyncio.wait_for(caller.call("test", attempt, stream=True), 1)
+
+    asyncio.run(run())
@@ -0,0 +1,129 @@
+"""
+Tests for LLM admission control
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from llm_limiter import LLMLimiter, estimate_tokens
+
+
+def test_estimate_tokens_includes_completion_budget():
+    """The reservation covers the prompt (chars/4) plus max_tokens"""
+    messages = [{"role": "system", "content": "x" * 40}, {"role": "user", "content": "y" * 40}]
+
+    assert estimate_tokens(messages, 100) == 120
+
+
+def test_max_in_flight_is_enforced():
+    """No more than max_in_flight calls hold a slot at once"""
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=0, max_in_flight=2)
+    active = []
+    peak = []
+
+    async def call():
+        async with limiter.acquire(user="a"):
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+
+    async def run():
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    asyncio.run(run())
+
+    assert max(peak) == 2
+    stats = limiter.get_stats()
+    assert stats["admitted"] == 6
+    assert stats["in_flight"] == 0
+    assert stats["waiting"] == 0
+
+
+def test_users_are_served_round_robin():
+    """A user with a large fan-out does not starve a user who queued after them"""
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=0, max_in_flight=1)
+    order = []
+
+    async def call(user):
+        async with limiter.acquire(user=user):
+            order.append(user)
+            await asyncio.sleep(0.001)
+
+    async def run():
+        first = [asyncio.ensure_future(call("a")) for _ in range(4)]
+        await asyncio.sleep(0)
+        second = [asyncio.ensure_future(call("b")) for _ in range(2)]
+        await asyncio.gather(*first, *second)
+
+    asyncio.run(run())
+
+    assert order == ["a", "a", "b", "a", "b", "a"]
+
+
+def test_token_budget_delays_admission():
+    """Calls beyond the tokens/min allowance wait for it to refill"""
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=6000, max_in_flight=0)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async with limiter.acquire(6000, user="a"):
+            pass
+        # 6000 tokens/min refills 10 tokens in ~0.1s
+        async with limiter.acquire(10, user="a"):
+            pass
+        return loop.time() - started
+
+    assert asyncio.run(run()) >= 0.09
+    assert limiter.get_stats()["queued"] == 1
+
+
+def test_settle_refunds_unused_reservation():
+    """Reported usage below the estimate returns the difference to the allowance"""
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=1000, max_in_flight=0)
+
+    class Usage:
+        total_tokens = 100
+
+    async def run():
+        async with limiter.acquire(900, user="a") as lease:
+            lease.settle(Usage())
+        async with limiter.acquire(900, user="a"):
+            pass
+
+    asyncio.run(run())
+
+    assert limiter.get_stats()["queued"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    """A caller that gives up while queued does not block later callers"""
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=0, max_in_flight=1)
+
+    async def hold(release):
+        async with limiter.acquire(user="a"):
+            await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(release))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(hold(asyncio.Event()))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await holder
+        async with limiter.acquire(user="b"):
+            pass
+
+    asyncio.run(asyncio.wait_for(run(), 1))
+
+    stats = limiter.get_stats()
+    assert stats["in_flight"] == 0
+    assert stats["waiting"] == 0
@@ -0,0 +1,40 @@
+"""
+Tests for token usage and prompt-cache accounting
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from llm_usage import LLMUsageTracker
+
+
+def test_records_cached_tokens_per_prompt():
+    """cached_tokens from prompt_tokens_details is totalled per prompt"""
+    tracker = LLMUsageTracker()
+    cached = SimpleNamespace(
+        prompt_tokens=1500,
+        completion_tokens=400,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1280)
+    )
+    uncached = SimpleNamespace(prompt_tokens=1500, completion_tokens=380, prompt_tokens_details=None)
+
+    assert tracker.record("subsection", cached)["cached_tokens"] == 1280
+    tracker.record("subsection", uncached)
+
+    stats = tracker.get_stats()["subsection"]
+    assert stats["calls"] == 2
+    assert stats["prompt_tokens"] == 3000
+    assert stats["cached_tokens"] == 1280
+    assert abs(stats["cached_ratio"] - 1280 / 3000) < 1e-9
+
+
+def test_missing_usage_is_ignored():
+    """Responses without usage do not create entries"""
+    tracker = LLMUsageTracker()
+
+    assert tracker.record("case_name", None) == {}
+    assert tracker.get_stats() == {}
@@ -0,0 +1,110 @@
+"""
+Tests for the load-testing mock server and driver statistics
+"""
+
+import json
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from loadtest.driver import EndpointStats, percentile
+from loadtest.mock_openai import MockConfig, create_app
+
+
+def _client(**overrides):
+    options = dict(latency_ms=0, latency_sigma=0, embedding_latency_ms=0, stream_chunk_ms=0, seed=7)
+    options.update(overrides)
+    return TestClient(create_app(MockConfig(**options)))
+
+
+def test_subsection_prompt_gets_subsection_json():
+    """The canned reply matches the prompt the subsection apps send"""
+    client = _client()
+    response = client.post("/v1/chat/completions", json={
+        "model": "gpt-4o",
+        "max_tokens": 2000,
+        "messages": [
+            {"role": "system", "content": "Expert OT."},
+            {"role": "user", "content": 'Generate 1 OT treatment subsection for: x | Goal: y\n\nUse "Home Exercise Program" as the title.'}
+        ]
+    })
+
+    assert response.status_code == 200
+    content = json.loads(response.json()["choices"][0]["message"]["content"])
+    assert content["title"] == "Home Exercise Program"
+    assert len(content["exercises"]) == 2
+
+
+def test_repeated_system_prompt_reports_cached_tokens():
+    """A second call with the same long system prompt reports a cached prefix"""
+    client = _client()
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "system", "content": "x" * 2048}, {"role": "user", "content": "hi"}]}
+
+    first = client.post("/v1/chat/completions", json=body).json()["usage"]
+    second = client.post("/v1/chat/completions", json=body).json()["usage"]
+
+    assert first["prompt_tokens_details"]["cached_tokens"] == 0
+    assert second["prompt_tokens_details"]["cached_tokens"] == 512
+
+
+def test_streamed_completion_reassembles_to_the_document():
+    """Streamed deltas concatenate to the full JSON and end with usage and [DONE]"""
+    client = _client(stream_chunks=5)
+    body = {
+        "model": "gpt-4o-mini",
+        "max_tokens": 2000,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+        "messages": [{"role": "user", "content": "recommend"}]
+    }
+
+    lines = [line for line in client.post("/v1/chat/completions", json=body).text.splitlines() if line.startswith("data: ")]
+    assert lines[-1] == "data: [DONE]"
+    chunks = [json.loads(line[len("data: "):]) for line in lines[:-1]]
+    text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks if chunk["choices"])
+
+    assert "subsections" in json.loads(text)
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+
+
+def test_injected_rate_limits_and_errors():
+    """Configured 429 and 500 rates are applied to every call"""
+    limited = _client(rate_limit_rate=1.0).post("/v1/chat/completions", json={"messages": []})
+    failed = _client(error_rate=1.0).post("/v1/chat/completions", json={"messages": []})
+
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "1"
+    assert failed.status_code == 500
+
+
+def test_embeddings_are_deterministic_unit_vectors():
+    """The same text embeds identically and vectors have unit norm"""
+    client = _client()
+    data = client.post("/v1/embeddings", json={"input": ["knee", "knee", "shoulder"], "dimensions": 64}).json()["data"]
+
+    assert data[0]["embedding"] == data[1]["embedding"]
+    assert data[0]["embedding"] != data[2]["embedding"]
+    assert abs(sum(value * value for value in data[2]["embedding"]) - 1.0) < 1e-9
+
+
+def test_percentiles_and_error_rate():
+    """Nearest-rank percentiles over successful calls; errors count toward the rate"""
+    assert percentile([], 50) is None
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile(list(range(1, 101)), 99) == 99
+
+    stats = EndpointStats("recommendations", stream=True)
+    for latency in (0.1, 0.2, 0.3):
+        stats.record("200", latency, True, first_event=latency / 2)
+    stats.record("500", 0.05, False)
+    report = stats.to_dict(elapsed=1.0)
+
+    assert report["error_rate"] == 0.25
+    assert report["throughput_rps"] == 3.0
+    assert report["p50_ms"] == 200.0
+    assert report["first_event_p50_ms"] == 100.0
+    assert report["statuses"] == {"200": 3, "500": 1}
@@ -0,0 +1,91 @@
+"""
+Tests for the shared model server protocol
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import core.model_server
+import core.reranker
+from config import settings
+from core.batching import MicroBatcher
+from core.model_server import (
+    ModelServer,
+    ModelServerClient,
+    _Reader,
+    decode_rerank_request,
+    encode_rerank_request
+)
+
+
+class FakeEmbeddingModel:
+    def encode(self, texts, show_progress_bar=False):
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+class FakeReranker:
+    def __init__(self):
+        async def score(items):
+            return [np.array([len(r.chunk.content) for r in results], dtype=np.float32) for _, results in items]
+        self.score_batcher = MicroBatcher(score, max_batch_size=8, max_wait_ms=1)
+
+
+class FakeResult:
+    def __init__(self, chunk_id, content):
+        self.chunk = type("Chunk", (), {"chunk_id": chunk_id, "content": content})()
+
+
+def test_rerank_request_roundtrip():
+    """Rerank groups survive binary encoding"""
+    groups = [("rotator cuff", [("a_1", "pendulum swings"), ("b_2", "wall walks")]), ("balance", [])]
+
+    assert decode_rerank_request(_Reader(encode_rerank_request(groups))) == groups
+
+
+def test_client_server_over_unix_socket(tmp_path):
+    """Workers get embeddings and scores from the shared server"""
+    socket_path = str(tmp_path / "models.sock")
+    server = ModelServer(socket_path)
+    server.embedding_model = FakeEmbeddingModel()
+    server.reranker = FakeReranker()
+
+    async def run():
+        serve_task = asyncio.create_task(server.serve_forever())
+        await asyncio.sleep(0.05)
+        client = ModelServerClient(socket_path)
+        embeddings = await client.embed(["abc", "abcdef"])
+        scores = await client.score([
+            ("q1", [FakeResult("a", "xx"), FakeResult("b", "xxxx")]),
+            ("q2", [FakeResult("c", "x")])
+        ])
+        serve_task.cancel()
+        return embeddings, scores
+
+    embeddings, scores = asyncio.run(run())
+
+    assert embeddings.shape == (2, 2)
+    assert embeddings[1, 0] == 6
+    assert [s.tolist() for s in scores] == [[2.0, 4.0], [1.0]]
+
+
+def test_server_loads_reranker_in_process(tmp_path, monkeypatch):
+    """The server never becomes a client of its own socket"""
+    import sentence_transformers
+
+    socket_path = str(tmp_path / "models.sock")
+    monkeypatch.setattr(settings, "MODEL_SERVER_SOCKET", socket_path)
+    monkeypatch.setattr(core.model_server, "_client", None)
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", lambda name: FakeEmbeddingModel())
+    monkeypatch.setattr(core.reranker, "CrossEncoder", lambda name, max_length, activation_fn: object())
+
+    server = ModelServer(socket_path)
+    server.initialize()
+
+    assert server.reranker.remote_client is None
+    assert server.reranker.model is not None
@@ -0,0 +1,169 @@
+"""
+Tests for regenerating one subsection or exercise of a saved case
+"""
+
+import asyncio
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import app_with_db
+from app_with_db import _regeneration_constraints, regenerate_subsection
+from schemas.case import SubsectionRegenerate
+
+
+def _feedback(comments=None, exercise_name=None, cpt_code=None, rating="needs-work", feedback_type="exercise"):
+    return SimpleNamespace(
+        comments=comments, exercise_name=exercise_name, cpt_code=cpt_code,
+        rating=rating, feedback_type=feedback_type
+    )
+
+
+def _case():
+    now = datetime.now()
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        name="Rotator cuff",
+        input_json={"patient_condition": "rotator cuff tear", "desired_outcome": "return to work"},
+        output_json={"subsections": [{
+            "title": "Manual Therapy Techniques",
+            "description": "Start with Pendulum Swings before loading.",
+            "exercises": [{"name": "Pendulum Swings"}, {"name": "Wall Walks"}]
+        }]},
+        created_at=now,
+        updated_at=now
+    )
+
+
+class _Result:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: self.value)
+
+
+class FakeSession:
+    def __init__(self, case, feedback_rows=()):
+        self.results = [_Result(case), _Result(list(feedback_rows))]
+        self.committed = False
+
+    async def execute(self, statement):
+        return self.results.pop(0)
+
+    async def commit(self):
+        self.committed = True
+
+    async def refresh(self, instance):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+def _regenerate(monkeypatch, case, request, regenerated, feedback_rows=()):
+    calls = []
+
+    async def generate(info, condition, outcome, constraints="", sources=""):
+        calls.append(constraints)
+        return regenerated
+
+    async def no_sources(condition, outcome):
+        return {}
+
+    monkeypatch.setattr(app_with_db, "generate_subsection", generate)
+    monkeypatch.setattr(app_with_db, "subsection_sources", no_sources)
+    db = FakeSession(case, feedback_rows)
+    user = SimpleNamespace(id=case.user_id)
+    response = asyncio.run(regenerate_subsection(case.id, request, user, db))
+    return response, calls, db
+
+
+def test_constraints_merge_avoided_exercises_and_cpt_codes():
+    request = SubsectionRegenerate(
+        subsection_title="Manual Therapy Techniques",
+        avoid_exercises=["Cross-body Stretch"],
+        avoid_cpt_codes=["97140"]
+    )
+    rows = [
+        _feedback(exercise_name="Sleeper Stretch", cpt_code="97110"),
+        _feedback(exercise_name="Doorway Stretch", rating="helpful"),
+        _feedback(exercise_name="Posture Cue", feedback_type="cue")
+    ]
+
+    constraints = _regeneration_constraints(request, rows, [], ["Pendulum Swings"])
+
+    assert "Do NOT suggest these exercises: Cross-body Stretch, Pendulum Swings, Sleeper Stretch." in constraints
+    assert "Do NOT use these CPT codes: 97110, 97140." in constraints
+
+
+def test_request_comment_survives_the_comment_cap():
+    request = SubsectionRegenerate(subsection_title="Manual Therapy Techniques", comments="Make it seated")
+    rows = [_feedback(comments=f"note {i}") for i in range(6)]
+
+    constraints = _regeneration_constraints(request, rows, [], [])
+
+    comments = constraints.split("Clinician feedback to address:\n")[1].splitlines()
+    assert comments == ["- note 2", "- note 3", "- note 4", "- note 5", "- Make it seated"]
+
+
+def test_single_exercise_wording():
+    request = SubsectionRegenerate(subsection_title="Manual Therapy Techniques", exercise_name="Wall Walks")
+
+    constraints = _regeneration_constraints(request, [], ["Pendulum Swings"], ["Wall Walks"])
+
+    assert constraints.splitlines()[:2] == [
+        'Return exactly 1 exercise, a replacement for "Wall Walks".',
+        "The subsection already includes: Pendulum Swings. Do not repeat them."
+    ]
+
+
+def test_whole_subsection_is_replaced(monkeypatch):
+    case = _case()
+    regenerated = {"title": "Manual Therapy Techniques", "exercises": [{"name": "Scapular Glides"}]}
+    request = SubsectionRegenerate(subsection_title="manual therapy techniques")
+
+    response, calls, db = _regenerate(monkeypatch, case, request, regenerated)
+
+    assert response.output_json["subsections"] == [regenerated]
+    assert "Pendulum Swings, Wall Walks" in calls[0]
+    assert db.committed
+
+
+def test_single_exercise_is_replaced_in_place(monkeypatch):
+    case = _case()
+    original = case.output_json
+    regenerated = {"title": "Manual Therapy Techniques", "exercises": [{"name": "Scapular Glides"}]}
+    request = SubsectionRegenerate(subsection_title="Manual Therapy Techniques", exercise_name="pendulum swings")
+
+    response, _, _ = _regenerate(monkeypatch, case, request, regenerated)
+
+    subsection = response.output_json["subsections"][0]
+    assert [exercise["name"] for exercise in subsection["exercises"]] == ["Scapular Glides", "Wall Walks"]
+    assert subsection["description"] == "Start with Scapular Glides before loading."
+    # The stored JSON is replaced, not mutated, so the change is tracked
+    assert case.output_json is not original
+    assert original["subsections"][0]["exercises"][0]["name"] == "Pendulum Swings"
+
+
+def test_empty_regeneration_is_a_bad_gateway(monkeypatch):
+    case = _case()
+    request = SubsectionRegenerate(subsection_title="Manual Therapy Techniques", exercise_name="Wall Walks")
+
+    with pytest.raises(HTTPException) as error:
+        _regenerate(monkeypatch, case, request, {"title": "Manual Therapy Techniques", "exercises": []})
+
+    assert error.value.status_code == 502
+    assert case.output_json["subsections"][0]["exercises"][1]["name"] == "Wall Walks"
@@ -0,0 +1,134 @@
+"""
+Tests for reranker token handling
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.reranker import Reranker
+from core.document_processor import DocumentChunk
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with BERT-style pair layout"""
+
+    model_input_names = ["input_ids", "token_type_ids", "attention_mask"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text, add_special_tokens=False, truncation=False, max_length=None):
+        self.calls += 1
+        texts = text if isinstance(text, list) else [text]
+        ids = [[len(word) for word in t.split()] for t in texts]
+        if truncation and max_length:
+            ids = [i[:max_length] for i in ids]
+        return {"input_ids": ids if isinstance(text, list) else ids[0]}
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 3 if pair else 2
+
+    def build_inputs_with_special_tokens(self, ids_0, ids_1):
+        return [101] + ids_0 + [102] + ids_1 + [102]
+
+    def create_token_type_ids_from_sequences(self, ids_0, ids_1):
+        return [0] * (len(ids_0) + 2) + [1] * (len(ids_1) + 1)
+
+
+def test_pair_features_respect_token_limit():
+    """Query + passage ids are truncated on token boundaries"""
+    reranker = Reranker(max_length=16)
+    reranker.tokenizer = FakeTokenizer()
+
+    features = reranker._build_pair_features([1, 2, 3], list(range(50)))
+
+    assert len(features["input_ids"]) == 16
+    assert len(features["token_type_ids"]) == 16
+    assert features["input_ids"][:5] == [101, 1, 2, 3, 102]
+
+
+def test_passage_ids_are_cached():
+    """Chunks indexed up front are not retokenized at rerank time"""
+    reranker = Reranker(max_length=16)
+    reranker.tokenizer = FakeTokenizer()
+    chunk = DocumentChunk(
+        content="balance training with tactile cues",
+        source_type="note_ninjas",
+        source_id="Balance",
+        title="Balance",
+        headers=[]
+    )
+
+    reranker.index_chunks([chunk])
+    calls = reranker.tokenizer.calls
+    ids = reranker._get_passage_ids(chunk)
+
+    assert ids == [7, 8, 4, 7, 4]
+    assert reranker.tokenizer.calls == calls
+
+
+def test_predict_features_uses_model_activation():
+    """Scores go through the cross-encoder's activation_fn"""
+    import torch
+
+    class FakeHFModel(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.weight = torch.nn.Parameter(torch.zeros(1))
+
+        def forward(self, input_ids, **kwargs):
+            return type("Output", (), {"logits": input_ids.sum(dim=1, keepdim=True).float()})()
+
+    class PaddingTokenizer(FakeTokenizer):
+        def pad(self, features, padding=True, return_tensors="pt"):
+            width = max(len(f["input_ids"]) for f in features)
+            return {"input_ids": torch.tensor([f["input_ids"] + [0] * (width - len(f["input_ids"])) for f in features])}
+
+    reranker = Reranker(max_length=16)
+    reranker.tokenizer = PaddingTokenizer()
+    reranker.model = SimpleNamespace(model=FakeHFModel(), activation_fn=lambda logits: logits * 2)
+
+    scores = reranker._predict_features([{"input_ids": [1, 2]}, {"input_ids": [3]}])
+
+    assert scores.tolist() == [6.0, 6.0]
+
+
+def test_every_scoring_path_reports_probabilities(monkeypatch):
+    """The reranker's sigmoid puts rerank and ascore on the same 0-1 scale"""
+    import asyncio
+
+    import numpy as np
+    import torch
+
+    from core import reranker as reranker_module
+    from core.retriever import RetrievalResult
+
+    class FakeCrossEncoder:
+        def __init__(self, model_name, max_length=None, activation_fn=None):
+            self.activation_fn = activation_fn
+            self.tokenizer = None
+
+        def predict(self, pairs, batch_size=32):
+            logits = torch.tensor([float(len(passage.split())) - 3.0 for _, passage in pairs])
+            return self.activation_fn(logits).numpy()
+
+    monkeypatch.setattr(reranker_module, "CrossEncoder", FakeCrossEncoder)
+    reranker = Reranker()
+    reranker.initialize(use_remote=False)
+    results = [
+        RetrievalResult(DocumentChunk(content, "note_ninjas", "doc", "t", [], chunk_id=content), 0.5, 0.5, 0.5, "q")
+        for content in ["one", "one two three four five", "one two three"]
+    ]
+
+    reranked = reranker.rerank("q", results, diversity_threshold=1.0)
+    scores = asyncio.run(reranker.ascore("q", results))
+
+    expected = 1.0 / (1.0 + np.exp(-np.array([-2.0, 2.0, 0.0])))
+    assert np.allclose(scores, expected)
+    assert [r.rerank_score for r in reranked] == pytest.approx(sorted(expected, reverse=True))
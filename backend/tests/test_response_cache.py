@@ -0,0 +1,75 @@
+"""
+Tests for the recommendation response cache
+"""
+
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from models.request_models import UserInput, RAGManifest
+from core.response_cache import (
+    InMemoryResponseCache,
+    SQLiteResponseCache,
+    request_fingerprint,
+    request_key
+)
+
+
+def test_fingerprint_ignores_whitespace_and_case():
+    """Double-submits with cosmetic differences share a key"""
+    first = UserInput(patient_condition="21 y/o female  torn rotator cuff", desired_outcome="Abduction 150")
+    second = UserInput(patient_condition=" 21 Y/O female torn rotator cuff", desired_outcome="abduction 150 ")
+    manifest = RAGManifest()
+
+    assert request_fingerprint(first, manifest, None, "gpt-4o-mini", "idx1") == \
+        request_fingerprint(second, manifest, None, "gpt-4o-mini", "idx1")
+
+
+def test_request_key_is_canonical():
+    """Whitespace, case and key order do not change the key"""
+    first = {"patient_condition": "Torn  Rotator Cuff", "desired_outcome": "abduction 150"}
+    second = {"desired_outcome": "Abduction 150 ", "patient_condition": "torn rotator cuff"}
+
+    assert request_key(first) == request_key(second)
+    assert request_key(first) != request_key({**first, "desired_outcome": "flexion"})
+
+
+def test_fingerprint_changes_with_feedback_and_index():
+    """Feedback state, model and index version are part of the key"""
+    user_input = UserInput(patient_condition="stroke", desired_outcome="transfers")
+    manifest = RAGManifest()
+    base = request_fingerprint(user_input, manifest, None, "gpt-4o-mini", "idx1")
+
+    assert base != request_fingerprint(user_input, manifest, {"blocked_cpts": ["97110"]}, "gpt-4o-mini", "idx1")
+    assert base != request_fingerprint(user_input, manifest, None, "gpt-4o", "idx1")
+    assert base != request_fingerprint(user_input, manifest, None, "gpt-4o-mini", "idx2")
+
+
+def test_memory_cache_evicts_lru_and_expires():
+    """Size bound evicts least recently used entries; TTL expires entries"""
+    cache = InMemoryResponseCache(ttl_seconds=60, max_entries=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")
+    cache.set("c", {"v": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+
+    expiring = InMemoryResponseCache(ttl_seconds=0.01, max_entries=2)
+    expiring.set("a", {"v": 1})
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+
+def test_sqlite_cache_persists(tmp_path):
+    """Entries survive reopening the SQLite backend"""
+    path = str(tmp_path / "responses.sqlite")
+    SQLiteResponseCache(path, ttl_seconds=60, max_entries=10).set("key", {"high_level": ["x"]})
+
+    reopened = SQLiteResponseCache(path, ttl_seconds=60, max_entries=10)
+    assert reopened.get("key") == {"high_level": ["x"]}
+    assert reopened.get_stats()["hits"] == 1
@@ -0,0 +1,120 @@
+"""
+Tests for hybrid retrieval and precomputed static query scores
+"""
+
+import asyncio
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from config import settings
+from core.document_processor import DocumentChunk
+from core.rag_system import STATIC_QUERIES
+from core.retriever import Retriever
+
+CONTENTS = [
+    ("note_ninjas", "CPT 97110 therapeutic exercises documentation for shoulder strength"),
+    ("note_ninjas", "Functional training activities: sit to stand transfers and reaching"),
+    ("cpg", "Clinical guideline on billing codes and documentation requirements"),
+    ("cpg", "Balance interventions with progressive therapeutic exercises"),
+    ("textbook", "Anatomy of the rotator cuff and scapular stabilizers"),
+    ("note_ninjas", "Home exercise program with theraband activities for endurance")
+]
+
+
+class HashingEncoder:
+    """Bag-of-words hashing embeddings, deterministic and offline"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), 32))
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 32] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "USE_OPENAI_EMBEDDINGS", False)
+    retriever = Retriever(vector_store_path=str(tmp_path))
+    retriever.embedding_model = HashingEncoder()
+    retriever.document_chunks = [
+        DocumentChunk(content, source_type, f"doc{i}", f"Title {i}", [f"Section {i}"])
+        for i, (source_type, content) in enumerate(CONTENTS)
+    ]
+    retriever.chunk_embeddings = retriever.embedding_model.encode([c.content for c in retriever.document_chunks])
+    retriever._prepare_bm25()
+    retriever.index_version = "v1"
+    retriever.precompute_static_queries(STATIC_QUERIES)
+    return retriever
+
+
+@pytest.mark.parametrize("query", STATIC_QUERIES)
+@pytest.mark.parametrize("boosts", [{}, {
+    "source_boosts": {"note_ninjas": 1.5, "cpg": 0.8},
+    "header_boosts": {"section 2": 1.3},
+    "topic_boosts": {"exercise": 1.2}
+}])
+def test_precomputed_scores_match_live_search(retriever, query, boosts):
+    live = retriever.search_with_embedding(
+        query, retriever.embedding_model.encode([query]), top_k=4, **boosts
+    )
+    precomputed = retriever.search_precomputed(query, 4, **boosts)
+
+    assert [r.chunk.chunk_id for r in precomputed] == [r.chunk.chunk_id for r in live]
+    for cached, fresh in zip(precomputed, live):
+        assert cached.bm25_score == pytest.approx(fresh.bm25_score)
+        assert cached.dense_score == pytest.approx(fresh.dense_score)
+        assert cached.combined_score == pytest.approx(fresh.combined_score)
+
+
+def test_asearch_falls_back_when_index_changes(retriever):
+    query = STATIC_QUERIES[0]
+    encoder = retriever.embedding_model
+    encoder.calls.clear()
+
+    asyncio.run(retriever.asearch(query, top_k=3))
+    assert encoder.calls == []
+
+    retriever.index_version = "v2"
+    assert retriever.search_precomputed(query, 3) is None
+    results = asyncio.run(retriever.asearch(query, top_k=3))
+
+    assert encoder.calls == [[query]]
+    expected = retriever.search_with_embedding(query, encoder.encode([query]), top_k=3)
+    assert [r.chunk.chunk_id for r in results] == [r.chunk.chunk_id for r in expected]
+
+
+def test_load_index_serves_the_processed_index(retriever, monkeypatch):
+    """A retriever loaded from disk is annotated, versioned and searchable"""
+    retriever._save_embeddings()
+    loaded = Retriever(vector_store_path=str(retriever.vector_store_path))
+    monkeypatch.setattr(loaded, "_load_embedding_model", HashingEncoder)
+    loaded._boost_cache["stale"] = np.ones(1)
+
+    loaded.load_index()
+
+    assert loaded.index_version == retriever._generate_documents_hash(retriever.document_chunks)[:16]
+    assert all(chunk.annotations is not None for chunk in loaded.document_chunks)
+    assert "stale" not in loaded._boost_cache
+    query = "therapeutic exercises"
+    assert [r.chunk.chunk_id for r in loaded.search(query, top_k=3)] == \
+        [r.chunk.chunk_id for r in retriever.search(query, top_k=3)]
+
+
+def test_load_index_requires_a_processed_index(tmp_path, monkeypatch):
+    """An empty vector store is an error rather than an empty index"""
+    monkeypatch.setattr(settings, "USE_OPENAI_EMBEDDINGS", False)
+    with pytest.raises(RuntimeError):
+        Retriever(vector_store_path=str(tmp_path)).load_index()
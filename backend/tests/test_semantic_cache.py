@@ -0,0 +1,39 @@
+"""
+Tests for the semantic response cache
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from models.request_models import UserInput
+from core.semantic_cache import SemanticResponseCache, normalize_case_text
+
+
+def test_normalize_expands_common_abbreviations():
+    """Shorthand case descriptions normalize toward the long form"""
+    short = UserInput(patient_condition="21yo F rotator cuff tear", desired_outcome="abduction")
+    long = UserInput(patient_condition="21 y/o female rotator cuff tear", desired_outcome="Abduction")
+
+    assert normalize_case_text(short) == normalize_case_text(long)
+
+
+def test_lookup_respects_threshold_and_constraints():
+    """Only close vectors with matching feedback constraints are served"""
+    cache = SemanticResponseCache(similarity_threshold=0.9, max_entries=10)
+    cache.store(np.array([1.0, 0.0]), "constraints-a", {"high_level": ["cached"]})
+
+    hit = cache.lookup(np.array([0.99, 0.05]), "constraints-a")
+    assert hit is not None and hit[0] == {"high_level": ["cached"]}
+
+    assert cache.lookup(np.array([0.99, 0.05]), "constraints-b") is None
+    assert cache.lookup(np.array([0.0, 1.0]), "constraints-a") is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert sum(stats["similarity_histogram"].values()) == 2
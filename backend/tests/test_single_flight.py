@@ -0,0 +1,83 @@
+"""
+Tests for single-flight request coalescing
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    """Identical concurrent calls run once and all receive the result"""
+    flights = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"subsections": 6}
+
+    async def run():
+        return await asyncio.gather(*[flights.do("key", compute) for _ in range(3)])
+
+    results = asyncio.run(run())
+
+    assert calls == [1]
+    assert results == [{"subsections": 6}] * 3
+    assert flights.get_stats() == {"in_flight": 0, "leaders": 1, "joined": 2}
+
+
+def test_errors_propagate_to_all_callers():
+    """A failed computation fails every waiter and is not remembered"""
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream timeout")
+
+    async def run():
+        return await asyncio.gather(*[flights.do("key", fail) for _ in range(2)], return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.get_stats()["in_flight"] == 0
+
+
+def test_late_stream_joiner_replays_then_follows_live_tail():
+    """A joiner sees already-emitted events followed by the rest of the stream"""
+    flights = SingleFlight("test")
+    produced = []
+
+    async def run():
+        ready = asyncio.Event()
+        release = asyncio.Event()
+
+        async def source():
+            for i in range(4):
+                produced.append(i)
+                yield i
+                if i == 1:
+                    ready.set()
+                    await release.wait()
+
+        async def consume():
+            return [event async for event in flights.stream("key", source)]
+
+        leader = asyncio.ensure_future(consume())
+        await ready.wait()
+        joiner = asyncio.ensure_future(consume())
+        await asyncio.sleep(0)
+        release.set()
+        return await leader, await joiner
+
+    leader_events, joiner_events = asyncio.run(run())
+
+    assert produced == [0, 1, 2, 3]
+    assert leader_events == [0, 1, 2, 3]
+    assert joiner_events == [0, 1, 2, 3]
@@ -0,0 +1,80 @@
+"""
+Tests for incremental parsing of streamed model JSON
+"""
+
+import json
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.stream_parser import IncrementalJSONParser
+
+PATTERNS = [
+    ("high_level", "*"),
+    ("subsections", "*", "exercises", "*"),
+    ("subsections", "*"),
+    ()
+]
+
+DOCUMENT = {
+    "high_level": ["Prioritize \"task-specific\" practice", "Monitor BP"],
+    "subsections": [
+        {
+            "title": "Transfers",
+            "rationale": None,
+            "exercises": [
+                {"description": "STS 3x5, {rest} 60s", "cues": ["nose over toes"], "cpt": "97530"},
+                {"description": "Weight shifts", "cues": [], "cpt": None}
+            ]
+        }
+    ],
+    "confidence": "medium"
+}
+
+
+def _feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+def test_items_emitted_in_completion_order():
+    """Exercises close before their subsection, which closes before the document"""
+    parser = IncrementalJSONParser(PATTERNS)
+    events = _feed_in_chunks(parser, json.dumps(DOCUMENT, indent=2), 3)
+
+    assert [path for path, _ in events] == [
+        ("high_level", 0),
+        ("high_level", 1),
+        ("subsections", 0, "exercises", 0),
+        ("subsections", 0, "exercises", 1),
+        ("subsections", 0),
+        ()
+    ]
+    assert events[0][1] == DOCUMENT["high_level"][0]
+    assert events[2][1] == DOCUMENT["subsections"][0]["exercises"][0]
+    assert events[-1][1] == DOCUMENT
+    assert parser.done
+
+
+def test_item_available_before_stream_ends():
+    """A high-level item is emitted as soon as its closing quote arrives"""
+    parser = IncrementalJSONParser(PATTERNS)
+    text = json.dumps(DOCUMENT)
+    cut = text.index("Monitor BP") + len("Monitor BP") + 1
+
+    events = parser.feed(text[:cut])
+
+    assert [value for _, value in events] == DOCUMENT["high_level"]
+    assert not parser.done
+
+
+def test_leading_noise_is_ignored():
+    """Text before the root object does not confuse the parser"""
+    parser = IncrementalJSONParser([()])
+    events = parser.feed("```json\n" + json.dumps(DOCUMENT) + "\n```")
+
+    assert events == [((), DOCUMENT)]
@@ -0,0 +1,58 @@
+"""
+Tests for the per-subsection generation cache
+"""
+
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.response_cache import create_subsection_cache, prompt_version, subsection_key
+
+HEP = {"title": "Home Exercise Program", "focus": "home exercises patient can do"}
+MANUAL = {"title": "Manual Therapy Techniques", "focus": "mobilizations, soft tissue work"}
+
+
+def test_key_normalizes_case_text_and_separates_subsections():
+    first = subsection_key("Torn  Rotator Cuff", "Abduction 150", HEP, "v1", "gpt-4o")
+
+    assert first == subsection_key("torn rotator cuff ", "abduction 150", HEP, "v1", "gpt-4o")
+    assert first != subsection_key("torn rotator cuff", "abduction 150", MANUAL, "v1", "gpt-4o")
+    assert first != subsection_key("torn rotator cuff", "abduction 150", HEP, "v2", "gpt-4o")
+    assert first != subsection_key("torn rotator cuff", "abduction 150", HEP, "v1", "gpt-4o-mini")
+    assert prompt_version("prompt a") != prompt_version("prompt b")
+
+
+def test_hits_return_copies_and_expire():
+    cache = create_subsection_cache(ttl_seconds=0.05, max_entries=10)
+    subsection = {"title": "HEP", "exercises": [{"name": "Wall slides"}]}
+    cache.set("k", subsection)
+    subsection["exercises"].append({"name": "Pendulums"})
+
+    hit = cache.get("k")
+    hit["exercises"].clear()
+    assert cache.get("k")["exercises"] == [{"name": "Wall slides"}]
+
+    time.sleep(0.06)
+    assert cache.get("k") is None
+    assert cache.get_stats()["hits"] == 2 and cache.get_stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = create_subsection_cache(ttl_seconds=60, max_entries=2)
+    cache.set("a", {"title": "a"})
+    cache.set("b", {"title": "b"})
+    cache.get("a")
+    cache.set("c", {"title": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"title": "a"}
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_zero_entries_disables_the_cache():
+    cache = create_subsection_cache(ttl_seconds=60, max_entries=0)
+    cache.set("a", {"title": "a"})
+    assert cache.get("a") is None and len(cache) == 0
@@ -0,0 +1,87 @@
+"""
+Tests for the shared subsection candidate pool
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.document_processor import DocumentChunk
+from core.retriever import RetrievalResult
+from core.subsection_pool import SubsectionPool
+
+TOPICS = {
+    "Manual Therapy Techniques": ["mobilization"],
+    "Home Exercise Program": ["home exercise"]
+}
+
+
+def _result(chunk_id, content):
+    chunk = DocumentChunk(content, "note_ninjas", "doc", chunk_id, ["Section"], chunk_id=chunk_id)
+    return RetrievalResult(chunk, 0.5, 0.5, 0.5, "query")
+
+
+class FakeRetriever:
+    def __init__(self, results):
+        self.results = results
+        self.document_chunks = [result.chunk for result in results]
+        self.index_version = "v1"
+        self.searches = 0
+
+    async def asearch(self, query, top_k=50, **kwargs):
+        self.searches += 1
+        return self.results[:top_k]
+
+
+class FakeReranker:
+    def __init__(self):
+        self.calls = 0
+
+    async def arerank(self, query, results, top_n=12, diversity_threshold=0.8):
+        self.calls += 1
+        return results[:top_n]
+
+
+def _pool(results, per_subsection=2):
+    pool = SubsectionPool(
+        FakeRetriever(results), FakeReranker(), topics=TOPICS,
+        pool_size=10, rerank_top_n=10, per_subsection=per_subsection
+    )
+    pool.label_chunks()
+    return pool
+
+
+def test_partition_uses_labels_and_tops_up_with_unlabelled_chunks():
+    results = [
+        _result("m1", "Grade II mobilization of the glenohumeral joint"),
+        _result("g1", "General background on the rotator cuff"),
+        _result("m2", "Mobilization with movement, then a home exercise handout"),
+        _result("m3", "Posterior glide mobilization")
+    ]
+    slices = _pool(results).partition(results)
+
+    assert [r.chunk.chunk_id for r in slices["Manual Therapy Techniques"]] == ["m1", "m2"]
+    assert [r.chunk.chunk_id for r in slices["Home Exercise Program"]] == ["m2", "g1"]
+
+
+def test_one_search_and_rerank_serve_every_subsection():
+    results = [_result("m1", "mobilization"), _result("h1", "home exercise program")]
+    pool = _pool(results)
+
+    sources = asyncio.run(pool.sources_by_subsection("rotator cuff tear return to work"))
+
+    assert pool.retriever.searches == 1 and pool.reranker.calls == 1
+    assert "[1] note_ninjas | doc | Section" in sources["Manual Therapy Techniques"]
+    assert "home exercise program" in sources["Home Exercise Program"]
+    assert "mobilization" not in sources["Home Exercise Program"]
+
+
+def test_labels_refresh_when_the_index_changes():
+    pool = _pool([_result("m1", "mobilization")])
+    pool.retriever.document_chunks = [_result("h1", "home exercise").chunk]
+    pool.retriever.index_version = "v2"
+
+    assert pool.labels_for(pool.retriever.document_chunks[0]) == ["Home Exercise Program"]
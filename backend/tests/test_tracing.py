@@ -0,0 +1,74 @@
+"""
+Tests for per-stage tracing spans
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.tracing import Tracer, JSONLSpanExporter, SpanExporter
+from core.execution import ExecutionPool
+
+
+class CollectingExporter(SpanExporter):
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def test_disabled_tracer_is_noop():
+    """Disabled tracing hands out a shared no-op span and exports nothing"""
+    exporter = CollectingExporter()
+    tracer = Tracer(enabled=False, exporters=[exporter])
+
+    with tracer.span("recommendations") as span:
+        span.set_attribute("cache_hit", False)
+        with tracer.span("retrieval"):
+            pass
+
+    assert exporter.traces == []
+
+
+def test_spans_nest_and_export_once_per_trace():
+    """Child spans share the root trace and are exported when the root closes"""
+    exporter = CollectingExporter()
+    tracer = Tracer(enabled=True, exporters=[exporter])
+
+    with tracer.span("recommendations") as root:
+        with tracer.span("retrieval", top_k=20) as child:
+            child.set_attribute("candidates", 20)
+        assert exporter.traces == []
+
+    assert len(exporter.traces) == 1
+    spans = {span.name: span for span in exporter.traces[0]}
+    assert spans["retrieval"].parent_id == root.span_id
+    assert spans["retrieval"].trace_id == root.trace_id
+    assert spans["retrieval"].attributes == {"top_k": 20, "candidates": 20}
+
+
+def test_span_propagates_into_execution_pool(tmp_path):
+    """Work run through an execution pool nests under the caller's span"""
+    path = tmp_path / "spans.jsonl"
+    tracer = Tracer(enabled=True, exporters=[JSONLSpanExporter(str(path))])
+    pool = ExecutionPool("test", 1)
+
+    def blocking_stage():
+        with tracer.span("bm25"):
+            return 1
+
+    async def run():
+        with tracer.span("recommendations"):
+            return await pool.run(blocking_stage)
+
+    assert asyncio.run(run()) == 1
+    pool.shutdown()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    by_name = {record["name"]: record for record in records}
+    assert by_name["bm25"]["parent_id"] == by_name["recommendations"]["span_id"]